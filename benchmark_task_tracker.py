@@ -0,0 +1,201 @@
+'''
+Benchmarks for the task tracker's hot paths at different store sizes.
+
+    python benchmark_task_tracker.py                      # 1k and 100k tasks
+    python benchmark_task_tracker.py --sizes 1000,100000,1000000
+    python benchmark_task_tracker.py --save-baseline      # record this machine's numbers
+    python benchmark_task_tracker.py --threshold 0.25     # fail if >25% slower/bigger than baseline
+
+Results are compared against benchmark_baseline.json, which is checked in, or
+against benchmark_baseline.local.json instead once --save-baseline has written
+one (that one stays out of git, it only means anything on the machine it came from).
+Every timing is the best of a few runs (--repeat), so one slow run is no regression.
+
+Stores are generated from a fixed seed, so every run benchmarks the same data.
+The compressed formats (.json.gz, .json.xz) are measured alongside plain JSON,
+with the size on disk of each. load_compact_tasks is what the menu loads with,
+parsed from scratch and then served from the snapshot cache of an unchanged
+store (load_compact_tasks[cached]).
+'''
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import subprocess
+import tracemalloc
+from datetime import date
+from rich.console import Console
+import task_tracker
+
+# The checked in baseline, and this machine's own (written by --save-baseline) which is used over it when there
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+LOCAL_BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.local.json")
+
+# How many times each benchmark is timed, the quickest run counts
+REPEAT = 3
+
+# Store formats compared against plain JSON for size and load/save speed
+COMPRESSED_FORMATS = (".json.gz", ".json.xz")
+
+# Words the fake names and descriptions are made of
+WORDS = ("goal", "setting", "threat", "model", "review", "requirements", "analysis", "device", "fingerprinting",
+         "signals", "shared", "career", "framework", "dimension", "report", "sprint", "planning", "fpad", "release",
+         "migration", "audit", "security", "dashboard", "customer", "feedback", "roadmap", "budget", "hiring")
+
+def generate_tasks(count, seed=0):
+    '''
+    Yields count realistic-looking tasks, the same ones every time for a given seed.
+    Statuses, importance, dates (2022-2026) and description lengths are all mixed up.
+    '''
+    rng = random.Random(seed)
+    start = date(2022, 1, 1).toordinal()
+    for number in range(count):
+        made = start + rng.randrange(0, 3 * 365)
+        due = made + rng.randrange(1, 2 * 365)
+        # Plenty of tasks have no description, the rest range from a few words to a few paragraphs
+        description = " ".join(rng.choice(WORDS) for _ in range(rng.choice((0, 0, 5, 20, 60, 200))))
+        status = rng.choices(task_tracker.TASK_STATUSES, weights=(2, 3, 5))[0]
+        task = {
+            "name": f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} {number}",
+            "description": description,
+            "has_description": rng.choice((bool(description), str(bool(description)))),
+            "importance": rng.choice(task_tracker.IMPORTANCE_LEVELS),
+            "date_made": date.fromordinal(made).isoformat(),
+            "due_date": date.fromordinal(due).isoformat(),
+            "status": status,
+        }
+        task["rag"] = task_tracker.check_rag(task["due_date"], status)
+        yield task
+
+def write_store(path, count, seed=0):
+    # Writes a generated store in the same layout save_tasks uses
+    task_tracker.save_tasks(path, list(generate_tasks(count, seed)))
+
+def cold_compact_load(path):
+    # The menu's load with no snapshot cache to go on, which leaves a fresh one behind
+    if os.path.exists(path + ".cache"):
+        os.remove(path + ".cache")
+    return task_tracker.load_compact_tasks(path)
+
+def measure(func, *args, repeat=REPEAT):
+    '''
+    Times func(*args) repeat times and keeps the quickest (anything slower is the
+    machine being busy, not the code), then runs it once more under tracemalloc for
+    peak memory (tracing slows things down too much to time at the same run).
+    Returns (seconds, peak bytes).
+    '''
+    seconds = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - started
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak
+
+def startup(path):
+    # A fresh interpreter importing the tracker and loading the store, like launching the menu
+    script = f"import task_tracker; task_tracker.load_compact_tasks({path!r})"
+    subprocess.run([sys.executable, "-c", script], check=True, cwd=os.path.dirname(os.path.abspath(task_tracker.__file__)))
+
+def run_benchmarks(sizes, directory, repeat=REPEAT):
+    # Returns {"load_tasks@1000": {"seconds": ..., "peak_bytes": ...}, ...}
+    results = {}
+    # Renders into a throwaway console so the terminal doesn't get flooded
+    task_tracker.console = Console(file=io.StringIO(), width=160, height=60)
+
+    for size in sizes:
+        path = os.path.join(directory, f"tasks_{size}.json")
+        write_store(path, size)
+        tasks = task_tracker.load_tasks(path)
+
+        benchmarks = {
+            "startup": lambda: startup(path),
+            "load_tasks": lambda: task_tracker.load_tasks(path),
+            "load_compact_tasks": lambda: cold_compact_load(path),
+            "load_compact_tasks[cached]": lambda: task_tracker.load_compact_tasks(path),
+            "save_tasks": lambda: task_tracker.save_tasks(path, tasks),
+            "show_tasks": lambda: task_tracker.show_tasks(tasks, limit=task_tracker.page_size()),
+            "check_rag": lambda: [task_tracker.check_rag(task["due_date"], task["status"]) for task in tasks],
+            "batch_rag": lambda: task_tracker.batch_rag(tasks),
+        }
+        for name, benchmark in benchmarks.items():
+            seconds, peak = measure(benchmark, repeat=repeat)
+            results[f"{name}@{size}"] = {"seconds": seconds, "peak_bytes": peak}
+            print(f"{name:>22} @ {size:>9,} tasks: {seconds * 1000:10.1f} ms  {peak / 1e6:9.1f} MB peak")
+        results[f"save_tasks@{size}"]["file_bytes"] = os.path.getsize(path)
+        print(f"{'.json':>22} @ {size:>9,} tasks: {os.path.getsize(path) / 1e6:10.1f} MB on disk")
+
+        for extension in COMPRESSED_FORMATS:
+            compressed = os.path.join(directory, f"tasks_{size}{extension}")
+            benchmarks = {
+                f"save_tasks[{extension}]": lambda: task_tracker.save_tasks(compressed, tasks),
+                f"load_tasks[{extension}]": lambda: task_tracker.load_tasks(compressed),
+            }
+            for name, benchmark in benchmarks.items():
+                seconds, peak = measure(benchmark, repeat=repeat)
+                results[f"{name}@{size}"] = {"seconds": seconds, "peak_bytes": peak}
+                print(f"{name:>22} @ {size:>9,} tasks: {seconds * 1000:10.1f} ms  {peak / 1e6:9.1f} MB peak")
+            results[f"save_tasks[{extension}]@{size}"]["file_bytes"] = os.path.getsize(compressed)
+            print(f"{extension:>22} @ {size:>9,} tasks: {os.path.getsize(compressed) / 1e6:10.1f} MB on disk")
+    return results
+
+def compare_results(results, baseline, threshold):
+    '''
+    Lists every benchmark that got slower or hungrier than baseline by more than
+    threshold (0.25 = 25%). Benchmarks missing from the baseline are skipped.
+    '''
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for metric in ("seconds", "peak_bytes", "file_bytes"):
+            # Only some benchmarks record a file size (and older baselines have none)
+            if metric not in result or metric not in baseline[name]:
+                continue
+            before, after = baseline[name][metric], result[metric]
+            if before and after > before * (1 + threshold):
+                regressions.append(f"{name} {metric}: {before:.4g} -> {after:.4g} (+{(after / before - 1) * 100:.0f}%)")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the task tracker at several store sizes")
+    parser.add_argument("--sizes", default="1000,100000", help="comma separated task counts")
+    parser.add_argument("--baseline", help="baseline file to compare against or save to (default: this machine's, "
+                                           "falling back to the checked in one)")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown before failing, 0.25 = 25%%")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="times each benchmark is run, the quickest counts")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = run_benchmarks([int(size) for size in args.sizes.split(",")], directory, max(args.repeat, 1))
+
+    if args.save_baseline:
+        baseline = args.baseline or LOCAL_BASELINE_FILE
+        with open(baseline, 'w', encoding="utf-8") as baselinefile:
+            json.dump(results, baselinefile, indent=4)
+        print(f"Baseline saved to {baseline}")
+        return 0
+
+    baseline = args.baseline or (LOCAL_BASELINE_FILE if os.path.exists(LOCAL_BASELINE_FILE) else BASELINE_FILE)
+    if not os.path.exists(baseline):
+        # Nothing compared is no pass
+        print(f"No baseline to compare against at {baseline}")
+        return 1
+    with open(baseline, 'r', encoding="utf-8") as baselinefile:
+        regressions = compare_results(results, json.load(baselinefile), args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
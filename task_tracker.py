@@ -1,107 +1,2450 @@
 import os
+import sys
 import json
-from datetime import datetime
-from rich import print
-from rich.console import Console
-from rich.table import Table
+import math
+import stat
+import mmap
+import marshal
+import struct
+import argparse
+import threading
+import time as time_module
+from array import array
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache, wraps
+from bisect import bisect_left, bisect_right, insort
+from heapq import heappush, heappop
+from datetime import date, datetime, time
+from itertools import chain, islice, takewhile
+from collections.abc import MutableMapping, MutableSequence, Sequence
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Heavier modules (rich, sqlite3, csv, re, ...) are imported inside the functions that
+# use them, so starting up and drawing the menu doesn't pay for features that aren't used
+
+# Marks when the program started, for the startup time check in main
+STARTED_AT = time_module.perf_counter()
+# How long startup to first menu is allowed to take before it's reported as slow
+STARTUP_BUDGET_SECONDS = 0.25
+# How long startup to first menu actually took, set once the menu is on screen
+STARTUP_SECONDS = None
+
+def print(*args, **kwargs):
+    # rich's print (for the [bold red] style markup), loaded on first use
+    from rich import print as rich_print
+    rich_print(*args, **kwargs)
+
+class _LazyConsole:
+    '''
+    Stand-in for the rich Console until something actually uses it,
+    then it swaps itself out for the real thing
+    '''
+
+    def __getattr__(self, name):
+        global console
+        from rich.console import Console
+        console = Console()
+        return getattr(console, name)
 
 # Initialise rich console
-console = Console()
+console = _LazyConsole()
 
 # Define the filename for storing tasks
 TASKS_FILE = "tasks.json"
 
-def reset_table():
+# Journaled storage: when on, each edit appends one line to TASKS_FILE + ".journal"
+# instead of rewriting the whole file. The journal is folded back into the main
+# file (compacted) in the background once it grows past JOURNAL_COMPACT_BYTES
+JOURNAL_MODE = False
+JOURNAL_COMPACT_BYTES = 4 * 1024 * 1024
+
+# Shared mode: for a store several terminals/scripts edit at once. Edits are merged
+# into the file on disk under a lock (see commit_changes) rather than blindly overwriting it
+SHARED_MODE = False
+
+# When set (the menu sets one up), record_change hands saves to this BackgroundWriter
+# instead of waiting for them
+BACKGROUND_WRITER = None
+
+# Called as listener(tasks, op, index, task) after every add/update/delete, see notify_change
+CHANGE_LISTENERS = []
+
+# Guards the journal files so the compaction thread and new edits don't trip over each other
+_journal_lock = threading.Lock()
+
+def clear_screen():
+    # Clears terminal, generally "prettier" :)
+    # Straight ANSI codes (home, clear screen, clear scrollback) rather than spawning `clear`
+    if sys.stdout.isatty():
+        sys.stdout.write("\033[H\033[2J\033[3J")
+        sys.stdout.flush()
+
+def reset_table(title="Tasks"):
     #Makes table variable global (such that all functions may use it)
     global table
     #Reinitialised the table and adds it's columns
-    table = Table(title="Tasks")
+    from rich.table import Table
+    table = Table(title=title)
+
+    table.add_column("T. No.", style="blue")
+    table.add_column("Task", style="cyan")
+    table.add_column("Importance", style="cyan")
+    table.add_column("Has Description", style="green")
+    table.add_column("Date Made", style="yellow")
+    table.add_column("Due Date", style="yellow")
+    table.add_column("Status", justify="right", style="orange1")
+    table.add_column("RAG rating", style="orange1")
+
+# The known values for the "enum" fields, tasks store the position in these tuples
+IMPORTANCE_LEVELS = ("high", "medium", "low")
+TASK_STATUSES = ("In Progress", "Pending", "Completed")
+RAG_RATINGS = ("red", "amber", "green")
+# has_description turns up as a real bool or as the strings "True"/"False" depending on who wrote it
+DESCRIPTION_FLAGS = (False, True, "False", "True")
+
+def _encode_choice(value, codes):
+    # Swaps a known value for its small code (codes is {value: code}), anything unexpected is kept
+    # as-is so nothing is lost. Only text and bools are known values, so 1 isn't taken for True
+    if type(value) is str or type(value) is bool:
+        code = codes.get(value)
+        if code is not None:
+            return code
+    return _keep(value)
+
+# Stands in for "no value at all" where None could be a real value
+_MISSING = object()
+
+def _keep(value):
+    # Ints are what codes/ordinals look like, so a stray int value gets boxed to tell them apart
+    return (value,) if type(value) is int else value
+
+def _unbox(value):
+    return value[0] if type(value) is tuple else value
+
+def _encode_date(value):
+    # "YYYY-MM-DD" -> day ordinal, only when turning it back gives the exact same string
+    if type(value) is str and len(value) == 10:
+        ordinal = _date_code(value)
+        if ordinal is not None:
+            return ordinal
+    return _keep(value)
+
+@lru_cache(maxsize=65536)
+def _date_code(date_string):
+    # Day ordinal of a date string that round trips exactly, None otherwise
+    try:
+        ordinal = date_ordinal(date_string)
+    except ValueError:
+        return None
+    return ordinal if ordinal_date(ordinal) == date_string else None
+
+class Task(MutableMapping):
+    '''
+    Compact stand-in for a task dict. Uses __slots__ instead of a per-task dict,
+    keeps importance/status/RAG/has_description as small int codes and dates as
+    day ordinals. Behaves like the dict it came from (task['name'] etc.) so the
+    rest of the program doesn't need to know the difference.
+    '''
+
+    __slots__ = ("name", "description", "has_description", "importance", "date_made", "due_date", "status", "rag", "id", "_extra", "_dirty")
+
+    # id last, since that's where it ends up in a task dict that's been given one
+    FIELDS = ("name", "description", "has_description", "importance", "date_made", "due_date", "status", "rag", "id")
+    _CHOICES = {"has_description": DESCRIPTION_FLAGS, "importance": IMPORTANCE_LEVELS, "status": TASK_STATUSES, "rag": RAG_RATINGS}
+    _DATES = ("date_made", "due_date")
+    # {value: code} for each coded field
+    _CODES = {key: {choice: code for code, choice in enumerate(choices)} for key, choices in _CHOICES.items()}
+    # What sort of field each key is, so storing a value takes one lookup: "plain", "date" or its _CODES
+    _KINDS = {**dict.fromkeys(FIELDS, "plain"), **dict.fromkeys(_DATES, "date"), **_CODES}
+
+    def __init__(self, fields=None):
+        # Unknown keys go in _extra (None until there are any)
+        self._extra = None
+        # Fields edited since pop_changes was last called (None when there aren't any)
+        self._dirty = None
+        for key, value in (fields or {}).items():
+            self._store(key, value)
+
+    @classmethod
+    def from_dict(cls, task):
+        return cls(task)
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def slot_values(self):
+        # Every field as stored (codes and ordinals, None if it isn't set) in FIELDS order, then _extra
+        # and the names of the fields that aren't set. Only plain values, so marshal can write it
+        values = [getattr(self, key, _MISSING) for key in self.FIELDS]
+        missing = tuple(key for key, value in zip(self.FIELDS, values) if value is _MISSING)
+        if missing:
+            values = [None if value is _MISSING else value for value in values]
+        return (*values, self._extra, missing)
+
+    @classmethod
+    def from_slots(cls, values):
+        # Rebuilds a task from slot_values() as it is, nothing gets encoded again (the snapshot cache uses this).
+        # Unpacked straight into the slots, in FIELDS order, as this runs once per task at startup
+        task = cls.__new__(cls)
+        (task.name, task.description, task.has_description, task.importance, task.date_made,
+         task.due_date, task.status, task.rag, task.id, task._extra, missing) = values
+        task._dirty = None
+        for key in missing:
+            object.__delattr__(task, key)
+        return task
+
+    def __getitem__(self, key):
+        if key in self._CHOICES:
+            try:
+                value = object.__getattribute__(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+            return self._CHOICES[key][value] if type(value) is int else _unbox(value)
+        if key in self._DATES:
+            try:
+                value = object.__getattribute__(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+            return ordinal_date(value) if type(value) is int else _unbox(value)
+        if key in self.FIELDS:
+            try:
+                return object.__getattribute__(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        # Only a real change counts, setting a field to what it already was doesn't
+        old = self.get(key, _MISSING)
+        self._store(key, value)
+        if old is _MISSING or old != value or type(old) is not type(value):
+            if self._dirty is None:
+                self._dirty = set()
+            self._dirty.add(key)
+
+    def pop_changes(self):
+        # {field: new value} for everything edited since the last call, then starts afresh
+        changes = {key: self[key] for key in (self._dirty or ()) if key in self}
+        self._dirty = None
+        return changes
+
+    def _store(self, key, value):
+        kind = self._KINDS.get(key)
+        if kind is None:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+        elif kind == "plain":
+            object.__setattr__(self, key, sys.intern(value) if key == "name" and isinstance(value, str) else value)
+        elif kind == "date":
+            object.__setattr__(self, key, _encode_date(value))
+        else:
+            object.__setattr__(self, key, _encode_choice(value, kind))
+
+    def __delitem__(self, key):
+        if key in self.FIELDS:
+            try:
+                object.__delattr__(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        elif self._extra and key in self._extra:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def __iter__(self):
+        for key in self.FIELDS:
+            if hasattr(self, key):
+                yield key
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"Task({self.to_dict()!r})"
+
+    def due_ordinal(self):
+        # Saves RagEngine re-parsing a date that's already stored as an ordinal
+        value = self.due_date
+        return value if type(value) is int else date_ordinal(str(_unbox(value)))
+
+def task_to_json(value):
+    # json.dump "default" hook, lets Task objects (and lazy task lists) be saved like plain dicts/lists
+    if isinstance(value, Task):
+        return value.to_dict()
+    if isinstance(value, LazyTaskList):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def load_compact_tasks(task_json):
+    '''
+    Same as load_tasks but gives back Task objects, converting as the store
+    streams in so the full list of dicts never exists at once.
+    (Stores that decode lazily, like .tbin, are handed back as they are.)
+    '''
+    storage = get_storage(task_json)
+    if getattr(storage, "lazy", False):
+        return storage.load(task_json)
+    # JSON stores have the snapshot cache to go through, sharded ones their bookkeeping to keep
+    if hasattr(storage, "load_compact"):
+        return storage.load_compact(task_json)
+    return [Task.from_dict(task) for task in storage.iter(task_json)]
+
+def load_tasks(task_json):
+
+    # Hands off to whichever storage backend matches the file (tasks.json, tasks.db, ...)
+    return get_storage(task_json).load(task_json)
+
+def iter_tasks(task_json):
+    '''
+    Generator version of load_tasks, yields tasks one at a time as they're parsed
+    so the first rows can be used before a big file has been read to the end
+    '''
+    return get_storage(task_json).iter(task_json)
+
+def save_tasks(task_dir, tasks):
+    '''
+    Saves the whole task list to task_dir using the matching storage backend
+    '''
+    with store_lock(task_dir):
+        get_storage(task_dir).save(task_dir, tasks)
+
+def reload_tasks(task_dir, tasks):
+    # Refreshes tasks in place from the store, keeping its form: the menu's Task list comes back
+    # as Task objects through load_compact_tasks (and so the snapshot cache), a list of dicts as dicts
+    fresh = load_compact_tasks(task_dir) if not tasks or isinstance(tasks[0], Task) else load_tasks(task_dir)
+    tasks[:] = fresh
+    if isinstance(tasks, ShardedTaskList) and isinstance(fresh, ShardedTaskList):
+        # The shards the list came from are whatever the reload read
+        tasks.keys, tasks.offsets = fresh.keys, fresh.offsets
+
+def record_change(task_dir, tasks, op, index, task=None, fields=None):
+    '''
+    Persists a single edit made by add_task, delete_task or update_task.
+    op is "add", "update" or "delete", index is the position that changed.
+    For deletes, task is the task that was removed. For updates, fields can
+    be the {field: new value} changes so only those get written, and an
+    update with no changes isn't written at all.
+    '''
+    if op == "update" and fields is not None and not fields:
+        return
+    task = tasks[index] if task is None else task
+    notify_change(tasks, op, index, task)
+    if SHARED_MODE:
+        # Other processes may have edited the store too, so the edit is merged into
+        # whatever is on disk and the list is refreshed to pick up theirs
+        commit_changes(task_dir, [change_record(op, index, task, fields)])
+        reload_tasks(task_dir, tasks)
+        notify_change(tasks, "reload", None, None)
+        return
+    if BACKGROUND_WRITER is not None and not is_daemon_path(task_dir):
+        BACKGROUND_WRITER.submit(task_dir, tasks, change_record(op, index, task, fields))
+        return
+    with store_lock(task_dir):
+        get_storage(task_dir).apply_change(task_dir, tasks, op, index, fields, task.get('id'))
+
+def change_record(op, index, task, fields=None):
+    '''
+    One edit as a change record (the journal's format) plus the task's ID when it
+    has one. The ID is what finds the task again wherever the record gets applied,
+    since list positions there may have moved on (see apply_records).
+    '''
+    record = {"op": op, "index": index}
+    if valid_id(task.get('id')):
+        record["id"] = task['id']
+    if op == "update" and fields is not None:
+        record["fields"] = fields
+    elif op != "delete":
+        record["task"] = dict(task)
+    return record
+
+def changed_fields(task, before=None):
+    '''
+    What's been edited on task: Task objects track this themselves, plain
+    dicts are compared against a before copy. Returns {field: new value}.
+    '''
+    if isinstance(task, Task):
+        return task.pop_changes()
+    return {key: value for key, value in task.items() if key not in before or before[key] != value or type(before[key]) is not type(value)}
+
+def notify_change(tasks, op, index, task):
+    # Lets anything keeping derived state (indexes etc.) in step with a task list know it changed
+    for listener in CHANGE_LISTENERS:
+        listener(tasks, op, index, task)
+
+@contextmanager
+def file_lock(lock_path):
+    # Advisory exclusive lock, everything that writes the store takes it first.
+    # (fcntl is Unix only, elsewhere this quietly does nothing)
+    with open(lock_path, 'a') as lockfile:
+        if fcntl is not None:
+            fcntl.flock(lockfile.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lockfile.fileno(), fcntl.LOCK_UN)
+
+def store_lock(task_dir):
+    # A daemon does its own ordering of edits, there's no file to lock
+    if is_daemon_path(task_dir):
+        return nullcontext()
+    return file_lock(task_dir + ".lock")
+
+def atomic_write(path, write, binary=False):
+    '''
+    Calls write(file) on a temp file next to path, then renames it over path.
+    Readers see the old file or the new one, never a half-written one.
+    '''
+    import tempfile
+    directory = os.path.dirname(os.path.abspath(path))
+    handle, temp_file = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        # mkstemp makes the file private, keeps whatever permissions the store had
+        os.chmod(temp_file, stat.S_IMODE(os.stat(path).st_mode) if os.path.exists(path) else 0o644)
+        with (os.fdopen(handle, 'wb') if binary else os.fdopen(handle, 'w', encoding="utf-8", newline="")) as taskfile:
+            write(taskfile)
+            taskfile.flush()
+            os.fsync(taskfile.fileno())
+        os.replace(temp_file, path)
+    except BaseException:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+
+def _read_queue_state(pending):
+    # {"next": next sequence number to hand out, "committed": highest one saved to the store}
+    if not os.path.exists(pending + ".state"):
+        return {"next": 1, "committed": 0}
+    with open(pending + ".state", 'r', encoding="utf-8") as statefile:
+        return json.load(statefile)
+
+def _write_queue_state(pending, state):
+    atomic_write(pending + ".state", lambda statefile: json.dump(state, statefile))
+
+def commit_changes(task_dir, records):
+    '''
+    Group commit for several processes sharing one store. The records (same format
+    as the journal) are numbered and queued in task_dir + ".pending", then whoever
+    gets the store lock applies *everything* queued so far in one load and one save.
+    Writers that were waiting usually find their edits already saved and skip the
+    write entirely, so many concurrent edits cost one write.
+    Returns how many records this call wrote (0 if another writer got them in).
+    '''
+    pending = task_dir + ".pending"
+    queue_lock = pending + ".lock"
+    with file_lock(queue_lock):
+        state = _read_queue_state(pending)
+        with open(pending, 'a', encoding="utf-8") as queue:
+            for record in records:
+                queue.write(json.dumps(dict(record, seq=state["next"]), separators=(",", ":"), default=task_to_json) + "\n")
+                state["next"] += 1
+        _write_queue_state(pending, state)
+        last_seq = state["next"] - 1
+
+    with store_lock(task_dir):
+        with file_lock(queue_lock):
+            state = _read_queue_state(pending)
+            if state["committed"] >= last_seq:
+                # Another writer saved our records along with theirs while we waited
+                return 0
+            with open(pending, 'r', encoding="utf-8") as queue:
+                batch = [json.loads(line) for line in queue if line.strip()]
+            batch = [record for record in batch if record["seq"] > state["committed"]]
+
+        # Records stay queued until they're actually in the store, so a crash here loses nothing
+        get_storage(task_dir).commit(task_dir, batch)
+
+        with file_lock(queue_lock):
+            state = _read_queue_state(pending)
+            state["committed"] = batch[-1]["seq"]
+            # Keeps anything queued while we were writing for the next writer to pick up
+            with open(pending, 'r', encoding="utf-8") as queue:
+                newer = [line for line in queue if line.strip() and json.loads(line)["seq"] > state["committed"]]
+            atomic_write(pending, lambda queue: queue.writelines(newer))
+            _write_queue_state(pending, state)
+        return len(batch)
+
+class JsonStorage:
+    '''
+    The original storage, one pretty-printed JSON array (plus an optional journal)
+    '''
+
+    # Bumped whenever the snapshot cache's layout changes, older caches are then ignored
+    CACHE_VERSION = 3
+
+    def load(self, task_json):
+        old_journal = journal_path(task_json) + ".old"
+        rotated = file_inode(old_journal)
+
+        # Uses os path to open TASKS_FILE json, if it exists. Uses json library to open loaded json
+        if os.path.exists(task_json):
+            with open(task_json, 'rb') as taskfile:
+                raw = taskfile.read()
+            tasks = json.loads(raw.decode("utf-8"))
+        else:
+            raw = b""
+            tasks = []
+
+        # Replays any journaled edits on top of the last checkpoint. Which rotated journal there
+        # is (if any) is only looked at the once, if compaction gets further along while this
+        # runs (swaps its checkpoint in and cleans up, or rotates the journal again) it all starts over
+        if rotated is not None:
+            import hashlib
+            try:
+                replay_journal(old_journal, tasks, hashlib.sha1(raw).hexdigest())
+            except FileNotFoundError:
+                return self.load(task_json)
+        if os.path.exists(journal_path(task_json)):
+            try:
+                replay_journal(journal_path(task_json), tasks)
+            except FileNotFoundError:
+                return self.load(task_json)
+        if file_inode(old_journal) not in (None, rotated):
+            return self.load(task_json)
+        return tasks
+
+    def load_compact(self, task_json):
+        '''
+        load_compact_tasks for JSON (what the menu starts up with). Straight from the
+        snapshot cache when it's current, which holds every task already encoded so
+        rebuilding one is cheap. Otherwise the whole file is parsed with json.loads
+        (all of it is wanted, and that beats streaming it) and the cache written for next time.
+        '''
+        if os.path.exists(journal_path(task_json)) or os.path.exists(journal_path(task_json) + ".old"):
+            return [Task.from_dict(task) for task in self.load(task_json)]
+        rows = self.read_cache(task_json)
+        if rows is not None:
+            try:
+                return [Task.from_slots(row) for row in rows]
+            except (ValueError, TypeError):
+                # Rows not laid out the way this version writes them, parses the store instead
+                pass
+        try:
+            with open(task_json, 'rb') as taskfile:
+                info = os.fstat(taskfile.fileno())
+                raw = taskfile.read()
+        except FileNotFoundError:
+            return []
+        tasks = [Task.from_dict(task) for task in json.loads(raw.decode("utf-8"))]
+        self.write_cache(task_json, tasks, info)
+        return tasks
+
+    def cache_path(self, task_json):
+        return task_json + ".cache"
+
+    def _cache_key(self, info):
+        # A save always makes a new file (see atomic_write), so the inode changes even when mtime and size don't
+        return [self.CACHE_VERSION, info.st_mtime_ns, info.st_size, info.st_ino]
+
+    def read_cache(self, task_json):
+        '''
+        The snapshot cache is the store already parsed and encoded, one
+        Task.slot_values() row per task, written with marshal (much quicker to read
+        back than JSON, and unlike pickle it can't run code) and tagged with the JSON
+        file's mtime, size and inode. Gives back the rows if it still matches the
+        file, None if it's missing, out of date or wasn't written by this user (a
+        shared store's directory may be writable by others).
+        '''
+        try:
+            info = os.stat(task_json)
+            with open(self.cache_path(task_json), 'rb') as cachefile:
+                if hasattr(os, "getuid") and os.fstat(cachefile.fileno()).st_uid != os.getuid():
+                    return None
+                data = cachefile.read()
+            # marshal.load on the file reads it a few bytes at a time, loads on the bytes doesn't
+            key, rows = marshal.loads(data)
+            if key != self._cache_key(info):
+                return None
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        return rows if type(rows) is list else None
+
+    def write_cache(self, task_json, tasks, info):
+        # tasks are Task objects, info the os.stat of the file they were read from, taken before reading it
+        snapshot = [task.slot_values() for task in tasks]
+
+        def write(cachefile):
+            marshal.dump((self._cache_key(info), snapshot), cachefile)
+        try:
+            atomic_write(self.cache_path(task_json), write, binary=True)
+        except (OSError, ValueError):
+            # No cache is only slower, not worth failing over (ValueError: a value marshal can't write)
+            pass
+
+    def remove_cache(self, task_json):
+        # After a save the cache is out of date, no point keeping a second copy of the store about
+        try:
+            os.remove(self.cache_path(task_json))
+        except FileNotFoundError:
+            pass
+
+    def iter(self, task_json, chunk_size=64 * 1024):
+        '''
+        Parses the JSON array incrementally, chunk_size characters at a time.
+        Only the current chunk and task are held in memory.
+        '''
+        # Journal replay needs the whole list, so fall back to a normal load
+        if os.path.exists(journal_path(task_json)) or os.path.exists(journal_path(task_json) + ".old"):
+            yield from self.load(task_json)
+            return
+        if not os.path.exists(task_json):
+            return
+
+        decoder = json.JSONDecoder()
+        with open(task_json, 'r', encoding="utf-8") as taskfile:
+            buffer = taskfile.read(chunk_size)
+            position = 0
+            started = False
+            end_of_file = not buffer
+            while True:
+                # Skips whitespace plus the array's brackets and commas between tasks
+                while position < len(buffer) and buffer[position] in " \t\r\n,[":
+                    if buffer[position] == "[":
+                        started = True
+                    position += 1
+                if position < len(buffer) and buffer[position] == "]":
+                    return
+                if position < len(buffer) and started:
+                    try:
+                        task, position = decoder.raw_decode(buffer, position)
+                        yield task
+                        continue
+                    except ValueError:
+                        # Task is cut off at the end of the chunk, needs more data
+                        if end_of_file:
+                            raise
+                elif end_of_file:
+                    if started:
+                        raise ValueError(f"Unexpected end of file in {task_json}")
+                    return
+
+                # Drops what's been parsed and reads the next chunk
+                chunk = taskfile.read(chunk_size)
+                end_of_file = not chunk
+                buffer = buffer[position:] + chunk
+                position = 0
+
+    def save(self, task_dir, tasks):
+        '''
+        with the TASKS_FILE json open as taskfile, 
+        append tasks to taskfile with an indent of 4 so it isn't grumpy
+        '''
+        with _journal_lock:
+            atomic_write(task_dir, lambda taskfile: json.dump(tasks, taskfile, indent=4, default=task_to_json))
+            raise_id_mark(task_dir, highest_id(tasks))
+            self.remove_cache(task_dir)
+            # A full save already contains every journaled edit, so the journals are done with
+            for leftover in (journal_path(task_dir), journal_path(task_dir) + ".old"):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+
+    def extend(self, task_dir, new_tasks):
+        '''
+        Adds new_tasks to the end of the store in a single write. Old and new tasks
+        are streamed into a temp file one at a time, which then replaces the store.
+        '''
+        import textwrap
+        highest = 0
+
+        def write(taskfile):
+            nonlocal highest
+            taskfile.write("[")
+            separator = "\n"
+            for task in chain(self.iter(task_dir), new_tasks):
+                taskfile.write(separator + textwrap.indent(json.dumps(task, indent=4, default=task_to_json), "    "))
+                highest = max(highest, highest_id([task]))
+                separator = ",\n"
+            taskfile.write("\n]" if separator != "\n" else "]")
+
+        # Leaves the store exactly as it was if anything goes wrong mid-import
+        with _journal_lock:
+            atomic_write(task_dir, write)
+            raise_id_mark(task_dir, highest)
+            self.remove_cache(task_dir)
+            for leftover in (journal_path(task_dir), journal_path(task_dir) + ".old"):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+
+    @property
+    def in_place(self):
+        # Journaled, an edit is written on its own (see BackgroundWriter), otherwise the array is rewritten whole
+        return JOURNAL_MODE
+
+    def next_id(self, task_json):
+        return read_id_mark(task_json)
+
+    def commit(self, task_dir, records):
+        # Journaled, the records are appended as they are and replayed on load
+        if JOURNAL_MODE:
+            append_journal_records(task_dir, records)
+            raise_id_mark(task_dir, highest_id(record["task"] for record in records if "task" in record))
+            self.compact_if_due(task_dir)
+            return
+        # Otherwise they're applied on top of what's on disk right now
+        tasks = self.load(task_dir)
+        apply_records(tasks, records, self.next_id(task_dir))
+        self.save(task_dir, tasks)
+
+    def apply_change(self, task_dir, tasks, op, index, fields=None, task_id=None):
+        # Without the journal a JSON array can only be rewritten whole
+        if not JOURNAL_MODE:
+            self.save(task_dir, tasks)
+            return
+
+        if op == "update" and fields is not None:
+            append_journal(task_dir, op, index, fields=fields)
+        else:
+            append_journal(task_dir, op, index, None if op == "delete" else tasks[index])
+        if op != "delete":
+            raise_id_mark(task_dir, highest_id([tasks[index]]))
+        self.compact_if_due(task_dir, tasks)
+
+    def compact_if_due(self, task_dir, tasks=None):
+        '''
+        Kicks off compaction once the journal is big enough (and one isn't already
+        running). tasks is the whole list as it stands, without it the store is loaded.
+        '''
+        journal = journal_path(task_dir)
+        with _journal_lock:
+            if os.path.getsize(journal) < JOURNAL_COMPACT_BYTES or os.path.exists(journal + ".old"):
+                return
+            # Rotating the journal and copying the list are both quick, the slow write happens off-thread
+            os.replace(journal, journal + ".old")
+            snapshot = [dict(task) for task in tasks] if tasks is not None else self.load(task_dir)
+            checkpoint = file_state(task_dir)
+        threading.Thread(target=compact_journal, args=(task_dir, snapshot, checkpoint)).start()
+
+class SqliteStorage:
+    '''
+    Keeps tasks as rows of a SQLite table, ordered by their rowid, which is also
+    the task's ID. Edits touch one row (found by ID), and lookups/filters go
+    through the indexes instead of needing every task in memory.
+    '''
+
+    # Edits are single row writes, so the background writer hands over change records (see commit)
+    in_place = True
+
+    # has_description is stored JSON-encoded so True and "True" both survive the trip
+    COLUMNS = ["name", "description", "has_description", "importance", "date_made", "due_date", "status", "rag"]
+
+    def __init__(self):
+        self._connections = {}
+
+    def connect(self, task_db):
+        # One connection per file, reused between calls
+        if task_db not in self._connections:
+            import sqlite3
+            connection = sqlite3.connect(task_db, check_same_thread=False)
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS tasks (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                + ", ".join(f"{column} TEXT" for column in self.COLUMNS) + ")"
+            )
+            for column in ("status", "importance", "due_date", "rag"):
+                connection.execute(f"CREATE INDEX IF NOT EXISTS idx_tasks_{column} ON tasks ({column})")
+            connection.commit()
+            self._connections[task_db] = connection
+        return self._connections[task_db]
+
+    def close(self, task_db):
+        connection = self._connections.pop(task_db, None)
+        if connection is not None:
+            connection.close()
+
+    def _to_row(self, task):
+        return [json.dumps(task.get(column)) if column == "has_description" else task.get(column) for column in self.COLUMNS]
+
+    def _to_task(self, row):
+        # Rows are selected as the COLUMNS then id
+        task = dict(zip(self.COLUMNS, row))
+        task["has_description"] = json.loads(task["has_description"]) if task["has_description"] is not None else None
+        task["id"] = row[-1]
+        return task
+
+    def _select(self):
+        return f"SELECT {', '.join(self.COLUMNS)}, id FROM tasks"
+
+    def _row_id(self, task_db, index, task_id=None):
+        # Rows are found by task ID, a task from before IDs falls back to its list position.
+        # That's an OFFSET scan through every row before it, but every row has its rowid as its
+        # ID, so only edits to a list that wasn't loaded from the database ever get here
+        if valid_id(task_id):
+            return task_id
+        row = self.connect(task_db).execute("SELECT id FROM tasks ORDER BY id LIMIT 1 OFFSET ?", (int(index),)).fetchone()
+        return row[0] if row else None
+
+    def next_id(self, task_db):
+        # AUTOINCREMENT remembers the highest row id ever used, so a deleted task's ID isn't handed out again
+        row = self.connect(task_db).execute("SELECT seq FROM sqlite_sequence WHERE name = 'tasks'").fetchone()
+        return row[0] + 1 if row else 1
+
+    def load(self, task_db):
+        return list(self.iter(task_db))
+
+    def iter(self, task_db):
+        cursor = self.connect(task_db).execute(self._select() + " ORDER BY id")
+        for row in cursor:
+            yield self._to_task(row)
+
+    def save(self, task_db, tasks):
+        # Full replace, all in one transaction. Tasks keep their IDs as row ids (a missing or
+        # clashing one gets a new one from SQLite)
+        taken = set()
+
+        def rows():
+            for task in tasks:
+                task_id = task.get('id')
+                if not valid_id(task_id) or task_id in taken:
+                    task_id = None
+                taken.add(task_id)
+                yield self._to_row(task) + [task_id]
+        connection = self.connect(task_db)
+        with connection:
+            connection.execute("DELETE FROM tasks")
+            connection.executemany(
+                f"INSERT INTO tasks ({', '.join(self.COLUMNS)}, id) VALUES ({', '.join('?' * (len(self.COLUMNS) + 1))})", rows()
+            )
+
+    def apply_change(self, task_db, tasks, op, index, fields=None, task_id=None):
+        # One change is one row, and its own transaction
+        if op == "add":
+            self.insert(task_db, tasks[index])
+        elif op == "update":
+            self.update(task_db, self._row_id(task_db, index, tasks[index].get('id')), tasks[index], fields)
+        elif op == "delete":
+            self.delete(task_db, self._row_id(task_db, index, task_id))
+
+    def extend(self, task_db, new_tasks):
+        # All the new rows go in under one transaction, runs of tasks without an ID in one executemany
+        from itertools import groupby
+        connection = self.connect(task_db)
+        with connection:
+            for has_id, group in groupby(new_tasks, key=lambda task: valid_id(task.get('id'))):
+                if has_id:
+                    for task in group:
+                        self._insert(connection, task)
+                    continue
+                connection.executemany(
+                    f"INSERT INTO tasks ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(self.COLUMNS))})",
+                    (self._to_row(task) for task in group),
+                )
+
+    def commit(self, task_db, records):
+        # Row-level and one transaction for the lot, SQLite does its own locking between processes.
+        # Records for a task that's gone (deleted by someone else) find no row and do nothing
+        connection = self.connect(task_db)
+        with connection:
+            for record in records:
+                if record["op"] == "add":
+                    self._insert(connection, record["task"])
+                elif record["op"] == "update":
+                    self._update(connection, self._row_id(task_db, record["index"], record.get("id")), record.get("task"), record.get("fields"))
+                elif record["op"] == "delete":
+                    self._delete(connection, self._row_id(task_db, record["index"], record.get("id")))
+
+    def insert(self, task_db, task):
+        connection = self.connect(task_db)
+        with connection:
+            self._insert(connection, task)
+
+    def update(self, task_db, task_id, task, fields=None):
+        connection = self.connect(task_db)
+        with connection:
+            self._update(connection, task_id, task, fields)
+
+    def delete(self, task_db, task_id):
+        connection = self.connect(task_db)
+        with connection:
+            self._delete(connection, task_id)
+
+    def _insert(self, connection, task):
+        # The task's ID becomes its row id if it's free, otherwise SQLite picks one and the task gets that
+        placeholders = ", ".join("?" * len(self.COLUMNS))
+        if valid_id(task.get('id')):
+            cursor = connection.execute(
+                f"INSERT OR IGNORE INTO tasks ({', '.join(self.COLUMNS)}, id) VALUES ({placeholders}, ?)", self._to_row(task) + [task['id']]
+            )
+            if cursor.rowcount:
+                return
+        cursor = connection.execute(f"INSERT INTO tasks ({', '.join(self.COLUMNS)}) VALUES ({placeholders})", self._to_row(task))
+        task['id'] = cursor.lastrowid
+
+    def _update(self, connection, task_id, task, fields=None):
+        # With fields given, only those columns are written
+        columns = self.COLUMNS if fields is None else [column for column in self.COLUMNS if column in fields]
+        if not columns or task_id is None:
+            return
+        values = self._to_row(task if fields is None else fields)
+        values = [value for column, value in zip(self.COLUMNS, values) if column in columns]
+        connection.execute(f"UPDATE tasks SET {', '.join(column + ' = ?' for column in columns)} WHERE id = ?", values + [task_id])
+
+    def _delete(self, connection, task_id):
+        if task_id is not None:
+            connection.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+
+    def count(self, task_db):
+        return self.connect(task_db).execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+    def get(self, task_db, index):
+        # Fetches a single task by list position without loading the rest
+        row = self.connect(task_db).execute(self._select() + " ORDER BY id LIMIT 1 OFFSET ?", (int(index),)).fetchone()
+        return self._to_task(row) if row else None
+
+    def find(self, task_db, due_before=None, due_after=None, **filters):
+        '''
+        Yields tasks matching column=value filters, e.g. find(db, status="Pending", rag="red"),
+        and due strictly before/after the YYYY-MM-DD dates given.
+        Uses the status/importance/due_date/rag indexes.
+        '''
+        for column in filters:
+            if column not in self.COLUMNS:
+                raise ValueError(f"Unknown column: {column}")
+        conditions = [f"{column} = ?" for column in filters]
+        values = list(filters.values())
+        # Zero-padded dates sort as text. Anything else (2024-1-5 passes validate_date too) is
+        # let through for the caller to check, the same as a value that isn't a date at all
+        for operator, bound in (("<", due_before), (">", due_after)):
+            if bound is not None:
+                conditions.append(f"(due_date {operator} ? OR length(due_date) != 10)")
+                values.append(ordinal_date(date_ordinal(bound)))
+        where = " AND ".join(conditions) or "1"
+        cursor = self.connect(task_db).execute(self._select() + f" WHERE {where} ORDER BY id", values)
+        for row in cursor:
+            yield self._to_task(row)
+
+    def query(self, task_db, status=None, importance=None, rag=None, due_before=None, due_after=None):
+        '''
+        filter_tasks for a database: yields (task number, task) for the matching tasks, with
+        find picking out the rows. Stored RAG ratings go stale, so those (and odd due dates)
+        are checked by filter_tasks on just the rows found.
+        '''
+        filters = {column: value for column, value in (("status", status), ("importance", importance)) if value is not None}
+        connection = self.connect(task_db)
+        number, last_id = 0, 0
+        for _, task in filter_tasks(self.find(task_db, due_before, due_after, **filters), rag=rag, due_before=due_before, due_after=due_after):
+            # Matches come in ID order, so each one's number is the last one's plus the rows
+            # in between (counted on the rowid, nothing past the last match is read)
+            number += connection.execute("SELECT COUNT(*) FROM tasks WHERE id > ? AND id <= ?", (last_id, task['id'])).fetchone()[0]
+            last_id = task['id']
+            yield number, task
+
+class LazyTaskList(MutableSequence):
+    '''
+    The task list for a memory-mapped .tbin store. A record is only decoded (and
+    then kept) the first time something looks at it, so opening a huge store or
+    showing one page of it touches just those records. Adding or removing tasks
+    turns it into an ordinary list first.
+    '''
+
+    def __init__(self, store):
+        self.store = store
+        self.decoded = {}
+        self.tasks = None
+
+    def _materialize(self):
+        if self.tasks is None:
+            self.tasks = [self[index] for index in range(len(self.store))]
+        return self.tasks
+
+    def __len__(self):
+        return len(self.tasks) if self.tasks is not None else len(self.store)
+
+    def __getitem__(self, index):
+        if self.tasks is not None:
+            return self.tasks[index]
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("task index out of range")
+        if index not in self.decoded:
+            self.decoded[index] = self.store.decode(index)
+        return self.decoded[index]
+
+    def __setitem__(self, index, value):
+        self._materialize()[index] = value
+
+    def __delitem__(self, index):
+        del self._materialize()[index]
+
+    def insert(self, index, value):
+        self._materialize().insert(index, value)
+
+    def ids(self):
+        # Every task's ID in order, read from the records so nothing gets decoded for it
+        if self.tasks is not None:
+            return [task.get('id') for task in self.tasks]
+        return [self.decoded[index].get('id') if index in self.decoded else self.store.id_at(index) for index in range(len(self.store))]
+
+class BinaryTaskStore:
+    '''
+    Read side of the .tbin format, opened with mmap. The layout is
+
+        header   magic, task count
+        records  one fixed-width RECORD per task: due/made date ordinals,
+                 importance/status/rag/has_description codes,
+                 (offset, length) pairs pointing into the heap and the
+                 task's ID (0 for none)
+        heap     utf-8 names and descriptions, plus a small JSON blob for
+                 any task with values the fixed columns can't hold
+
+    so record N can be found and decoded without reading anything else.
+    '''
+
+    MAGIC = b"TTBIN\x00\x02\x00"
+    HEADER = struct.Struct("<8sQ")
+    RECORD = struct.Struct("<iiBBBBQIQIQIQ")
+    # Version 1 files, from before records had the ID column, can still be read
+    MAGIC_V1 = b"TTBIN\x00\x01\x00"
+    RECORD_V1 = struct.Struct("<iiBBBBQIQIQI")
+    # Code for "this value lives in the extra blob instead"
+    NO_CODE = 255
+
+    def __init__(self, task_bin):
+        with open(task_bin, 'rb') as binfile:
+            self.map = mmap.mmap(binfile.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = self.HEADER.unpack_from(self.map, 0)
+        if magic not in (self.MAGIC, self.MAGIC_V1):
+            raise ValueError(f"{task_bin} is not a task store")
+        self.record = self.RECORD if magic == self.MAGIC else self.RECORD_V1
+        self.heap = self.HEADER.size + self.count * self.record.size
+
+    def __len__(self):
+        return self.count
+
+    def _text(self, offset, length):
+        return self.map[self.heap + offset:self.heap + offset + length].decode("utf-8")
+
+    def id_at(self, index):
+        # Just the task's ID, without decoding the rest of it (None if it hasn't got one)
+        record = self.record.unpack_from(self.map, self.HEADER.size + index * self.record.size)
+        if self.record is self.RECORD and record[12]:
+            return record[12]
+        # Odd IDs (and every ID in a version 1 file) are in the extra blob, if there is one
+        return self.decode(index).get('id') if record[11] else None
+
+    def decode(self, index):
+        (due, made, importance, status, rag, has_description,
+         name_at, name_length, description_at, description_length, extra_at, extra_length, *task_id) = self.record.unpack_from(
+            self.map, self.HEADER.size + index * self.record.size)
+        extra = json.loads(self._text(extra_at, extra_length)) if extra_length else {}
+        raw, missing = extra.get("fields", {}), extra.get("missing", ())
+
+        coded = {
+            "name": lambda: self._text(name_at, name_length),
+            "description": lambda: self._text(description_at, description_length),
+            "has_description": lambda: DESCRIPTION_FLAGS[has_description],
+            "importance": lambda: IMPORTANCE_LEVELS[importance],
+            "date_made": lambda: ordinal_date(made),
+            "due_date": lambda: ordinal_date(due),
+            "status": lambda: TASK_STATUSES[status],
+            "rag": lambda: RAG_RATINGS[rag],
+        }
+        task = {}
+        for key in Task.FIELDS:
+            if key in raw:
+                task[key] = raw[key]
+            elif key == "id":
+                # 0 is "no ID", and a version 1 record has any ID in its extra blob
+                if task_id and task_id[0]:
+                    task[key] = task_id[0]
+            elif key not in missing:
+                task[key] = coded[key]()
+        task.update(extra.get("other", {}))
+        return task
+
+    def close(self):
+        self.map.close()
+
+class BinaryStorage:
+    '''
+    Compact binary store (.tbin), see BinaryTaskStore for the layout.
+    load() hands back a LazyTaskList, so records are decoded as they're used.
+    '''
+
+    # Tells load_compact_tasks this backend already loads lazily
+    lazy = True
+
+    def load(self, task_bin):
+        if not os.path.exists(task_bin):
+            return []
+        return LazyTaskList(BinaryTaskStore(task_bin))
+
+    def iter(self, task_bin):
+        if not os.path.exists(task_bin):
+            return
+        store = BinaryTaskStore(task_bin)
+        for index in range(len(store)):
+            yield store.decode(index)
+
+    def _encode(self, task, heap):
+        # Packs one task into a RECORD, anything that doesn't fit a column goes in the extra blob
+        def text(value):
+            offset = len(heap)
+            heap.extend(value.encode("utf-8"))
+            return offset, len(heap) - offset
+
+        extra = {"fields": {}, "missing": [], "other": {}}
+        columns = {}
+        for key in Task.FIELDS:
+            if key not in task:
+                # An ID column of 0 already says there isn't one
+                if key != "id":
+                    extra["missing"].append(key)
+                columns[key] = 0
+                continue
+            value = task[key]
+            if key in ("name", "description"):
+                if isinstance(value, str):
+                    columns[key] = value
+                    continue
+                columns[key] = ""
+            elif key == "id":
+                if valid_id(value) and value < 2 ** 64:
+                    columns[key] = value
+                    continue
+                columns[key] = 0
+            elif key in Task._DATES:
+                code = _encode_date(value)
+                if type(code) is int:
+                    columns[key] = code
+                    continue
+                columns[key] = 0
+            else:
+                code = _encode_choice(value, Task._CODES[key])
+                if type(code) is int:
+                    columns[key] = code
+                    continue
+                columns[key] = BinaryTaskStore.NO_CODE
+            extra["fields"][key] = value
+        for key, value in task.items():
+            if key not in Task.FIELDS:
+                extra["other"][key] = value
+
+        extra = {part: value for part, value in extra.items() if value}
+        name = text(columns["name"] or "")
+        description = text(columns["description"] or "")
+        blob = text(json.dumps(extra, separators=(",", ":"), default=task_to_json)) if extra else (0, 0)
+        return BinaryTaskStore.RECORD.pack(
+            columns["due_date"], columns["date_made"], columns["importance"], columns["status"], columns["rag"],
+            columns["has_description"], *name, *description, *blob, columns["id"])
+
+    def save(self, task_bin, tasks):
+        heap = bytearray()
+        records = bytearray()
+        count = 0
+        for task in tasks:
+            records += self._encode(task, heap)
+            count += 1
+
+        def write(binfile):
+            binfile.write(BinaryTaskStore.HEADER.pack(BinaryTaskStore.MAGIC, count))
+            binfile.write(records)
+            binfile.write(heap)
+        atomic_write(task_bin, write, binary=True)
+        raise_id_mark(task_bin, highest_id(tasks))
+
+    def next_id(self, task_bin):
+        return read_id_mark(task_bin)
+
+    def apply_change(self, task_bin, tasks, op, index, fields=None, task_id=None):
+        self.save(task_bin, tasks)
+
+    def extend(self, task_bin, new_tasks):
+        self.save(task_bin, list(chain(self.iter(task_bin), new_tasks)))
+
+    def commit(self, task_bin, records):
+        tasks = list(self.iter(task_bin))
+        apply_records(tasks, records, self.next_id(task_bin))
+        self.save(task_bin, tasks)
+
+class CompressedStorage:
+    '''
+    Compressed JSON store (tasks.json.gz or tasks.json.xz). Every string (field
+    names, the same long descriptions over and over, statuses...) is written once
+    into a shared table that tasks point into by number, then the whole payload is
+    compressed with gzip or lzma. Loading hands back plain task dicts whose equal
+    strings are the same object, so repeats don't cost memory either.
+    '''
+
+    FORMAT = "task-tracker/interned-json"
+
+    def __init__(self, codec):
+        # "gzip" or "lzma", both from the standard library
+        self.codec = codec
+
+    def _module(self):
+        if self.codec == "lzma":
+            import lzma
+            return lzma
+        import gzip
+        return gzip
+
+    def load(self, task_path):
+        if not os.path.exists(task_path):
+            return []
+        with open(task_path, 'rb') as taskfile:
+            payload = json.loads(self._module().decompress(taskfile.read()).decode("utf-8"))
+        if payload.get("format") != self.FORMAT:
+            raise ValueError(f"{task_path} isn't a compressed task store")
+        strings = payload["strings"]
+        tasks = []
+        # Each task is [key, value, key, value, ...], numbers are positions in strings
+        # and anything else comes boxed in a one item list
+        for flat in payload["tasks"]:
+            task = {}
+            for position in range(0, len(flat), 2):
+                value = flat[position + 1]
+                task[strings[flat[position]]] = strings[value] if type(value) is int else value[0]
+            tasks.append(task)
+        return tasks
+
+    def iter(self, task_path):
+        yield from self.load(task_path)
+
+    def save(self, task_path, tasks):
+        table = {}
+        flat_tasks = []
+        for task in tasks:
+            flat = []
+            for key, value in task.items():
+                flat.append(table.setdefault(key, len(table)))
+                flat.append(table.setdefault(value, len(table)) if isinstance(value, str) else [value])
+            flat_tasks.append(flat)
+        payload = {"format": self.FORMAT, "version": 1, "strings": list(table), "tasks": flat_tasks}
+        data = json.dumps(payload, separators=(",", ":"), default=task_to_json).encode("utf-8")
+        # gzip at the gzip tool's usual level 6 (its default of 9 is twice as slow for ~1% smaller),
+        # lzma at its default, .xz is for when size matters more than save time
+        compressed = self._module().compress(data, compresslevel=6) if self.codec == "gzip" else self._module().compress(data)
+        atomic_write(task_path, lambda taskfile: taskfile.write(compressed), binary=True)
+        raise_id_mark(task_path, highest_id(tasks))
+
+    def next_id(self, task_path):
+        return read_id_mark(task_path)
+
+    def apply_change(self, task_path, tasks, op, index, fields=None, task_id=None):
+        # One compressed blob, so it's always written whole
+        self.save(task_path, tasks)
+
+    def extend(self, task_path, new_tasks):
+        self.save(task_path, list(chain(self.iter(task_path), new_tasks)))
+
+    def commit(self, task_path, records):
+        tasks = self.load(task_path)
+        apply_records(tasks, records, self.next_id(task_path))
+        self.save(task_path, tasks)
+
+# Sharded stores (a tasks.shards directory) are split by the month of this field
+SHARD_FIELD = "date_made"
+# Which shards of a sharded store get loaded: None for all of them, "recent" for the
+# shards with unfinished tasks plus the current quarter's (see ShardedStorage.view)
+SHARD_VIEW = None
+
+def quarter_start(today=None):
+    # "YYYY-MM" of the first month of today's quarter
+    today = today or date.today()
+    return f"{today.year}-{(today.month - 1) // 3 * 3 + 1:02d}"
+
+class ShardedTaskList(list):
+    '''
+    A task list loaded from a sharded store, carrying the bookkeeping ShardedStorage
+    needs to save it: keys, the shard of each task in it, and offsets, for each shard
+    it has tasks of, how many of that shard's tasks on disk come before the first one
+    in the list (0 when the whole shard was loaded). Copies keep the bookkeeping, so a
+    snapshot of the list saves the same way the list itself would.
+    '''
+
+    def __init__(self, tasks=(), keys=None, offsets=None):
+        super().__init__(tasks)
+        self.keys = [] if keys is None else keys
+        self.offsets = {} if offsets is None else offsets
+
+    def copy(self):
+        return ShardedTaskList(self, list(self.keys), self.offsets)
+
+class ShardedStorage:
+    '''
+    Store split up by time: a directory (tasks.shards) with one JSON array per
+    month of SHARD_FIELD ("2024-10.json") and a manifest.json listing each shard's
+    task count, unfinished count and hash. Completed tasks from before the archive
+    cutoff go in cold shards ("2024-10.archive.json"), see archive. Loading only
+    reads the shards the current view needs, and an edit rewrites just the
+    shard(s) the task was in and ends up in.
+    '''
+
+    MANIFEST = "manifest.json"
+    COLD = ".archive"
+
+    def read_manifest(self, task_dir):
+        try:
+            with open(os.path.join(task_dir, self.MANIFEST), 'r', encoding="utf-8") as manifestfile:
+                return json.load(manifestfile)
+        except FileNotFoundError:
+            return {"field": SHARD_FIELD, "archived_before": None, "shards": {}}
+
+    def write_manifest(self, task_dir, manifest):
+        atomic_write(os.path.join(task_dir, self.MANIFEST), lambda manifestfile: json.dump(manifest, manifestfile, indent=4, sort_keys=True))
+
+    def shard_of(self, task, manifest):
+        # "2024-10", or "2024-10.archive" for a completed task from before the archive cutoff
+        normal = _normal_date(str(task.get(manifest["field"])))
+        month = normal[:7] if normal else "undated"
+        cutoff = manifest["archived_before"]
+        if cutoff and month < cutoff and task.get("status") == "Completed":
+            return month + self.COLD
+        return month
+
+    def shard_order(self, shards):
+        # Archived shards first, then by month, which keeps newly made tasks at the end
+        return sorted(shards, key=lambda shard: (not shard.endswith(self.COLD), shard))
+
+    def view(self, manifest, view=None, today=None):
+        '''
+        The shards a view needs, in load order. view is None for everything or
+        "recent" for every shard with unfinished tasks plus this quarter's (and later)
+        '''
+        if view is None:
+            return self.shard_order(manifest["shards"])
+        if view == "recent":
+            quarter = quarter_start(today)
+            return self.shard_order(shard for shard, info in manifest["shards"].items()
+                                    if info["open"] or (not shard.endswith(self.COLD) and shard >= quarter))
+        raise ValueError(f"Unknown view: {view}")
+
+    def shard_path(self, task_dir, shard):
+        return os.path.join(task_dir, shard + ".json")
+
+    def read_shard(self, task_dir, shard):
+        try:
+            with open(self.shard_path(task_dir, shard), 'r', encoding="utf-8") as shardfile:
+                return json.load(shardfile)
+        except FileNotFoundError:
+            return []
+
+    def write_shard(self, task_dir, manifest, shard, tasks):
+        # Writes one shard and updates its manifest entry (the manifest itself is written by the caller)
+        import hashlib
+        path = self.shard_path(task_dir, shard)
+        if not tasks:
+            manifest["shards"].pop(shard, None)
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        data = json.dumps(tasks, indent=4, default=task_to_json).encode("utf-8")
+        sha1 = hashlib.sha1(data).hexdigest()
+        # A shard that comes out the same as before isn't written again
+        if manifest["shards"].get(shard, {}).get("sha1") != sha1 or not os.path.exists(path):
+            os.makedirs(task_dir, exist_ok=True)
+            atomic_write(path, lambda shardfile: shardfile.write(data), binary=True)
+        manifest["shards"][shard] = {"count": len(tasks), "open": sum(task.get("status") != "Completed" for task in tasks), "sha1": sha1}
+        # Highest task ID ever written, so a view that only loads some shards can't hand out a taken one
+        manifest["next_id"] = max([manifest.get("next_id", 1)] + [task["id"] + 1 for task in tasks if valid_id(task.get("id"))])
+
+    def next_id(self, task_dir):
+        return self.read_manifest(task_dir).get("next_id", 1)
+
+    def load(self, task_dir):
+        manifest = self.read_manifest(task_dir)
+        return self._load(task_dir, self.view(manifest, SHARD_VIEW))
+
+    def load_compact(self, task_dir):
+        # load_compact_tasks for sharded stores, the Task list keeps load's bookkeeping
+        tasks = self.load(task_dir)
+        tasks[:] = [Task.from_dict(task) for task in tasks]
+        return tasks
+
+    def _load(self, task_dir, shards):
+        tasks = ShardedTaskList(offsets=dict.fromkeys(shards, 0))
+        for shard in shards:
+            shard_tasks = self.read_shard(task_dir, shard)
+            tasks.extend(shard_tasks)
+            tasks.keys.extend([shard] * len(shard_tasks))
+        return tasks
+
+    def iter(self, task_dir):
+        # One shard in memory at a time
+        for shard in self.view(self.read_manifest(task_dir), SHARD_VIEW):
+            yield from self.read_shard(task_dir, shard)
+
+    def save(self, task_dir, tasks):
+        '''
+        Saves a list that came from load, so shards its view skipped are kept as they
+        are. Any other list (migrate's, say) is taken to be the shards the current view
+        covers, which is the whole store unless a view is set. Shards a list never
+        loaded are never emptied, tasks are only added to them.
+        '''
+        manifest = self.read_manifest(task_dir)
+        groups = {}
+        keys = []
+        for task in tasks:
+            shard = self.shard_of(task, manifest)
+            groups.setdefault(shard, []).append(task)
+            keys.append(shard)
+        loaded = isinstance(tasks, ShardedTaskList)
+        offsets = tasks.offsets if loaded else dict.fromkeys(self.view(manifest, SHARD_VIEW), 0)
+        for shard in set(offsets) | set(groups):
+            # Tasks of this shard that the list doesn't have are kept in front of the ones it does
+            # (all of them, for a shard the list had none of until now)
+            offset = offsets.get(shard)
+            kept = [] if offset == 0 else self.read_shard(task_dir, shard)[:offset]
+            offsets[shard] = len(kept)
+            self.write_shard(task_dir, manifest, shard, kept + groups.get(shard, []))
+        self.write_manifest(task_dir, manifest)
+        if loaded:
+            tasks.keys = keys
+
+    def _position(self, manifest, keys, offsets, index, shard):
+        # Where tasks[index] goes in its shard file
+        if shard not in offsets:
+            offsets[shard] = manifest["shards"].get(shard, {}).get("count", 0)
+        return offsets[shard] + sum(1 for key in islice(keys, index) if key == shard)
+
+    def apply_change(self, task_dir, tasks, op, index, fields=None, task_id=None):
+        before = len(tasks) + {"add": -1, "update": 0, "delete": 1}[op]
+        if not isinstance(tasks, ShardedTaskList) or len(tasks.keys) != before:
+            # Not a list from load, or its bookkeeping is behind, so there's no telling which shard is whose
+            self.save(task_dir, tasks)
+            return
+        keys, offsets = tasks.keys, tasks.offsets
+        manifest = self.read_manifest(task_dir)
+        if op in ("update", "delete"):
+            old = keys[index]
+            shard = self.read_shard(task_dir, old)
+            position = self._position(manifest, keys, offsets, index, old)
+            if op == "update" and self.shard_of(tasks[index], manifest) == old:
+                shard[position] = tasks[index]
+                self.write_shard(task_dir, manifest, old, shard)
+                self.write_manifest(task_dir, manifest)
+                return
+            del shard[position]
+            del keys[index]
+            self.write_shard(task_dir, manifest, old, shard)
+        if op in ("add", "update"):
+            # New tasks, and ones whose month (or archived-ness) changed, go into their shard
+            new = self.shard_of(tasks[index], manifest)
+            position = self._position(manifest, keys, offsets, index, new)
+            shard = self.read_shard(task_dir, new)
+            shard.insert(position, tasks[index])
+            keys.insert(index, new)
+            self.write_shard(task_dir, manifest, new, shard)
+        self.write_manifest(task_dir, manifest)
+
+    def extend(self, task_dir, new_tasks):
+        # Imports are appended to whichever shards they belong in, the rest aren't touched
+        manifest = self.read_manifest(task_dir)
+        groups = {}
+        for task in new_tasks:
+            groups.setdefault(self.shard_of(task, manifest), []).append(task)
+        for shard, group in groups.items():
+            self.write_shard(task_dir, manifest, shard, self.read_shard(task_dir, shard) + group)
+        self.write_manifest(task_dir, manifest)
+
+    def commit(self, task_dir, records):
+        # Change records find their task by ID (or position) in the whole store, so this loads every shard
+        tasks = self._load(task_dir, self.view(self.read_manifest(task_dir)))
+        apply_records(tasks, records, self.next_id(task_dir))
+        self.save(task_dir, tasks)
+
+    def archive(self, task_dir, before=None):
+        '''
+        Moves completed tasks from before the month before ("YYYY-MM", default the
+        start of this quarter) into cold shards. Only shards from before the old or
+        new cutoff are read. Returns how many tasks were moved in or out of the archive.
+        '''
+        manifest = self.read_manifest(task_dir)
+        before = before or quarter_start()
+        bound = max(before, manifest["archived_before"] or before)
+        affected = [shard for shard in self.shard_order(manifest["shards"]) if shard[:7] < bound]
+        tasks = list(chain.from_iterable(self.read_shard(task_dir, shard) for shard in affected))
+        old_shards = [self.shard_of(task, manifest) for task in tasks]
+        manifest["archived_before"] = before
+        # Shards that end up with nothing left in them get removed
+        groups = {shard: [] for shard in affected}
+        moved = 0
+        for task, old in zip(tasks, old_shards):
+            shard = self.shard_of(task, manifest)
+            groups.setdefault(shard, []).append(task)
+            moved += shard != old
+        for shard, group in groups.items():
+            self.write_shard(task_dir, manifest, shard, group)
+        self.write_manifest(task_dir, manifest)
+        return moved
+
+# Storage backends by file extension, anything unknown is treated as JSON
+STORAGE_BACKENDS = {
+    ".json": JsonStorage(),
+    ".db": SqliteStorage(),
+    ".sqlite": SqliteStorage(),
+    ".tbin": BinaryStorage(),
+    ".shards": ShardedStorage(),
+    # tasks.json.gz / tasks.json.xz
+    ".gz": CompressedStorage("gzip"),
+    ".xz": CompressedStorage("lzma"),
+}
+
+def get_storage(task_dir):
+    if is_daemon_path(task_dir):
+        return DAEMON_STORAGE
+    return STORAGE_BACKENDS.get(os.path.splitext(task_dir)[1].lower(), STORAGE_BACKENDS[".json"])
+
+def archive_tasks(task_dir, before=None):
+    # Moves old completed tasks out of the way, only sharded stores have somewhere to put them
+    storage = get_storage(task_dir)
+    if not isinstance(storage, ShardedStorage):
+        raise ValueError("Only sharded (.shards) stores can be archived")
+    with store_lock(task_dir):
+        return storage.archive(task_dir, before)
+
+def migrate_tasks(source, destination):
+    '''
+    One-shot copy of a task store into another format, e.g. tasks.json -> tasks.db
+    '''
+    tasks = load_tasks(source)
+    save_tasks(destination, tasks)
+    return len(tasks)
+
+def id_mark_path(task_dir):
+    # Next task ID to hand out, for stores that can't keep it themselves (SQLite and sharded stores can)
+    return task_dir + ".ids"
+
+def read_id_mark(task_dir):
+    try:
+        with open(id_mark_path(task_dir), 'r', encoding="utf-8") as markfile:
+            return int(markfile.read())
+    except (FileNotFoundError, ValueError):
+        return 1
+
+def highest_id(tasks):
+    # Highest ID in tasks (0 for none), a lazily decoded list is read without decoding anything
+    task_ids = tasks.ids() if isinstance(tasks, LazyTaskList) else (task.get('id') for task in tasks)
+    return max((task_id for task_id in task_ids if valid_id(task_id)), default=0)
+
+def raise_id_mark(task_dir, highest):
+    '''
+    Records every ID up to highest as handed out. The mark only ever goes up, so
+    deleting the newest task doesn't free its ID for the next one to be added.
+    '''
+    if highest >= read_id_mark(task_dir):
+        atomic_write(id_mark_path(task_dir), lambda markfile: markfile.write(str(highest + 1)))
+
+def journal_path(task_dir):
+    # The journal lives right next to the store it belongs to
+    return task_dir + ".journal"
+
+def append_journal(task_dir, op, index, task=None, fields=None):
+    '''
+    Appends one compact record ({"op", "index", "task"} or, for an update of
+    a few fields, {"op", "index", "fields"}) to the journal.
+    Costs the same whether the store has 10 tasks or 200k.
+    '''
+    record = {"op": op, "index": index}
+    if task is not None:
+        record["task"] = task
+    if fields is not None:
+        record["fields"] = fields
+    append_journal_records(task_dir, [record])
+
+def append_journal_records(task_dir, records):
+    # Any number of change records in one write and one fsync
+    lines = "".join(json.dumps(record, separators=(",", ":"), default=task_to_json) + "\n" for record in records)
+    with _journal_lock:
+        with open(journal_path(task_dir), 'a', encoding="utf-8") as journal:
+            journal.write(lines)
+            journal.flush()
+            os.fsync(journal.fileno())
+
+def replay_journal(journal_file, tasks, checkpoint_hash=None):
+    '''
+    Applies journal records to tasks in order. If the journal ends with a
+    checkpoint marker matching checkpoint_hash, its edits are already in the
+    main file (compaction finished but didn't get to clean up) so it's skipped.
+    '''
+    records = []
+    with open(journal_file, 'r', encoding="utf-8") as journal:
+        for line in journal:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # A half-written last line from a crash, nothing after it can be trusted
+                break
+    if records and "checkpoint" in records[-1]:
+        if records[-1]["checkpoint"] == checkpoint_hash:
+            return tasks
+        records.pop()
+    return apply_records(tasks, records)
+
+def apply_records(tasks, records, next_id=1):
+    '''
+    Plays change records ({"op", "index", "id", "task"/"fields"}) onto a task list in
+    order. A record with an "id" goes to the task with that ID wherever it is now,
+    so an edit made against an out of date list still lands on the right task, and
+    one whose task is gone (deleted by someone else) is skipped. A new task whose ID
+    someone else's new task already took gets the next one, never below next_id
+    (the store's ID mark, so a deleted task's ID isn't handed out again). Records without an ID
+    (the journal's, which replay onto the exact list they were made against) go by index.
+    '''
+    by_id = None
+    # Tasks deleted by ID are dropped in one go at the end, rather than a list delete each
+    deleted = set()
+
+    def drop_deleted():
+        if deleted:
+            tasks[:] = [task for task in tasks if id(task) not in deleted]
+            deleted.clear()
+    for record in records:
+        op = record["op"]
+        if "id" not in record:
+            drop_deleted()
+            by_id = None
+            if op == "add":
+                tasks.append(record["task"])
+            elif op == "update" and "fields" in record:
+                tasks[record["index"]].update(record["fields"])
+            elif op == "update":
+                tasks[record["index"]] = record["task"]
+            elif op == "delete":
+                del tasks[record["index"]]
+            continue
+        if by_id is None:
+            by_id = {task.get('id'): task for task in tasks if valid_id(task.get('id')) and id(task) not in deleted}
+        if op == "add":
+            task = record["task"]
+            if task.get('id') in by_id:
+                task['id'] = max(max(by_id) + 1, next_id)
+            tasks.append(task)
+            by_id[task['id']] = task
+            continue
+        task = by_id.get(record["id"])
+        if task is None:
+            continue
+        if op == "update" and "fields" in record:
+            task.update(record["fields"])
+        elif op == "update":
+            task.clear()
+            task.update(record["task"])
+        elif op == "delete":
+            del by_id[record["id"]]
+            deleted.add(id(task))
+    drop_deleted()
+    return tasks
+
+def file_state(path):
+    # (mtime, size, inode) of path, None if it doesn't exist. Any write to it changes one of them
+    try:
+        info = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (info.st_mtime_ns, info.st_size, info.st_ino)
+
+def file_inode(path):
+    # Tells one rotated journal from the next, None if there isn't one
+    try:
+        return os.stat(path).st_ino
+    except FileNotFoundError:
+        return None
+
+def compact_journal(task_dir, snapshot, checkpoint):
+    '''
+    Folds the rotated journal (.journal.old) into a fresh checkpoint of task_dir.
+    Runs on a background thread, new edits keep going to the live journal meanwhile.
+    checkpoint is file_state(task_dir) from when the journal was rotated, if the
+    file has been written since (a full save, an import, another process) the
+    snapshot is out of date and is thrown away rather than written over it.
+    '''
+    import hashlib
+    old_journal = journal_path(task_dir) + ".old"
+    payload = json.dumps(snapshot, indent=4).encode("utf-8")
+
+    with store_lock(task_dir), _journal_lock:
+        # A save since the rotation already removed .journal.old, leaves it that way
+        if not os.path.exists(old_journal) or file_state(task_dir) != checkpoint:
+            return
+
+        # Marks the old journal as applied *before* swapping the file in, so a crash
+        # in between never replays the same edits twice
+        with open(old_journal, 'a', encoding="utf-8") as journal:
+            journal.write(json.dumps({"checkpoint": hashlib.sha1(payload).hexdigest()}) + "\n")
+            journal.flush()
+            os.fsync(journal.fileno())
+
+        atomic_write(task_dir, lambda taskfile: taskfile.write(payload.decode("utf-8")))
+        os.remove(old_journal)
+
+def show_task(tasks, task_index, number=None):
+    #A function to show a task in it's entirety, try except for safety
+    # number is what to call it (its ID), defaults to its position
+    try:
+        #Common in this program, insures index is not out of range
+        if 0 <= task_index < len(tasks):
+            task = tasks[task_index]
+            print(f"\n[bold red]{task['name']}[/bold red] [cyan]Task Details[/cyan]")
+            print(f"Task Number - {task_index + 1 if number is None else number}")
+            print(f"Description - {task['description']}")
+            print(f"Has Description - {task['has_description']}")
+            print(f"Importance - {task['importance']}")
+            print(f"Date Made - {task['date_made']}")
+            print(f"Due Date - {task['due_date']}")
+            print(f"Status - {task['status']}")
+            print(f"RAG rating - {task['rag']}")
+            '''Pause variable as an input, facilitates this typical return-pause 
+            functionality... Old-School!'''
+            input("\nPress RETURN to Continue...")
+        else:
+            print("Invalid task number")
+    except Exception as e:
+        #Exception handling, something I learned to make things pretty & professional : )
+        print(f"An error occurred while showing task details: {e}")
+
+def check_rag(due_date_string, status):
+
+    current_date = datetime.now()
+
+    due_date = datetime.strptime(due_date_string, '%Y-%m-%d')
+
+    if due_date < current_date and status != "Completed" :
+        return "red"
+    elif due_date < current_date and status == "Completed" :
+        return "amber"
+    else:
+        return "green"
+
+def page_size():
+    # How many task rows fit on screen under the title, headers and menu
+    return max(console.height - 16, 5)
+
+def page_count(tasks, size=None):
+    size = size or page_size()
+    return max((len(tasks) + size - 1) // size, 1)
+
+@lru_cache(maxsize=65536)
+def date_ordinal(date_string):
+    # "YYYY-MM-DD" -> day number, cached since the same due dates come up over and over
+    return datetime.strptime(date_string, '%Y-%m-%d').toordinal()
+
+@lru_cache(maxsize=65536)
+def ordinal_date(ordinal):
+    # day number -> "YYYY-MM-DD", the other way round
+    return date.fromordinal(ordinal).isoformat()
+
+class RagEngine:
+    '''
+    Batch version of check_rag. Due dates are held as one array of day ordinals
+    (and statuses as a completed flag per task), so rating every task is one pass
+    of integer compares against a single "today" instead of a strptime + now() each.
+    '''
+
+    def __init__(self, tasks):
+        self.due = array('l', [task.due_ordinal() if isinstance(task, Task) else date_ordinal(str(task['due_date'])) for task in tasks])
+        self.completed = bytearray([task['status'] == "Completed" for task in tasks])
+
+    def ratings(self, now=None):
+        now = now or datetime.now()
+        # check_rag compares midnight of the due date against now, so a task is late on
+        # its due day itself unless it's exactly midnight
+        cutoff = now.toordinal() + (now.time() != time.min)
+        late = ("red", "amber")
+        return [late[done] if due < cutoff else "green" for due, done in zip(self.due, self.completed)]
+
+def batch_rag(tasks, now=None):
+    # Works out the RAG rating of every task in tasks in one go, matching check_rag
+    return RagEngine(tasks).ratings(now)
+
+def task_due_ordinal(task):
+    # Due date as a day number, or None if it isn't a real YYYY-MM-DD date
+    try:
+        return task.due_ordinal() if isinstance(task, Task) else date_ordinal(str(task['due_date']))
+    except (KeyError, ValueError):
+        return None
+
+class RagMaintainer:
+    '''
+    Keeps the RAG ratings of a task list current without re-rating everything on
+    every redraw. A task's rating only changes when its due date passes or it's
+    edited, so each green task's "goes late" day sits in a min-heap: refresh()
+    pops just the ones whose day has come, and the change listener re-rates edited
+    tasks. Tasks are rated the first time refresh() is handed them, so a big
+    (or lazily decoded) store isn't rated up front.
+    '''
+
+    def __init__(self, tasks):
+        self.tasks = tasks
+        # id(task) -> (task, cutoff it goes late at, or None once it can't change with time)
+        self.rated = {}
+        self.heap = []
+        self.cutoff = None
+        # Running count of ratings worked out, handy for seeing how much a redraw cost
+        self.evaluated = 0
+        # A TaskIndex over the same list, told about every rating that changes here
+        self.index = None
+
+    def _cutoff(self, now=None):
+        # Same cutoff as RagEngine.ratings, a task is late once its due ordinal is below it
+        now = now or datetime.now()
+        return now.toordinal() + (now.time() != time.min)
+
+    def _rate(self, task, cutoff):
+        due = task_due_ordinal(task)
+        boundary = None
+        if due is not None:
+            if due < cutoff:
+                rag = ("red", "amber")[task.get('status') == "Completed"]
+            else:
+                rag, boundary = "green", due + 1
+            if task.get('rag') != rag:
+                task['rag'] = rag
+        self.rated[id(task)] = (task, boundary)
+        if boundary is not None:
+            heappush(self.heap, (boundary, id(task)))
+        self.evaluated += 1
+        return task
+
+    def refresh(self, rows=(), now=None):
+        '''
+        Re-rates the tasks whose due date has passed since the last call, plus any
+        of rows that haven't been rated yet. Returns the tasks that were re-rated
+        because of the date.
+        '''
+        cutoff = self._cutoff(now)
+        if self.cutoff is not None and cutoff < self.cutoff:
+            # The clock went backwards, so the heap can't be trusted
+            self.rated.clear()
+            self.heap = []
+        self.cutoff = cutoff
+        changed = []
+        while self.heap and self.heap[0][0] <= cutoff:
+            boundary, key = heappop(self.heap)
+            entry = self.rated.get(key)
+            # Entries for deleted tasks, or left over from before an edit, are skipped
+            if entry is not None and entry[1] == boundary:
+                changed.append(self._rate(entry[0], cutoff))
+        for task in rows:
+            if id(task) not in self.rated:
+                before = task.get('rag')
+                self._rate(task, cutoff)
+                if self.index is not None and task.get('rag') != before:
+                    self.index.on_change(self.tasks, "update", None, task)
+        if self.index is not None:
+            for task in changed:
+                self.index.on_change(self.tasks, "update", None, task)
+        return changed
+
+    def on_change(self, tasks, op, index, task):
+        if tasks is not self.tasks:
+            return
+        if op == "reload":
+            self.rated.clear()
+            self.heap = []
+        elif op == "delete":
+            self.rated.pop(id(task), None)
+        else:
+            self._rate(task, self._cutoff())
+
+    def attach(self):
+        CHANGE_LISTENERS.append(self.on_change)
+        return self
+
+    def detach(self):
+        CHANGE_LISTENERS.remove(self.on_change)
+
+class TaskIndex:
+    '''
+    Secondary indexes over a task list: hash indexes on status, importance and rag,
+    plus a sorted (due date, task) list for date ranges. Listens for changes so it
+    stays current through add_task, update_task and delete_task.
+    Tasks are keyed by identity, since list positions shift on delete.
+    '''
+
+    HASHED = ("status", "importance", "rag")
+
+    def __init__(self, tasks):
+        self.tasks = tasks
+        self.rebuild()
+
+    def rebuild(self):
+        self.hashed = {field: {} for field in self.HASHED}
+        self.keys = {}
+        for task in self.tasks:
+            self._hash(task)
+        # Sorted once at the end, an insort per task would make building the index quadratic
+        self.due = sorted((due, key) for key, (values, due) in self.keys.items() if due is not None)
+
+    def add(self, task):
+        due = self._hash(task)
+        if due is not None:
+            insort(self.due, (due, id(task)))
+
+    def _hash(self, task):
+        # Adds task to the hash indexes and returns its due ordinal, for the caller to put in self.due
+        key = id(task)
+        values = tuple(task.get(field) for field in self.HASHED)
+        due = task_due_ordinal(task)
+        self.keys[key] = (values, due)
+        for field, value in zip(self.HASHED, values):
+            self.hashed[field].setdefault(value, {})[key] = task
+        return due
+
+    def remove(self, task):
+        key = id(task)
+        values, due = self.keys.pop(key)
+        for field, value in zip(self.HASHED, values):
+            bucket = self.hashed[field][value]
+            del bucket[key]
+            if not bucket:
+                del self.hashed[field][value]
+        if due is not None:
+            del self.due[bisect_left(self.due, (due, key))]
+
+    def on_change(self, tasks, op, index, task):
+        if tasks is not self.tasks:
+            return
+        if op == "reload":
+            self.rebuild()
+            return
+        if op in ("update", "delete") and id(task) in self.keys:
+            self.remove(task)
+        if op in ("add", "update"):
+            self.add(task)
+
+    def attach(self):
+        CHANGE_LISTENERS.append(self.on_change)
+        return self
+
+    def detach(self):
+        CHANGE_LISTENERS.remove(self.on_change)
+
+    def query(self, status=None, importance=None, rag=None, due_before=None, due_after=None):
+        '''
+        Tasks matching every filter given. Equality filters are dict lookups and the
+        due range is two bisects, so the cost follows the number of matches rather
+        than the size of the store. Results come back in due date order when a date
+        range is used, otherwise in the order tasks were indexed.
+        '''
+        candidates = None
+        for field, value in (("status", status), ("importance", importance), ("rag", rag)):
+            if value is None:
+                continue
+            bucket = self.hashed[field].get(value, {})
+            if candidates is None:
+                candidates = bucket
+            else:
+                # Intersects starting from whichever side is smaller
+                small, large = sorted((candidates, bucket), key=len)
+                candidates = {key: task for key, task in small.items() if key in large}
+
+        if due_before is None and due_after is None:
+            return list((candidates if candidates is not None else {id(task): task for task in self.tasks}).values())
+
+        low = 0 if due_after is None else bisect_right(self.due, (date_ordinal(due_after), float("inf")))
+        high = len(self.due) if due_before is None else bisect_left(self.due, (date_ordinal(due_before), -1))
+        results = []
+        for due, key in islice(self.due, low, high):
+            if candidates is None:
+                # Only the date range to go on, finds the task through any hash bucket
+                results.append(self.hashed["status"][self.keys[key][0][0]][key])
+            elif key in candidates:
+                results.append(candidates[key])
+        return results
+
+def valid_id(value):
+    # Task IDs are positive whole numbers (not bools, which Python counts as ints)
+    return type(value) is int and value > 0
+
+class TaskIds:
+    '''
+    Stable task IDs. Every task carries an "id" that never changes or gets reused,
+    and this keeps an id -> list position map so showing, updating and deleting
+    by ID is a dict lookup. The map is only redone after a delete moves positions
+    about, and for a lazily decoded store (.tbin) it's built from the IDs in the
+    records, so no task has to be decoded for it. Listens for changes like
+    TaskIndex, and gives new tasks their ID before they're saved.
+    '''
+
+    def __init__(self, tasks, floor=1):
+        self.tasks = tasks
+        # Lowest ID a task without one may get (stores that only load some tasks know more)
+        self.floor = floor
+        self.rebuild()
+
+    @classmethod
+    def open(cls, task_dir, tasks):
+        '''
+        Builds the map for tasks from task_dir. Tasks from before IDs existed (or with
+        a clashing one) are numbered in list order and the store is saved once so
+        their IDs stick.
+        '''
+        storage = get_storage(task_dir)
+        ids = cls(tasks, storage.next_id(task_dir) if hasattr(storage, "next_id") else 1)
+        if ids.assigned:
+            save_tasks(task_dir, tasks)
+        return ids
+
+    def _index(self):
+        # (id -> position, positions of tasks with no usable ID)
+        task_ids = self.tasks.ids() if isinstance(self.tasks, LazyTaskList) else (task.get('id') for task in self.tasks)
+        positions = {}
+        missing = []
+        for position, task_id in enumerate(task_ids):
+            if valid_id(task_id) and task_id not in positions:
+                positions[task_id] = position
+            else:
+                missing.append(position)
+        return positions, missing
+
+    def rebuild(self):
+        self._positions, missing = self._index()
+        # Tasks without one are numbered on from the highest ID there is (or the store's ID mark,
+        # if that's higher), so an old store's tasks simply get 1, 2, 3... in order
+        self.next_id = max(self.floor, max(self._positions, default=0) + 1)
+        for position in missing:
+            self.tasks[position]['id'] = self.next_id
+            self._positions[self.next_id] = position
+            self.next_id += 1
+        self.assigned = len(missing)
+
+    def positions(self):
+        if self._positions is None:
+            self._positions = self._index()[0]
+        return self._positions
+
+    def get(self, task_id):
+        position = self.positions().get(task_id)
+        return None if position is None else self.tasks[position]
+
+    def position(self, task_id):
+        # List position of a task ID, raises ValueError for one that doesn't exist
+        position = self.positions().get(task_id)
+        if position is None:
+            raise ValueError(f"No task with ID {task_id}.")
+        return position
+
+    def on_change(self, tasks, op, index, task):
+        if tasks is not self.tasks:
+            return
+        if op == "reload":
+            self.rebuild()
+            return
+        if op == "delete":
+            # Everything after it moves up one, so unless it was the last the map is redone when next needed
+            if self._positions is not None and index == len(tasks):
+                self._positions.pop(task.get('id'), None)
+            else:
+                self._positions = None
+            return
+        if op == "add":
+            # IDs only go up, so one below next_id (copied from another task, say) could clash and gets replaced
+            if not valid_id(task.get('id')) or task['id'] < self.next_id:
+                task['id'] = self.next_id
+            self.next_id = task['id'] + 1
+            if self._positions is not None and index == len(tasks) - 1:
+                self._positions[task['id']] = index
+            else:
+                self._positions = None
+
+    def attach(self):
+        CHANGE_LISTENERS.append(self.on_change)
+        return self
+
+    def detach(self):
+        CHANGE_LISTENERS.remove(self.on_change)
+
+# Comparisons a --where clause can use, two-character ones first so "<=" isn't read as "<"
+WHERE_OPERATORS = ("<=", ">=", "!=", "=", "<", ">")
+
+def parse_where(expression, now=None):
+    '''
+    Turns a filter like "status=Completed and due_date<2024-01-01" into a function
+    that says whether a task matches. Each clause is field, operator (= != < <= >
+    >=) and value, joined with "and". Dates compare as dates, id as a number, rag
+    against the task's current rating and everything else as text. Raises
+    ValueError saying what's wrong with the expression.
+    '''
+    import re
+    import operator
+    compare = {"<=": operator.le, ">=": operator.ge, "!=": operator.ne, "=": operator.eq, "<": operator.lt, ">": operator.gt}
+    now = now or datetime.now()
+    cutoff = now.toordinal() + (now.time() != time.min)
+    clauses = []
+    for clause in re.split(r"\s+and\s+", expression.strip(), flags=re.IGNORECASE):
+        match = re.fullmatch(r"\s*(\w+)\s*(" + "|".join(map(re.escape, WHERE_OPERATORS)) + r")\s*(.*?)\s*", clause)
+        if not match:
+            raise ValueError(f"Can't understand {clause!r}, expected something like status=Completed")
+        field, op, value = match.groups()
+        value = value.strip("'\"")
+        if field not in Task.FIELDS:
+            raise ValueError(f"Unknown field {field!r}, please use one of {', '.join(Task.FIELDS)}")
+        if field in Task._DATES:
+            if not validate_date(value):
+                raise ValueError(f"Invalid date {value!r} for {field}. Please use YYYY-MM-DD.")
+            value = date_ordinal(value)
+        elif field == "id":
+            if not value.isdigit():
+                raise ValueError(f"Invalid ID {value!r}")
+            value = int(value)
+        clauses.append((field, compare[op], value))
 
-    table.add_column("T. No.", style="blue")
-    table.add_column("Task", style="cyan")
-    table.add_column("Importance", style="cyan")
-    table.add_column("Has Description", style="green")
-    table.add_column("Date Made", style="yellow")
-    table.add_column("Due Date", style="yellow")
-    table.add_column("Status", justify="right", style="orange1")
-    table.add_column("RAG rating", style="orange1")
+    def value_of(task, field):
+        if field in Task._DATES:
+            try:
+                return date_ordinal(str(task[field]))
+            except (KeyError, ValueError):
+                return None
+        if field == "rag":
+            due = task_due_ordinal(task)
+            if due is None:
+                return task.get('rag')
+            return "green" if due >= cutoff else ("red", "amber")[task.get('status') == "Completed"]
+        if field == "id":
+            return task.get('id') if valid_id(task.get('id')) else None
+        return None if field not in task else str(task[field])
 
-def load_tasks(task_json):
+    def matches(task):
+        for field, test, value in clauses:
+            current = value_of(task, field)
+            if current is None or not test(current, value):
+                return False
+        return True
+    return matches
 
-    # Uses os path to open TASKS_FILE json, if it exists. Uses json library to open loaded json
-    if os.path.exists(task_json):
-        with open(task_json, 'r', encoding="utf-8") as taskfile:
-            return json.load(taskfile)
+def commit_or_save(task_dir, tasks, records):
+    # Stores that write an edit on its own (see in_place) just get the records for what changed,
+    # the rest are saved whole from tasks (the list with the records already applied)
+    storage = get_storage(task_dir)
+    if getattr(storage, "in_place", False):
+        with store_lock(task_dir):
+            storage.commit(task_dir, records)
     else:
-        return []
+        save_tasks(task_dir, tasks)
 
-def save_tasks(task_dir, tasks):
+def delete_where(task_dir, tasks, matches):
     '''
-    with the TASKS_FILE json open as taskfile, 
-    append tasks to taskfile with an indent of 4 so it isn't grumpy
+    Bulk delete: drops every task matches(task) is true for in one pass over the
+    list and saves once, rather than a list delete and a save per task.
+    Returns how many were deleted.
     '''
-    with open(task_dir, 'w', encoding="utf-8") as taskfile:
-        json.dump(tasks, taskfile, indent=4)
+    kept = []
+    removed = []
+    for position, task in enumerate(tasks):
+        if matches(task):
+            removed.append(position)
+        else:
+            kept.append(task)
+    if not removed:
+        return 0
+    # Highest position first, so each delete leaves the positions of the rest alone
+    # (only matters for tasks without an ID, the rest are found by it)
+    records = [change_record("delete", position, tasks[position]) for position in reversed(removed)]
+    if SHARED_MODE:
+        commit_changes(task_dir, records)
+        reload_tasks(task_dir, tasks)
+    else:
+        tasks[:] = kept
+        commit_or_save(task_dir, tasks, records)
+    notify_change(tasks, "reload", None, None)
+    return len(removed)
 
-def show_task(tasks, task_index):
-    #A function to show a task in it's entirety, try except for safety
-    try:
-        #Common in this program, insures index is not out of range
-        if 0 <= task_index < len(tasks):
-            task = tasks[task_index]
-            print(f"\n[bold red]{task['name']}[/bold red] [cyan]Task Details[/cyan]")
-            print(f"Task Number - {task_index + 1}")
-            print(f"Description - {task['description']}")
-            print(f"Has Description - {task['has_description']}")
-            print(f"Importance - {task['importance']}")
-            print(f"Date Made - {task['date_made']}")
-            print(f"Due Date - {task['due_date']}")
-            print(f"Status - {task['status']}")
-            print(f"RAG rating - {task['rag']}")
-            '''Pause variable as an input, facilitates this typical return-pause 
-            functionality... Old-School!'''
-            input("\nPress RETURN to Continue...")
+def parse_assignments(assignments):
+    '''
+    Turns ["status=Completed", "importance=low"] into {field: value}, checking each
+    value the way update_task does. Raises ValueError saying what's wrong.
+    '''
+    changes = {}
+    for assignment in assignments:
+        field, equals, value = assignment.partition("=")
+        field, value = field.strip(), value.strip().strip("'\"")
+        if not equals:
+            raise ValueError(f"Can't understand {assignment!r}, expected something like status=Completed")
+        if field == "name" and not value:
+            raise ValueError("Name cannot be empty")
+        elif field == "description":
+            changes["has_description"] = bool(value)
+        elif field == "importance" and value not in IMPORTANCE_LEVELS:
+            raise ValueError("Invalid importance. Please choose from 'high', 'medium', or 'low'.")
+        elif field in Task._DATES and not validate_date(value):
+            raise ValueError(f"Invalid {field} format. Please use YYYY-MM-DD.")
+        elif field == "status" and value not in TASK_STATUSES:
+            raise ValueError("Invalid status. Please choose from 'In Progress', 'Pending', or 'Completed'.")
+        elif field == "rag" and value not in RAG_RATINGS:
+            raise ValueError("Invalid RAG rating. Please choose from 'red', 'amber', or 'green'.")
+        elif field not in ("name", "importance", "status", "rag") + Task._DATES:
+            raise ValueError(f"Can't set {field!r}, please use one of name, description, importance, date_made, due_date, status or rag")
+        changes[field] = value
+    return changes
+
+def update_where(task_dir, tasks, matches, changes, dry_run=False):
+    '''
+    Bulk update: applies changes ({field: value}) to every task matches(task) is
+    true for, in one pass over the list, then saves once. Only the tasks that
+    actually changed get their RAG rating worked out again (unless rag is being
+    set outright). Returns (matched, changed), dry_run counts without touching anything.
+    '''
+    matched = 0
+    records = []
+    for position, task in enumerate(tasks):
+        if not matches(task):
+            continue
+        matched += 1
+        edits = {field: value for field, value in changes.items() if task.get(field, _MISSING) != value}
+        if "rag" not in changes and ("status" in edits or "due_date" in edits):
+            due_date = str(edits.get("due_date", task.get('due_date')))
+            if validate_date(due_date):
+                rag = check_rag(due_date, edits.get("status", task.get('status')))
+                if rag != task.get('rag'):
+                    edits["rag"] = rag
+        if not edits:
+            continue
+        records.append(change_record("update", position, task, edits))
+        if dry_run:
+            continue
+        task.update(edits)
+        if isinstance(task, Task):
+            task.pop_changes()
+        notify_change(tasks, "update", position, task)
+    if records and not dry_run:
+        if SHARED_MODE:
+            # Merged into whatever other processes have written, as one group commit
+            commit_changes(task_dir, records)
+            reload_tasks(task_dir, tasks)
+            notify_change(tasks, "reload", None, None)
         else:
-            print("Invalid task number")
-    except Exception as e:
-        #Exception handling, something I learned to make things pretty & professional : )
-        print(f"An error occurred while showing task details: {e}")
+            commit_or_save(task_dir, tasks, records)
+    return matched, len(records)
 
-def check_rag(due_date_string, status):
+def tokenize(text):
+    # Lowercase words and numbers, "FPAD/threat-model" -> ["fpad", "threat", "model"]
+    import re
+    return re.findall(r"[a-z0-9]+", str(text).lower())
 
-    current_date = datetime.now()
+def store_signature(task_dir):
+    # Changes whenever the store (or its journal) is written, used to spot a stale search index
+    signature = []
+    for path in (task_dir, journal_path(task_dir)):
+        if os.path.exists(path):
+            info = os.stat(path)
+            signature.append([info.st_mtime_ns, info.st_size])
+    # A sharded store gives a different list for each view
+    if os.path.isdir(task_dir):
+        signature.append(SHARD_VIEW)
+    return signature
 
-    due_date = datetime.strptime(due_date_string, '%Y-%m-%d')
+class SearchIndex:
+    '''
+    Inverted index over task names and descriptions: token -> {task: weight}.
+    Name words count NAME_WEIGHT times as much as description words. Kept up to date
+    through CHANGE_LISTENERS, and saved next to the store (task_dir + ".search") so
+    the next run can load it rather than tokenizing every task again.
+    '''
 
-    if due_date < current_date and status != "Completed" :
-        return "red"
-    elif due_date < current_date and status == "Completed" :
-        return "amber"
-    else:
-        return "green"
+    NAME_WEIGHT = 3
+
+    def __init__(self, tasks, task_dir=None):
+        self.tasks = tasks
+        self.task_dir = task_dir
+        self.postings = {}
+        # Sorted list of every token, for prefix lookups
+        self.vocabulary = []
+        # task -> its token weights, only worked out once something gets edited
+        self.docs = None
+        self.documents = {}
+        # Set when an edit changed the index since it was last saved
+        self.dirty = False
+
+    @classmethod
+    def build(cls, tasks, task_dir=None):
+        index = cls(tasks, task_dir)
+        index.docs = {}
+        for task in tasks:
+            index.add(task)
+        return index
+
+    @classmethod
+    def open(cls, task_dir, tasks):
+        '''
+        Loads the saved index for task_dir if it still matches the store,
+        otherwise builds (and saves) a fresh one
+        '''
+        index_file = task_dir + ".search"
+        if os.path.exists(index_file) and not is_daemon_path(task_dir):
+            with open(index_file, 'r', encoding="utf-8") as indexfile:
+                saved = json.load(indexfile)
+            if saved["signature"] == store_signature(task_dir) and saved["count"] == len(tasks):
+                index = cls(tasks, task_dir)
+                index.documents = {id(task): task for task in tasks}
+                for token, entries in saved["postings"].items():
+                    index.postings[token] = {id(tasks[position]): weight for position, weight in entries}
+                index.vocabulary = sorted(index.postings)
+                return index
+        index = cls.build(tasks, task_dir)
+        index.save()
+        return index
+
+    def save(self):
+        # Nowhere to keep it for a daemon-backed store
+        if self.task_dir is None or is_daemon_path(self.task_dir):
+            self.dirty = False
+            return
+        positions = {id(task): position for position, task in enumerate(self.tasks)}
+        saved = {
+            "signature": store_signature(self.task_dir),
+            "count": len(self.tasks),
+            "postings": {token: [[positions[key], weight] for key, weight in entries.items()] for token, entries in self.postings.items()},
+        }
+        atomic_write(self.task_dir + ".search", lambda indexfile: json.dump(saved, indexfile, separators=(",", ":")))
+        self.dirty = False
+
+    def _weights(self, task):
+        weights = {}
+        for token in tokenize(task.get("name", "")):
+            weights[token] = weights.get(token, 0) + self.NAME_WEIGHT
+        for token in tokenize(task.get("description", "")):
+            weights[token] = weights.get(token, 0) + 1
+        return weights
+
+    def _load_docs(self):
+        # Turns the postings back round (task -> tokens) the first time an edit needs it
+        if self.docs is None:
+            self.docs = {}
+            for token, entries in self.postings.items():
+                for key, weight in entries.items():
+                    self.docs.setdefault(key, {})[token] = weight
+
+    def add(self, task):
+        self._load_docs()
+        key = id(task)
+        self.documents[key] = task
+        weights = self._weights(task)
+        self.docs[key] = weights
+        for token, weight in weights.items():
+            if token not in self.postings:
+                self.postings[token] = {}
+                insort(self.vocabulary, token)
+            self.postings[token][key] = weight
+
+    def remove(self, task):
+        self._load_docs()
+        key = id(task)
+        self.documents.pop(key, None)
+        for token in self.docs.pop(key, {}):
+            del self.postings[token][key]
+            if not self.postings[token]:
+                del self.postings[token]
+                del self.vocabulary[bisect_left(self.vocabulary, token)]
+
+    def on_change(self, tasks, op, index, task):
+        if tasks is not self.tasks:
+            return
+        self.dirty = True
+        if op == "reload":
+            self.postings, self.vocabulary, self.docs, self.documents = {}, [], {}, {}
+            for task in tasks:
+                self.add(task)
+            return
+        if op in ("update", "delete"):
+            self.remove(task)
+        if op in ("add", "update"):
+            self.add(task)
+
+    def attach(self):
+        CHANGE_LISTENERS.append(self.on_change)
+        return self
+
+    def detach(self):
+        CHANGE_LISTENERS.remove(self.on_change)
 
-def show_tasks(tasks):
+    def search(self, text, limit=20):
+        '''
+        Best matches for text, every word has to match (as a whole word or as the
+        start of one, so "thr mod" finds "Threat Model"). Scored with tf-idf,
+        exact word matches counting double a prefix match.
+        '''
+        terms = tokenize(text)
+        if not terms:
+            return []
+        total = max(len(self.documents) or len(self.tasks), 1)
 
-    # if tasks exists, enumerate over tasks, printing each and their individual details
-    if tasks:
-        #calls reset_table function for aesthetic reasons
-        reset_table()
+        # Every vocabulary token each term matches, rarest terms first so later
+        # terms only have to score the tasks still in the running
+        matches = []
+        for term in terms:
+            start = bisect_left(self.vocabulary, term)
+            tokens = list(takewhile(lambda token: token.startswith(term), islice(self.vocabulary, start, None)))
+            matches.append((sum(len(self.postings[token]) for token in tokens), term, tokens))
+        matches.sort()
 
-        for index, task in enumerate(tasks,1):
-            '''iterates over each item in tasks whilst keeping track of the index, 
-            index starts at 1 for ease.'''
-            task['rag'] = check_rag(str(task['due_date']), task['status'])
-            # Sets each row to a different colour depending on rag rating
-            # RED = late due date and incomplete, ORANGE = late due date but complete, GREEN = timely due date
-            if task['rag'] == "red":
-                table.add_row(str(index), task['name'], task['importance'], str(task['has_description']), task['date_made'], task['due_date'], task['status'], task['rag'], style="white on red")
-            elif task['rag'] == "amber" :
-                table.add_row(str(index), task['name'], task['importance'], str(task['has_description']), task['date_made'], task['due_date'], task['status'], task['rag'], style="white on orange_red1")
-            elif task['rag'] == "green" :
-                table.add_row(str(index), task['name'], task['importance'], str(task['has_description']), task['date_made'], task['due_date'], task['status'], task['rag'], style="white on green")
+        scores = None
+        for size, term, tokens in matches:
+            term_scores = {}
+            for token in tokens:
+                entries = self.postings[token]
+                boost = 2 if token == term else 1
+                idf = math.log(1 + total / len(entries))
+                if scores is None or len(entries) <= len(scores):
+                    pairs = entries.items() if scores is None else ((key, weight) for key, weight in entries.items() if key in scores)
+                else:
+                    pairs = ((key, entries[key]) for key in scores if key in entries)
+                for key, weight in pairs:
+                    term_scores[key] = term_scores.get(key, 0) + boost * weight * idf
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {key: score + scores[key] for key, score in term_scores.items()}
+            if not scores:
+                return []
+        documents = self.documents or {id(task): task for task in self.tasks}
+        import heapq
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [documents[key] for key, score in best]
+
+# Row colours for each RAG rating, as rich styles (the HTML export uses the same ones)
+# RED = late due date and incomplete, ORANGE = late due date but complete, GREEN = timely due date
+RAG_STYLES = {"red": "white on red", "amber": "white on orange_red1", "green": "white on green"}
+
+def show_tasks(tasks, limit=None, start=0, numbers=None, rag=None, by_id=False):
+
+    # tasks can be a list or a generator (see iter_tasks). Only the rows from start to
+    # start + limit are formatted, so a page costs the same however many tasks there are.
+    # numbers overrides the T. No. column (e.g. the real task numbers of query results)
+    # rag is an attached RagMaintainer for tasks, then only ratings that changed get redone
+    # by_id numbers the rows with their task IDs instead
+    if isinstance(tasks, Sequence):
+        rows = tasks[start:] if limit is None else tasks[start:start + limit]
+        title = "Tasks" if limit is None else f"Tasks (page {start // limit + 1} of {page_count(tasks, limit)}, {len(tasks)} total)"
+    else:
+        rows = islice(tasks, start, None if limit is None else start + limit)
+        title = "Tasks"
+    rows = list(rows)
+    shown = 0
+
+    #calls reset_table function for aesthetic reasons
+    reset_table(title)
 
+    # enumerate over tasks, printing each and their individual details
+    labels = range(start + 1, start + len(rows) + 1) if numbers is None else numbers[start:start + len(rows)]
+    if by_id:
+        labels = [task.get('id', "") for task in rows]
+    if rag is None:
+        for task, rating in zip(rows, batch_rag(rows)):
+            task['rag'] = rating
+    else:
+        rag.refresh(rows)
+    for index, task in zip(labels, rows):
+        '''iterates over each item in tasks whilst keeping track of the index, 
+        index starts at 1 for ease.'''
+        # Sets each row to a different colour depending on rag rating (see RAG_STYLES)
+        style = RAG_STYLES.get(task['rag'])
+        if style is not None:
+            table.add_row(str(index), task['name'], task['importance'], str(task['has_description']), task['date_made'], task['due_date'], task['status'], task['rag'], style=style)
+        shown += 1
 
-        # Prints the table using rich library to make things pretty
+    # Prints the table using rich library to make things pretty
+    if shown:
         console.print(table)
 
     # if tasks don't exist, print the below
@@ -110,8 +2453,7 @@ def show_tasks(tasks):
 
 def add_task(task_dir, tasks):
 
-    # Clears terminal, generally "prettier" :)
-    os.system('clear')
+    clear_screen()
 
     # takes in a description, due date, applies a status of "Pending" and appends to tasks
     try:
@@ -124,9 +2466,8 @@ def add_task(task_dir, tasks):
                 has_description = False
             else:
                 has_description = True
-            valid_importance = ["high", "medium", "low"]
             importance = str(input("Enter task importance (high, medium, low): "))
-            if importance not in valid_importance:
+            if importance not in IMPORTANCE_LEVELS:
                 raise ValueError("Invalid importance. Please choose from 'high', 'medium', or 'low'.")
             due_date = input("Enter due date (YYYY-MM-DD): ")
             if not validate_date(due_date):
@@ -139,27 +2480,29 @@ def add_task(task_dir, tasks):
             print(f"Error: {e}")
             input("^^^")
         tasks.append({"name": name, "description": description, "has_description": has_description, "importance": importance, "date_made": date_made, "due_date": due_date, "status": status, "rag": check_rag(due_date,status)})
-        save_tasks(task_dir, tasks)
+        record_change(task_dir, tasks, "add", len(tasks) - 1)
         print("Task added successfully.")
     except:
         print(f"Failed to add Task sucessfully")
 
 
-def delete_task(task_dir, tasks):
+def delete_task(task_dir, tasks, ids=None):
+    # ids is a TaskIds for tasks, then tasks are picked by ID rather than position
     while True:
 
         # Get user input for the task number to delete
         try:
             # takes index and removes 1 (to "interface" it to how python handles indexes)
-            task_index = int(input("Enter task number to delete (or 0 to cancel): ")) - 1
+            number = int(input(f"Enter task {'number' if ids is None else 'ID'} to delete (or 0 to cancel): "))
+            task_index = number - 1 if ids is None or number == 0 else ids.position(number)
             if task_index == -1:
                 # Facilitation of the "(or 0 to cancel)" functionality
                 print("Deletion canceled.")
                 break
             if 0 <= task_index < len(tasks):
                 #ensures index is within range & deletes task with the index selected before breaking loop
-                del tasks[task_index]
-                save_tasks(task_dir, tasks)
+                removed = tasks.pop(task_index)
+                record_change(task_dir, tasks, "delete", task_index, removed)
                 print("Task deleted successfully.")
                 break
         except ValueError as ve:
@@ -175,16 +2518,451 @@ def validate_date(date_string):
     except ValueError:
         return False
 
-def update_task(tasks):
-    # shows existing tasks, sets index to input task number
-    show_tasks(tasks)
+def build_task(row):
+    '''
+    Turns an imported row (dict of strings) into a task, using the same checks
+    as add_task. Raises ValueError saying what's wrong with the row.
+    '''
+    name = str(row.get("name") or "").strip()
+    if not name:
+        raise ValueError("Name cannot be empty")
+    description = row.get("description") or ""
+    importance = str(row.get("importance") or "").strip()
+    if importance not in IMPORTANCE_LEVELS:
+        raise ValueError("Invalid importance. Please choose from 'high', 'medium', or 'low'.")
+    due_date = str(row.get("due_date") or "").strip()
+    if not due_date:
+        raise ValueError("Date cannot be empty")
+    if not validate_date(due_date):
+        raise ValueError("Invalid due date format. Please use YYYY-MM-DD.")
+    date_made = str(row.get("date_made") or datetime.today().strftime('%Y-%m-%d')).strip()
+    if not validate_date(date_made):
+        raise ValueError("Invalid date made format. Please use YYYY-MM-DD.")
+    status = str(row.get("status") or "Pending").strip()
+    if status not in TASK_STATUSES:
+        raise ValueError("Invalid status. Please choose from 'In Progress', 'Pending', or 'Completed'.")
+    return {"name": name, "description": description, "has_description": bool(description), "importance": importance, "date_made": date_made, "due_date": due_date, "status": status, "rag": check_rag(due_date, status)}
+
+def read_import_rows(source, file_format=None):
+    '''
+    Streams (line number, row) pairs out of a CSV or NDJSON file.
+    The format comes from the extension unless file_format is given.
+    '''
+    file_format = file_format or ("csv" if source.lower().endswith(".csv") else "ndjson")
+    with open(source, 'r', encoding="utf-8", newline="") as importfile:
+        if file_format == "csv":
+            import csv
+            reader = csv.DictReader(importfile)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_number, line in enumerate(importfile, 1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    row = e
+                yield line_number, row
+
+def import_tasks(source, task_dir, file_format=None, on_error=None):
+    '''
+    Bulk import, every good row is added to task_dir in one save at the end.
+    Bad rows are handed to on_error(line, message) and skipped. Rows are streamed
+    straight into the store so memory use doesn't grow with the import size.
+    Returns (imported, rejected).
+    '''
+    counts = {"imported": 0, "rejected": 0}
+    if on_error is None:
+        on_error = lambda line, message: print(f"[red]Line {line}:[/red] {message}", file=sys.stderr)
+
+    def good_rows():
+        for line, row in read_import_rows(source, file_format):
+            try:
+                if not isinstance(row, dict):
+                    raise ValueError(f"Not a task record: {row}")
+                task = build_task(row)
+            except ValueError as e:
+                counts["rejected"] += 1
+                on_error(line, str(e))
+                continue
+            counts["imported"] += 1
+            yield task
+
+    with store_lock(task_dir):
+        get_storage(task_dir).extend(task_dir, good_rows())
+    return counts["imported"], counts["rejected"]
+
+def filter_tasks(tasks, status=None, importance=None, rag=None, due_before=None, due_after=None, now=None):
+    '''
+    Streaming version of TaskIndex.query for one pass over a store: yields
+    (task number, task) for every task matching all the filters given, with its
+    RAG rating brought up to date on the way. Nothing is kept between tasks.
+    '''
+    cutoff = now or datetime.now()
+    cutoff = cutoff.toordinal() + (cutoff.time() != time.min)
+    before = None if due_before is None else date_ordinal(due_before)
+    after = None if due_after is None else date_ordinal(due_after)
+    for number, task in enumerate(tasks, 1):
+        due = task_due_ordinal(task)
+        if due is not None:
+            task['rag'] = "green" if due >= cutoff else ("red", "amber")[task.get('status') == "Completed"]
+        if status is not None and task.get('status') != status:
+            continue
+        if importance is not None and task.get('importance') != importance:
+            continue
+        if rag is not None and task.get('rag') != rag:
+            continue
+        if before is not None or after is not None:
+            if due is None or (before is not None and due >= before) or (after is not None and due <= after):
+                continue
+        yield number, task
+
+def prompt_filters():
+    '''
+    Asks for the menu's filter, one question per field (blank to skip it), and
+    returns the filter_tasks/TaskIndex.query keywords. Raises ValueError for a
+    value that can't match anything.
+    '''
+    filters = {}
+    for field, choices in (("status", TASK_STATUSES), ("importance", IMPORTANCE_LEVELS), ("rag", RAG_RATINGS)):
+        value = input(f"{field.capitalize()} ({', '.join(choices)}, blank for any): ").strip()
+        if value and value not in choices:
+            raise ValueError(f"Invalid {field} {value!r}.")
+        filters[field] = value or None
+    for field, question in (("due_before", "Due before"), ("due_after", "Due after")):
+        value = input(f"{question} (YYYY-MM-DD, blank for any): ").strip()
+        if value and not validate_date(value):
+            raise ValueError("Invalid date format. Please use YYYY-MM-DD.")
+        filters[field] = value or None
+    return filters
+
+# Columns of the CSV export, the same names import reads back in
+EXPORT_COLUMNS = ("number", "name", "description", "has_description", "importance", "date_made", "due_date", "status", "rag")
+
+class CsvExporter:
+    '''
+    Export writers get begin(), then write(number, task) once per task, then end().
+    They write each row straight out, so nothing builds up in memory.
+    '''
+
+    def __init__(self, out):
+        import csv
+        self.writer = csv.writer(out)
+
+    def begin(self):
+        self.writer.writerow(EXPORT_COLUMNS)
+
+    def write(self, number, task):
+        self.writer.writerow([number] + [task.get(column, "") for column in EXPORT_COLUMNS[1:]])
+
+    def end(self):
+        pass
+
+class NdjsonExporter:
+    # One JSON object per line, every field of the task plus its number
+
+    def __init__(self, out):
+        self.out = out
+
+    def begin(self):
+        pass
+
+    def write(self, number, task):
+        self.out.write(json.dumps(dict(task, number=number), default=task_to_json) + "\n")
+
+    def end(self):
+        pass
+
+class HtmlExporter:
+    '''
+    A single HTML page (styles inline, nothing to fetch) with the same columns as
+    the menu's table and rows coloured from RAG_STYLES like show_tasks does
+    '''
+
+    HEADINGS = ("T. No.", "Task", "Importance", "Has Description", "Date Made", "Due Date", "Status", "RAG rating")
+
+    def __init__(self, out):
+        self.out = out
+
+    def css(self):
+        # Turns the rich styles into CSS colours, as rich draws them by default
+        from rich.style import Style
+        rules = []
+        for rating, style in RAG_STYLES.items():
+            style = Style.parse(style)
+            colours = {"color": style.color, "background": style.bgcolor}
+            rules.append(f"tr.{rating} {{ " + " ".join(f"{name}: {colour.get_truecolor().hex};" for name, colour in colours.items() if colour) + " }")
+        return "\n".join(rules)
+
+    def begin(self):
+        self.out.write("<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n<title>Tasks</title>\n<style>\n"
+                       "body { font-family: sans-serif; }\ntable { border-collapse: collapse; }\n"
+                       "th, td { padding: 2px 8px; text-align: left; }\n" + self.css() + "\n</style>\n</head>\n<body>\n"
+                       "<h1>Tasks</h1>\n<table>\n<tr>" + "".join(f"<th>{heading}</th>" for heading in self.HEADINGS) + "</tr>\n")
+
+    def write(self, number, task):
+        import html
+        cells = (number, task.get('name'), task.get('importance'), task.get('has_description'), task.get('date_made'),
+                 task.get('due_date'), task.get('status'), task.get('rag'))
+        rating = task.get('rag') if task.get('rag') in RAG_STYLES else ""
+        self.out.write(f'<tr class="{rating}">' + "".join(f"<td>{html.escape(str(cell))}</td>" for cell in cells) + "</tr>\n")
+
+    def end(self):
+        self.out.write("</table>\n</body>\n</html>\n")
+
+# Export formats by name (and file extension), see CsvExporter for what a writer looks like
+EXPORTERS = {"csv": CsvExporter, "ndjson": NdjsonExporter, "html": HtmlExporter}
+
+def export_tasks(task_dir, destination, file_format=None, **filters):
+    '''
+    Streams the tasks matching filters (see filter_tasks) from task_dir into
+    destination ("-" for stdout) as CSV, NDJSON or HTML. The format comes from the
+    extension unless file_format is given. Returns how many tasks were written.
+    '''
+    file_format = file_format or os.path.splitext(destination)[1].lstrip(".").lower()
+    if file_format not in EXPORTERS:
+        raise ValueError(f"Unknown export format {file_format!r}, please use one of {', '.join(EXPORTERS)}")
+    storage = get_storage(task_dir)
+    tasks = storage.iter(task_dir)
+    with (nullcontext(sys.stdout) if destination == "-" else open(destination, 'w', encoding="utf-8", newline="")) as out:
+        exporter = EXPORTERS[file_format](out)
+        exporter.begin()
+        count = 0
+        for number, task in filter_tasks(tasks, **filters):
+            exporter.write(number, task)
+            count += 1
+        exporter.end()
+    return count
+
+# What repair falls back to for an importance/status that doesn't resemble any known value
+REPAIR_DEFAULTS = {"importance": "medium", "status": "Pending"}
+
+@lru_cache(maxsize=65536)
+def _normal_date(date_string):
+    # "2023-3-1" -> "2023-03-01", None if it isn't a real date at all. Cached like date_ordinal
+    try:
+        return datetime.strptime(date_string.strip(), '%Y-%m-%d').strftime('%Y-%m-%d')
+    except ValueError:
+        return None
+
+def validate_task(task):
+    '''
+    Checks one stored task against the rules add_task follows and works out a
+    fixed copy. Returns (fixed, problems), problems being (field, message, fixed)
+    tuples. fixed is False for the ones that need a person, like a due date
+    that isn't a date at all, those fields are left alone.
+    '''
+    fixed = dict(task)
+    problems = []
+
+    def fix(field, value, message):
+        fixed[field] = value
+        problems.append((field, message, True))
+
+    name = task.get("name")
+    if not isinstance(name, str) and name is not None:
+        fix("name", str(name), f"Name {name!r} isn't text")
+    elif not (name or "").strip():
+        problems.append(("name", "Name cannot be empty", False))
+
+    description = task.get("description")
+    if description is None:
+        fix("description", "", "Missing description")
+    elif not isinstance(description, str):
+        fix("description", str(description), f"Description {description!r} isn't text")
+    has_description = bool(fixed["description"])
+    if task.get("has_description", _MISSING) is not has_description:
+        fix("has_description", has_description, f"has_description is {task.get('has_description')!r}, should be {has_description}")
+
+    for field, choices in (("importance", IMPORTANCE_LEVELS), ("status", TASK_STATUSES)):
+        value = task.get(field)
+        if value in choices and isinstance(value, str):
+            continue
+        # Near misses ("High", " low ") are put right, anything else gets the default
+        match = next((choice for choice in choices if choice.lower() == str(value).strip().lower()), REPAIR_DEFAULTS[field])
+        fix(field, match, f"Invalid {field} {value!r}, set to {match!r}")
+
+    for field in ("date_made", "due_date"):
+        value = task.get(field)
+        normal = _normal_date(str(value)) if value is not None else None
+        if normal is None:
+            problems.append((field, f"Invalid {field} {value!r}, please use YYYY-MM-DD", False))
+        elif normal != value:
+            fix(field, normal, f"{field} {value!r} written as {normal!r}")
+
+    if task.get("rag") not in RAG_RATINGS and _normal_date(str(fixed.get("due_date"))) is not None:
+        rag = check_rag(fixed["due_date"], fixed["status"])
+        fix("rag", rag, f"Invalid RAG rating {task.get('rag')!r}, worked out as {rag!r}")
+    return fixed, problems
+
+def _validate_chunk(tasks, repair=True):
+    '''
+    Runs in a worker process. Only tasks with something wrong come back, as
+    (offset, changes, problems) where changes is {field: fixed value}, so little
+    has to be sent back to the main process
+    '''
+    results = []
+    for offset, task in enumerate(tasks):
+        if not isinstance(task, dict):
+            results.append((offset, {}, [("task", f"Not a task record: {task!r}", False)]))
+            continue
+        fixed, problems = validate_task(task)
+        if problems:
+            changes = {field: fixed[field] for field, _, was_fixed in problems if was_fixed} if repair else {}
+            results.append((offset, changes, problems))
+    return results
+
+def _validate_part(path, start, end, repair=True):
+    '''
+    Runs in a worker process: reads and parses its own part of the store (see
+    _store_parts) and checks it with _validate_chunk. Sends back (task count,
+    results), so only the tasks with something wrong go back to the main process
+    '''
+    try:
+        with open(path, 'rb') as partfile:
+            partfile.seek(start)
+            data = partfile.read() if end is None else partfile.read(end - start)
+    except FileNotFoundError:
+        # Same as read_shard, a shard that isn't there has no tasks
+        data = b"[]"
+    # A run of tasks is the inside of the array, with the comma before the next run still on the end
+    tasks = json.loads(data if end is None else b"[" + data.rstrip().rstrip(b",") + b"]")
+    return len(tasks), _validate_chunk(tasks, repair)
+
+def _store_parts(task_dir, count):
+    '''
+    Splits the store into (path, start, end) parts that worker processes can read
+    and parse themselves: a whole shard file each (end None) for a sharded store,
+    or about count byte ranges of whole tasks for a JSON store laid out the way
+    save writes it. None for anything else (other backends, a journal to replay, a
+    hand-written file), those get streamed in by the main process instead.
+    '''
+    storage = get_storage(task_dir)
+    if isinstance(storage, ShardedStorage):
+        return [(storage.shard_path(task_dir, shard), 0, None) for shard in storage.view(storage.read_manifest(task_dir), SHARD_VIEW)]
+    if type(storage) is not JsonStorage or os.path.exists(journal_path(task_dir)) or os.path.exists(journal_path(task_dir) + ".old"):
+        return None
+    # Every task starts on a line of its own indented by four. Nothing nested inside one
+    # does, and a JSON string can't have a newline in it
+    task_start = b"\n    {"
+    try:
+        with open(task_dir, 'rb') as taskfile, mmap.mmap(taskfile.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            first, last = data.find(task_start), data.rfind(b"]")
+            if first == -1 or data[:first].strip() != b"[" or data[last + 1:].strip():
+                return None
+            bounds = [first]
+            for part in range(1, count):
+                bound = data.find(task_start, max(first + (last - first) * part // count, bounds[-1] + 1), last)
+                if bound == -1:
+                    break
+                bounds.append(bound)
+    except (OSError, ValueError):
+        # Missing, or empty (mmap can't map nothing)
+        return None
+    bounds.append(last)
+    return [(task_dir, start, end) for start, end in zip(bounds, bounds[1:])]
+
+def _validate_parts(task_dir, parts, workers, repair):
+    '''
+    validate_store for a store _store_parts split up. Workers are only handed where
+    their part is, and while they read and check it this process loads the list
+    the fixes go into (when repairing).
+    '''
+    from concurrent.futures import ProcessPoolExecutor
+    report = []
+    checked = 0
+    with (ProcessPoolExecutor(workers) if workers > 1 else nullcontext()) as pool:
+        if pool is None:
+            outcomes = [_validate_part(*part, repair) for part in parts]
+        else:
+            futures = [pool.submit(_validate_part, *part, repair) for part in parts]
+            outcomes = (future.result() for future in futures)
+        repaired = load_tasks(task_dir) if repair else None
+        for count, results in outcomes:
+            for offset, changes, problems in results:
+                for field, problem, was_fixed in problems:
+                    report.append({"number": checked + offset + 1, "field": field, "problem": problem, "fixed": was_fixed})
+                if changes and repaired is not None:
+                    repaired[checked + offset].update(changes)
+            checked += count
+    return checked, report, repaired
+
+def validate_store(task_dir, workers=None, chunk_size=20000, repair=False):
+    '''
+    Runs validate_task over the whole store, spread across a pool of worker
+    processes (one per core by default, workers=1 does it all in this process).
+    Where the store can be split up (see _store_parts) each worker reads and parses
+    its own part. Otherwise it's streamed in here and handed out chunk_size tasks
+    at a time, with only a few chunks in flight at once. Returns (checked, report,
+    repaired): report is a list of {"number", "field", "problem", "fixed"} dicts in
+    task order and repaired is the fixed task list when repair is on (None otherwise).
+    '''
+    from collections import deque
+    workers = workers or os.cpu_count() or 1
+    # A few parts per worker, so none sit idle at the end waiting on a slow one
+    parts = _store_parts(task_dir, workers * 4)
+    if parts is not None:
+        try:
+            return _validate_parts(task_dir, parts, workers, repair)
+        except ValueError:
+            # Not laid out the way it looked after all, streaming it in below reads it properly
+            pass
+    tasks = iter_tasks(task_dir)
+    chunks = iter(lambda: [task if type(task) is dict else dict(task) for task in islice(tasks, chunk_size)], [])
+    report = []
+    repaired = [] if repair else None
+    checked = 0
+
+    def merge(chunk, results):
+        nonlocal checked
+        for offset, changes, problems in results:
+            for field, problem, was_fixed in problems:
+                report.append({"number": checked + offset + 1, "field": field, "problem": problem, "fixed": was_fixed})
+            if changes:
+                chunk[offset].update(changes)
+        checked += len(chunk)
+        if repaired is not None:
+            repaired.extend(chunk)
+
+    if workers == 1:
+        for chunk in chunks:
+            merge(chunk, _validate_chunk(chunk, repair))
+        return checked, report, repaired
+
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(workers) as pool:
+        # Keeps every worker busy without reading the whole store ahead of them
+        pending = deque()
+        for chunk in chunks:
+            pending.append((chunk, pool.submit(_validate_chunk, chunk, repair)))
+            if len(pending) > workers * 2:
+                chunk, future = pending.popleft()
+                merge(chunk, future.result())
+        while pending:
+            chunk, future = pending.popleft()
+            merge(chunk, future.result())
+    return checked, report, repaired
+
+def update_task(task_dir, tasks, start=0, ids=None):
+    # shows the current page of tasks, sets index to input task number (or ID, given the TaskIds)
+    show_tasks(tasks, limit=page_size(), start=start, by_id=ids is not None)
     while True:
         try:
-            index = int(input("Enter task number to update: ")) - 1
+            if ids is None:
+                index = int(input("Enter task number to update: ")) - 1
+            else:
+                index = ids.position(int(input("Enter task ID to update: ")))
             if not(0 <= index < len(tasks)):
                 #ensures index is within range, lest raises a ValueError
                 raise ValueError("Invalid task number.")
             task_to_update = tasks[index]
+            # Starts tracking edits from here (Task objects do it themselves, dicts get compared to a copy)
+            if isinstance(task_to_update, Task):
+                task_to_update.pop_changes()
+                before = None
+            else:
+                before = dict(task_to_update)
             break
         except ValueError as ve:
             print(f"Error: {ve}")
@@ -216,9 +2994,8 @@ def update_task(tasks):
                     print(f"Error updating description: {e}")
         elif option == '3':
             try:
-                valid_importance = ["high", "medium", "low"]
                 new_importance = input("Enter new importance (high, medium, low): ").strip()
-                if new_importance not in valid_importance:
+                if new_importance not in IMPORTANCE_LEVELS:
                     raise ValueError("Invalid importance. Please choose from 'high', 'medium', or 'low'.")
                 task_to_update["importance"] = new_importance
             except Exception as e:
@@ -237,9 +3014,8 @@ def update_task(tasks):
                     print(f"Error: {ve}")
         elif option == '5':
             try:
-                valid_statuses = ["In Progress", "Pending", "Completed"]
                 new_status = input("Enter new status (In Progress, Pending, or Completed): ").strip()
-                if new_status not in valid_statuses:
+                if new_status not in TASK_STATUSES:
                     raise ValueError("Invalid status. Please choose from 'In Progress', 'Pending', or 'Completed'.")
                 task_to_update["status"] = new_status
             except Exception as e:
@@ -256,7 +3032,11 @@ def update_task(tasks):
         else:
             print("Invalid option. Please select a number between 1 and 7.")
             break
-        save_tasks(TASKS_FILE, tasks)
+        changes = changed_fields(task_to_update, before)
+        if not changes:
+            print("No changes made.")
+            break
+        record_change(task_dir, tasks, "update", index, fields=changes)
         print("Task updated successfully.")
         break
 
@@ -264,22 +3044,902 @@ def update_task(tasks):
 
 
 
-def main():
+# Stores starting with this are a tracker daemon's socket rather than a file, e.g. unix:/tmp/tracker.sock
+DAEMON_PREFIX = "unix:"
+
+def is_daemon_path(task_dir):
+    return task_dir.startswith(DAEMON_PREFIX)
+
+class TrackerDaemon:
+    '''
+    Long-running server (the "daemon" command) that keeps a store's tasks, indexes
+    and RAG ratings in memory and answers requests over a Unix socket, one JSON
+    object per line each way. Edits are applied in memory straight away and
+    written to the store in the background every flush_interval seconds, so
+    lots of quick edits share one save. Requests pick tasks by ID, since each
+    client's list (and so its positions) can be out of step with the others'.
+    '''
+
+    def __init__(self, task_dir, flush_interval=0.5):
+        self.task_dir = task_dir
+        self.flush_interval = flush_interval
+        # Everything gets decoded up front, a daemon pays for that once rather than per request
+        tasks = load_compact_tasks(task_dir)
+        # (a sharded store's list is kept as it is, it knows which shards it came from)
+        self.tasks = tasks if isinstance(tasks, list) else list(tasks)
+        self.ids = TaskIds.open(task_dir, self.tasks).attach()
+        # Attached before the index so edits are re-rated before they get indexed
+        self.rag = RagMaintainer(self.tasks).attach()
+        self.rag.refresh(self.tasks)
+        self.index = TaskIndex(self.tasks).attach()
+        self.rag.index = self.index
+        self.dirty = False
+        # The latest background save (a future), see save_in_background
+        self.saving = None
+        self.server = None
+        # Writers of the connected clients, closed on shutdown so none are left hanging
+        self.writers = set()
+        # id(task) -> position, rebuilt lazily after deletes shift things about
+        self._positions = None
+
+    def positions(self):
+        if self._positions is None:
+            self._positions = {id(task): position for position, task in enumerate(self.tasks)}
+        return self._positions
+
+    def _change(self, op, index, task=None):
+        notify_change(self.tasks, op, index, self.tasks[index] if task is None else task)
+        if op == "delete":
+            self._positions = None
+        elif op == "add" and self._positions is not None:
+            self._positions[id(self.tasks[index])] = index
+        self.dirty = True
+
+    def handle_request(self, request):
+        # Does one request and returns its result, raises ValueError for bad ones
+        op = request.get("op")
+        # Tasks that fell due since the last request get their new rating (and index entries)
+        self.rag.refresh()
+        if op == "ping":
+            return "pong"
+        if op == "count":
+            return len(self.tasks)
+        if op == "load":
+            return [dict(task) for task in self.tasks]
+        if op == "list":
+            start = int(request.get("start", 0))
+            limit = request.get("limit")
+            return [dict(task) for task in self.tasks[start:None if limit is None else start + int(limit)]]
+        if op == "get":
+            return dict(self.tasks[self._index(request)])
+        if op == "add":
+            task = Task.from_dict(request["task"])
+            self.tasks.append(task)
+            self._change("add", len(self.tasks) - 1)
+            # The ID it ended up with, which isn't the one asked for if another client got there first
+            return task['id']
+        if op == "update":
+            index = self._index(request)
+            task = self.tasks[index]
+            # Edited in place, the indexes find tasks by identity
+            if request.get("fields") is None:
+                task.clear()
+            task.update(request["task"] if request.get("fields") is None else request["fields"])
+            self._change("update", index, task)
+            return index + 1
+        if op == "delete":
+            index = self._index(request)
+            removed = self.tasks.pop(index)
+            self._change("delete", index, removed)
+            return index + 1
+        if op == "replace":
+            self.tasks[:] = [Task.from_dict(task) for task in request["tasks"]]
+            notify_change(self.tasks, "reload", None, None)
+            self.rag.refresh(self.tasks)
+            self.index.rebuild()
+            self._positions = None
+            self.dirty = True
+            return len(self.tasks)
+        if op == "query":
+            filters = {key: request.get(key) for key in ("status", "importance", "rag", "due_before", "due_after")}
+            positions = self.positions()
+            return [{"number": positions[id(task)] + 1, "task": dict(task)} for task in self.index.query(**filters)]
+        if op == "shutdown":
+            if self.server is not None:
+                self.server.close()
+            return True
+        raise ValueError(f"Unknown request: {op}")
+
+    def _index(self, request):
+        # Which task a request is about, by ID (or by position, for a client that didn't give one)
+        if request.get("id") is not None:
+            return self.ids.position(int(request["id"]))
+        index = int(request["index"])
+        if not 0 <= index < len(self.tasks):
+            raise ValueError("Invalid task number.")
+        return index
+
+    async def flush_in_background(self):
+        # The flush request: an older snapshot still being written lands first, then whatever's
+        # left is saved off the event loop like flush_loop does, so other clients aren't kept waiting
+        import asyncio
+        await self.settle()
+        if self.dirty:
+            saving = self.save_in_background()
+            await asyncio.wait({saving})
+            if saving.exception() is not None:
+                raise ValueError(f"Saving failed: {saving.exception()}")
+        return True
+
+    def flush(self):
+        # Saves straight away on the event loop, only for shutting down when nothing else is served
+        if self.dirty:
+            self.dirty = False
+            save_tasks(self.task_dir, self.tasks)
+
+    async def handle_connection(self, reader, writer):
+        # Serves one client until it hangs up (or the daemon shuts down), a connection can send any number of requests
+        import asyncio
+        self.writers.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if request.get("op") == "flush":
+                        response = {"ok": True, "result": await self.flush_in_background()}
+                    else:
+                        response = {"ok": True, "result": self.handle_request(request)}
+                except (ValueError, KeyError, IndexError, TypeError) as e:
+                    response = {"ok": False, "error": str(e)}
+                writer.write((json.dumps(response, separators=(",", ":"), default=task_to_json) + "\n").encode("utf-8"))
+                await writer.drain()
+        except asyncio.CancelledError:
+            # Shutting down with this client still connected, that's the end of the connection not an error
+            pass
+        finally:
+            self.writers.discard(writer)
+            writer.close()
+
+    def _saved(self, future):
+        # A save that failed leaves the edits dirty, so the next flush has another go
+        if future.exception() is not None:
+            self.dirty = True
+
+    def save_in_background(self):
+        import asyncio
+        # Copies the list here (quick) so the slow write can happen off the event loop. The copy
+        # starts as self.tasks.copy() so a sharded store's bookkeeping comes along with it
+        snapshot, self.dirty = self.tasks.copy(), False
+        snapshot[:] = [dict(task) for task in self.tasks]
+        self.saving = asyncio.get_running_loop().run_in_executor(None, save_tasks, self.task_dir, snapshot)
+        self.saving.add_done_callback(self._saved)
+        return self.saving
+
+    async def settle(self):
+        # Waits out a background save that's under way, so it can't land on top of a newer one
+        import asyncio
+        if self.saving is not None and not self.saving.done():
+            await asyncio.wait({self.saving})
+
+    async def flush_loop(self):
+        import asyncio
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self.dirty:
+                # wait() rather than awaiting it, so cancelling the loop doesn't cancel the save
+                await asyncio.wait({self.save_in_background()})
+
+    async def serve(self, socket_path):
+        import asyncio
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        self.server = await asyncio.start_unix_server(self.handle_connection, path=socket_path)
+        flusher = asyncio.create_task(self.flush_loop())
+        try:
+            async with self.server:
+                try:
+                    await self.server.serve_forever()
+                except asyncio.CancelledError:
+                    pass
+        finally:
+            flusher.cancel()
+            # Clients still connected get hung up on (after any reply already on its way) instead of waiting forever
+            for writer in list(self.writers):
+                writer.close()
+            await self.settle()
+            self.index.detach()
+            self.rag.detach()
+            self.ids.detach()
+            self.flush()
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+
+def run_daemon(task_dir, socket_path, flush_interval=0.5):
+    import asyncio
+    asyncio.run(TrackerDaemon(task_dir, flush_interval).serve(socket_path))
+
+class DaemonClient:
+    '''
+    Talks to a running TrackerDaemon. Keeps one connection open, so each
+    request is a single round trip on a local socket.
+    '''
+
+    def __init__(self, socket_path):
+        import socket
+        self.connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.connection.connect(socket_path)
+        self.responses = self.connection.makefile('rb')
+
+    def request(self, op, **fields):
+        self.connection.sendall((json.dumps(dict(fields, op=op), default=task_to_json) + "\n").encode("utf-8"))
+        line = self.responses.readline()
+        if not line:
+            raise ConnectionError("Tracker daemon closed the connection")
+        response = json.loads(line)
+        if not response["ok"]:
+            raise ValueError(response["error"])
+        return response["result"]
+
+    def close(self):
+        self.responses.close()
+        self.connection.close()
+
+class DaemonStorage:
+    '''
+    Storage backend for "unix:/path/to.sock" stores, every call becomes a request
+    to the daemon. This is how the main menu runs as a client of a daemon.
+    '''
+
+    def __init__(self):
+        self._clients = {}
+
+    def client(self, task_dir):
+        if task_dir not in self._clients:
+            self._clients[task_dir] = DaemonClient(task_dir[len(DAEMON_PREFIX):])
+        return self._clients[task_dir]
+
+    def close(self, task_dir):
+        client = self._clients.pop(task_dir, None)
+        if client is not None:
+            client.close()
+
+    def load(self, task_dir):
+        return self.client(task_dir).request("load")
+
+    def iter(self, task_dir):
+        yield from self.load(task_dir)
+
+    def save(self, task_dir, tasks):
+        self.client(task_dir).request("replace", tasks=list(tasks))
+
+    def apply_change(self, task_dir, tasks, op, index, fields=None, task_id=None):
+        # Tasks are sent by ID, other clients' edits mean positions here needn't match the daemon's
+        if op == "add":
+            task_id = self.client(task_dir).request("add", task=tasks[index])
+            if tasks[index].get('id') != task_id:
+                # Another client's new task got that ID first, so this one's changed
+                tasks[index]['id'] = task_id
+                notify_change(tasks, "reload", None, None)
+        elif op == "update" and fields is not None:
+            self.client(task_dir).request("update", index=index, id=tasks[index].get('id'), fields=fields)
+        elif op == "update":
+            self.client(task_dir).request("update", index=index, id=tasks[index].get('id'), task=tasks[index])
+        elif op == "delete":
+            self.client(task_dir).request("delete", index=index, id=task_id)
+
+    def extend(self, task_dir, new_tasks):
+        for task in new_tasks:
+            self.client(task_dir).request("add", task=task)
+
+    def commit(self, task_dir, records):
+        for record in records:
+            fields = {key: value for key, value in record.items() if key in ("index", "id", "task", "fields")}
+            self.client(task_dir).request(record["op"], **fields)
+
+# Shared by every "unix:..." store
+DAEMON_STORAGE = DaemonStorage()
+
+def coalesce_record(records, record):
+    '''
+    Adds a change record to the end of a queue of them, folded into the last one
+    when both are for the same task ID: updates merge, an update to a task that's
+    only just been added goes into the add, and a task added then deleted is
+    dropped altogether. Only neighbours are merged, so the order still holds.
+    '''
+    last = records[-1] if records else None
+    if last is None or "id" not in record or last.get("id") != record["id"] or last["op"] == "delete":
+        records.append(record)
+    elif record["op"] == "delete":
+        # Whatever was queued for the task doesn't matter any more, and a task that never got written needn't be
+        if last["op"] == "add":
+            records.pop()
+        else:
+            records[-1] = record
+    elif "fields" in record and "fields" in last:
+        last["fields"] = dict(last["fields"], **record["fields"])
+    elif "fields" in record:
+        last["task"] = dict(last["task"], **record["fields"])
+    elif last["op"] == "add":
+        last["task"] = record["task"]
+    else:
+        records[-1] = record
+
+class BackgroundWriter:
+    '''
+    Saves edits on a background thread so the menu never waits on a write. Stores
+    that write an edit on its own (SQLite, journaled JSON, see in_place) are handed
+    the edit's change record, and the thread commits everything queued in one go.
+    Stores that are always rewritten whole only get the newest list (a shallow
+    copy, quick whatever the size). Either way the thread waits a short pause
+    after the first edit, so a burst of edits turns into one write. flush() waits
+    until everything is on disk. A failed write is kept and retried, and shows
+    up in error until one works.
+    '''
+
+    def __init__(self, delay=0.2, retry_seconds=1.0):
+        # How long to wait for more edits before writing, and between retries of a failed save
+        self.delay = delay
+        self.retry_seconds = retry_seconds
+        self.condition = threading.Condition()
+        # task_dir -> newest list waiting to be saved, for stores rewritten whole
+        self.latest = {}
+        # task_dir -> change records waiting to be committed, for stores written in place
+        self.records = {}
+        # Edits handed over, and how many of those are known to be on disk
+        self.submitted = 0
+        self.written = 0
+        self.error = None
+        self.urgent = False
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, name="task-writer", daemon=True)
+        self.thread.start()
+
+    @property
+    def pending(self):
+        return self.submitted - self.written
+
+    def submit(self, task_dir, tasks, record):
+        # record is the edit as a change record (see change_record), tasks the list after it
+        in_place = getattr(get_storage(task_dir), "in_place", False)
+        # Lazily decoded lists are handed over as they are, copying one would decode every task
+        snapshot = None if in_place else tasks.copy() if isinstance(tasks, list) else tasks
+        with self.condition:
+            if in_place:
+                coalesce_record(self.records.setdefault(task_dir, []), record)
+            else:
+                self.latest[task_dir] = snapshot
+            self.submitted += 1
+            self.condition.notify_all()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not (self.latest or self.records) and not self.closed:
+                    self.condition.wait()
+                if not (self.latest or self.records):
+                    return
+                # Gives a burst of edits a moment to finish so they share the write
+                deadline = time_module.monotonic() + self.delay
+                while not (self.urgent or self.closed):
+                    remaining = deadline - time_module.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                batch, self.latest = self.latest, {}
+                queued, self.records = self.records, {}
+                submitted = self.submitted
+            failed = None
+            for task_dir, snapshot in batch.items():
+                try:
+                    save_tasks(task_dir, snapshot)
+                except (OSError, ValueError, RuntimeError) as e:
+                    # RuntimeError: a task was edited mid-write, the retry picks up the edit too
+                    failed = e
+                    with self.condition:
+                        self.latest.setdefault(task_dir, snapshot)
+            for task_dir, records in queued.items():
+                import sqlite3
+                try:
+                    with store_lock(task_dir):
+                        get_storage(task_dir).commit(task_dir, records)
+                except (OSError, ValueError, sqlite3.Error) as e:
+                    # Back to the front of the queue, ahead of anything submitted since
+                    failed = e
+                    with self.condition:
+                        self.records[task_dir] = records + self.records.get(task_dir, [])
+            with self.condition:
+                self.error = failed
+                if failed is None:
+                    self.written = max(self.written, submitted)
+                self.condition.notify_all()
+            if failed is not None:
+                time_module.sleep(self.retry_seconds)
+
+    def flush(self, timeout=10):
+        '''
+        Waits (up to timeout seconds) for every edit so far to be saved, skipping
+        the usual pause. Returns False if it didn't get there, see error for why.
+        '''
+        deadline = time_module.monotonic() + timeout
+        with self.condition:
+            target = self.submitted
+            self.urgent = True
+            self.condition.notify_all()
+            try:
+                while self.written < target:
+                    remaining = deadline - time_module.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self.condition.wait(min(remaining, 0.1))
+                return True
+            finally:
+                self.urgent = False
+
+    def close(self, timeout=10):
+        # Flushes, then stops the thread. Returns flush's answer
+        flushed = self.flush(timeout)
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        if flushed:
+            self.thread.join(timeout)
+        return flushed
+
+def start_background_writer():
+    # Menu edits get saved in the background from here on, and still get saved on exit or a kill
+    global BACKGROUND_WRITER
+    import atexit
+    import signal
+    BACKGROUND_WRITER = BackgroundWriter()
+    atexit.register(stop_background_writer)
+
+    def flush_and_exit(signum, frame):
+        stop_background_writer()
+        # Straight out, the menu's catch-all except would swallow a SystemExit
+        os._exit(128 + signum)
+    for name in ("SIGTERM", "SIGHUP"):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), flush_and_exit)
+
+def stop_background_writer():
+    # Waits for the last background saves, then goes back to saving straight away
+    global BACKGROUND_WRITER
+    writer, BACKGROUND_WRITER = BACKGROUND_WRITER, None
+    if writer is None or writer.close():
+        return
+    print(f"[bold red]Background save failed ({writer.error}), trying once more...[/bold red]")
+    for task_dir, snapshot in writer.latest.items():
+        save_tasks(task_dir, snapshot)
+    for task_dir, records in writer.records.items():
+        with store_lock(task_dir):
+            get_storage(task_dir).commit(task_dir, records)
+
+class Dashboard:
+    '''
+    Live, read-only view of a store (the "dashboard" command) for keeping an eye on
+    what other people and processes are doing to it. The store's signature (mtime
+    and size, see store_signature) is polled, and when it changes the store is read
+    again and diffed against what's held by task ID. Only added or changed tasks
+    get their row formatted again, every other row is reused as it was, and the
+    screen is only redrawn when something changed.
+    '''
+
+    def __init__(self, task_dir, matches=None, rows=None):
+        self.task_dir = task_dir
+        # Optional filter (see parse_where), and how many rows to show (None for a screenful)
+        self.matches = matches
+        self.rows = rows or max(console.height - 10, 5)
+        # key (task ID, or position for tasks without one) -> task as last read
+        self.tasks = {}
+        # keys of the tasks on screen, in store order, and how many matched in all
+        self.visible = []
+        self.matched = 0
+        # key -> (cells, style) of rows already formatted
+        self.formatted = {}
+        # keys added or changed by the latest reload, drawn in bold
+        self.changed = set()
+        self.signature = None
+        self.cutoff = None
+        self.updated_at = None
+        # Running count of rows formatted, shows how little a reload redraws
+        self.formats = 0
+
+    def poll(self, now=None):
+        '''
+        Re-reads the store if it's been written since last time (or the date rolled
+        over, which moves RAG ratings). Returns (added, changed, removed) counts, or
+        None when there was nothing to do.
+        '''
+        now = now or datetime.now()
+        cutoff = now.toordinal() + (now.time() != time.min)
+        if cutoff != self.cutoff:
+            # A new day can turn any row red, so every row gets formatted afresh
+            self.cutoff = cutoff
+            self.formatted.clear()
+            self.signature = None
+        signature = store_signature(self.task_dir)
+        if signature == self.signature:
+            return None
+        self.signature = signature
+        fresh = {}
+        visible = []
+        matched = 0
+        for position, task in enumerate(iter_tasks(self.task_dir)):
+            key = task.get('id') if valid_id(task.get('id')) and task.get('id') not in fresh else ("position", position)
+            fresh[key] = task
+            if self.matches is None or self.matches(task):
+                matched += 1
+                if len(visible) < self.rows:
+                    visible.append(key)
+        changed = {key for key, task in fresh.items() if self.tasks.get(key, _MISSING) != task}
+        removed = [key for key in self.tasks if key not in fresh]
+        for key in chain(changed, removed):
+            self.formatted.pop(key, None)
+        added = sum(key not in self.tasks for key in changed)
+        self.tasks, self.visible, self.matched = fresh, visible, matched
+        self.changed = changed if self.updated_at is not None else set()
+        self.updated_at = now
+        return added, len(changed) - added, len(removed)
+
+    def row(self, key):
+        # (cells, style) for one task, formatted once and then reused until the task changes
+        if key not in self.formatted:
+            task = self.tasks[key]
+            due = task_due_ordinal(task)
+            rag = task.get('rag') if due is None else "green" if due >= self.cutoff else ("red", "amber")[task.get('status') == "Completed"]
+            number = key if type(key) is int else key[1] + 1
+            cells = (str(number), str(task.get('name', "")), str(task.get('importance', "")), str(task.get('has_description', "")),
+                     str(task.get('date_made', "")), str(task.get('due_date', "")), str(task.get('status', "")), str(rag))
+            self.formatted[key] = (cells, RAG_STYLES.get(rag))
+            self.formats += 1
+        return self.formatted[key]
+
+    def render(self):
+        from rich.console import Group
+        reset_table(f"Tasks ({len(self.visible)} of {self.matched} shown, {len(self.tasks)} in store)")
+        for key in self.visible:
+            cells, style = self.row(key)
+            if key in self.changed:
+                style = f"bold {style}" if style else "bold"
+            table.add_row(*cells, style=style)
+        summary = f"[dim]Watching {self.task_dir}, last change {self.updated_at:%H:%M:%S}"
+        if self.changed:
+            summary += f" ({len(self.changed)} task(s) updated, shown in bold)"
+        return Group(table, summary + ". Ctrl+C to stop.[/dim]")
+
+    def run(self, interval=1.0):
+        from rich.live import Live
+        # Live needs the real Console, not the lazy stand-in, so make sure it's been swapped in
+        console.size
+        self.poll()
+        try:
+            # Drawn only when something changed, so a big store doesn't mean a busy screen
+            with Live(self.render(), console=console, auto_refresh=False) as live:
+                while True:
+                    time_module.sleep(interval)
+                    if self.poll() is not None:
+                        live.update(self.render(), refresh=True)
+        except KeyboardInterrupt:
+            pass
+
+class Profiler:
+    '''
+    Opt-in timing for the hot paths (--profile). Wraps the functions named in
+    PROFILED_FUNCTIONS to count calls and time them, and with memory=True also
+    records the tracemalloc peak seen inside each. Nothing is wrapped unless
+    profiling is switched on, so a normal run pays nothing for it.
+    '''
+
+    def __init__(self, memory=False):
+        self.memory = memory
+        # name -> {"calls", "seconds", "peak_bytes"}
+        self.stats = {}
+        self._peaks = []
+        if memory:
+            import tracemalloc
+            tracemalloc.start()
+
+    @contextmanager
+    def span(self, name):
+        import tracemalloc
+        stat = self.stats.setdefault(name, {"calls": 0, "seconds": 0.0, "peak_bytes": 0})
+        if self.memory:
+            # Peaks are per span, an inner span's peak still counts towards the outer one
+            tracemalloc.reset_peak()
+            self._peaks.append(0)
+        started = time_module.perf_counter()
+        try:
+            yield
+        finally:
+            stat["seconds"] += time_module.perf_counter() - started
+            stat["calls"] += 1
+            if self.memory:
+                peak = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+                stat["peak_bytes"] = max(stat["peak_bytes"], peak)
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], peak)
+
+    def wrap(self, name, func):
+        @wraps(func)
+        def profiled(*args, **kwargs):
+            with self.span(name):
+                return func(*args, **kwargs)
+        profiled.unprofiled = func
+        return profiled
+
+    def report(self):
+        from rich.table import Table
+        profile_table = Table(title="Profile")
+        profile_table.add_column("Function", style="cyan")
+        profile_table.add_column("Calls", justify="right")
+        profile_table.add_column("Total ms", justify="right", style="yellow")
+        profile_table.add_column("Avg ms", justify="right", style="yellow")
+        if self.memory:
+            profile_table.add_column("Peak MB", justify="right", style="green")
+        for name, stat in sorted(self.stats.items(), key=lambda item: -item[1]["seconds"]):
+            row = [name, str(stat["calls"]), f"{stat['seconds'] * 1000:.1f}", f"{stat['seconds'] * 1000 / stat['calls']:.2f}"]
+            if self.memory:
+                row.append(f"{stat['peak_bytes'] / 1e6:.1f}")
+            profile_table.add_row(*row)
+        console.print(profile_table)
+
+    def dump(self, path):
+        with open(path, 'w', encoding="utf-8") as profilefile:
+            json.dump(self.stats, profilefile, indent=4)
+
+# The hot paths --profile keeps an eye on
+PROFILED_FUNCTIONS = ("load_tasks", "load_compact_tasks", "save_tasks", "record_change", "check_rag", "batch_rag", "show_tasks", "clear_screen")
+
+def enable_profiling(memory=False):
+    # Swaps each hot path for a timed wrapper, calls inside the module pick them up too
+    profiler = Profiler(memory)
+    for name in PROFILED_FUNCTIONS:
+        globals()[name] = profiler.wrap(name, globals()[name])
+    return profiler
+
+def disable_profiling(profiler):
+    for name in PROFILED_FUNCTIONS:
+        globals()[name] = getattr(globals()[name], "unprofiled", globals()[name])
+    if profiler.memory:
+        import tracemalloc
+        tracemalloc.stop()
+
+def main(argv=None):
+    global JOURNAL_MODE, SHARED_MODE, SHARD_VIEW, TASKS_FILE
+
+    parser = argparse.ArgumentParser(description="Task Tracker CLI")
+    parser.add_argument("--file", default=TASKS_FILE, help="task store to use (.json, .json.gz, .json.xz, .db, .sqlite, .tbin, a .shards directory or unix:SOCKET for a daemon)")
+    parser.add_argument("--journal", action="store_true", help="append edits to a journal instead of rewriting tasks.json")
+    parser.add_argument("--shared", action="store_true", help="merge edits with other processes using the same store")
+    parser.add_argument("--view", choices=["all", "recent"], default="all",
+                        help="for .shards stores, load every shard or only unfinished tasks' and this quarter's")
+    parser.add_argument("--sync-save", action="store_true", help="in the menu, wait for each save instead of saving in the background")
+    parser.add_argument("--profile", action="store_true", help="time the hot paths and print a report on exit")
+    parser.add_argument("--profile-memory", action="store_true", help="like --profile, plus tracemalloc peaks (slower)")
+    parser.add_argument("--profile-out", metavar="FILE", help="write the profile report to a JSON file instead")
+    subcommands = parser.add_subparsers(dest="command")
+    migrate = subcommands.add_parser("migrate", help="convert a task store into another format")
+    migrate.add_argument("source")
+    migrate.add_argument("destination")
+    show = subcommands.add_parser("show", help="print tasks straight from the store without loading it all")
+    show.add_argument("--limit", type=int, default=None, help="stop after this many tasks (default: one screen)")
+    query = subcommands.add_parser("query", help="list tasks matching filters")
+    export = subcommands.add_parser("export", help="stream tasks out to a CSV, NDJSON or HTML report")
+    export.add_argument("destination", help="file to write, - for stdout")
+    export.add_argument("--format", choices=sorted(EXPORTERS), default=None, help="defaults to the file extension")
+    # Export takes the same filters as query
+    for command in (query, export):
+        command.add_argument("--status", choices=TASK_STATUSES)
+        command.add_argument("--importance", choices=IMPORTANCE_LEVELS)
+        command.add_argument("--rag", choices=RAG_RATINGS)
+        command.add_argument("--due-before", metavar="YYYY-MM-DD", help="due strictly before this date")
+        command.add_argument("--due-after", metavar="YYYY-MM-DD", help="due strictly after this date")
+    search = subcommands.add_parser("search", help="find tasks by words in their name or description")
+    search.add_argument("text", nargs="+")
+    search.add_argument("--limit", type=int, default=20)
+    daemon = subcommands.add_parser("daemon", help="serve the store to clients over a Unix socket")
+    daemon.add_argument("--socket", default="/tmp/task_tracker.sock")
+    daemon.add_argument("--flush-interval", type=float, default=0.5, help="seconds between background saves")
+    validate = subcommands.add_parser("validate", help="check every task for bad data, in parallel")
+    repair = subcommands.add_parser("repair", help="validate, then save the store with everything fixable fixed")
+    for checker in (validate, repair):
+        checker.add_argument("--workers", type=int, default=None, help="processes to use (default: one per core)")
+        checker.add_argument("--report", metavar="FILE", help="also write every problem found to FILE as NDJSON")
+    repair.add_argument("--output", metavar="FILE", help="save the fixed store here instead of over the original")
+    archive = subcommands.add_parser("archive", help="move old completed tasks of a .shards store into cold shards")
+    archive.add_argument("--before", metavar="YYYY-MM", help="archive tasks made before this month (default: this quarter)")
+    deleter = subcommands.add_parser("delete", help="delete tasks by ID, or every task matching --where")
+    deleter.add_argument("ids", nargs="*", type=int, metavar="ID")
+    deleter.add_argument("--where", metavar="FILTER", help='e.g. "status=Completed and due_date<2024-01-01"')
+    updater = subcommands.add_parser("update", help="change fields on every task matching --where, in one save")
+    updater.add_argument("--set", action="append", required=True, metavar="FIELD=VALUE", dest="assignments",
+                         help="e.g. status=Completed, can be given more than once")
+    updater.add_argument("--where", required=True, metavar="FILTER", help='e.g. "due_date<2024-01-01 and importance=low"')
+    updater.add_argument("--dry-run", action="store_true", help="only count what would change")
+    dashboard = subcommands.add_parser("dashboard", help="live view of the store that updates as others change it")
+    dashboard.add_argument("--interval", type=float, default=1.0, help="seconds between checks for changes")
+    dashboard.add_argument("--where", metavar="FILTER", help='only show matching tasks, e.g. "status!=Completed"')
+    dashboard.add_argument("--rows", type=int, default=None, help="how many tasks to show (default: a screenful)")
+    importer = subcommands.add_parser("import", help="bulk add tasks from a CSV or NDJSON file")
+    importer.add_argument("source")
+    importer.add_argument("--format", choices=["csv", "ndjson"], default=None, help="defaults to the file extension")
+    args = parser.parse_args(argv)
+    JOURNAL_MODE = args.journal
+    SHARED_MODE = args.shared
+    SHARD_VIEW = None if args.view == "all" else args.view
+    TASKS_FILE = args.file
+
+    profiler = enable_profiling(args.profile_memory) if args.profile or args.profile_memory or args.profile_out else None
+    try:
+        run_command(args, parser)
+    finally:
+        if profiler is not None:
+            disable_profiling(profiler)
+            if args.profile_out:
+                profiler.dump(args.profile_out)
+            else:
+                profiler.report()
+
+def run_command(args, parser):
+    global STARTUP_SECONDS
+    if args.command == "migrate":
+        count = migrate_tasks(args.source, args.destination)
+        print(f"Migrated {count} tasks from {args.source} to {args.destination}")
+        return
+    if args.command == "daemon":
+        print(f"Serving {TASKS_FILE} on {args.socket} (clients use --file {DAEMON_PREFIX}{args.socket})")
+        run_daemon(TASKS_FILE, args.socket, args.flush_interval)
+        return
+    if args.command in ("query", "export"):
+        for date_string in (args.due_before, args.due_after):
+            if date_string is not None and not validate_date(date_string):
+                parser.error("Invalid date format. Please use YYYY-MM-DD.")
+    if args.command == "export":
+        try:
+            count = export_tasks(TASKS_FILE, args.destination, args.format, status=args.status, importance=args.importance,
+                                 rag=args.rag, due_before=args.due_before, due_after=args.due_after)
+        except ValueError as e:
+            parser.error(str(e))
+        if args.destination != "-":
+            print(f"Exported {count} tasks to {args.destination}")
+        return
+    if args.command == "query":
+        if is_daemon_path(TASKS_FILE):
+            # The daemon already has its indexes built, so it answers the query itself
+            results = DAEMON_STORAGE.client(TASKS_FILE).request("query", status=args.status, importance=args.importance,
+                                                                 rag=args.rag, due_before=args.due_before, due_after=args.due_after)
+            show_tasks([result["task"] for result in results], numbers=[result["number"] for result in results])
+            return
+        storage = get_storage(TASKS_FILE)
+        if isinstance(storage, SqliteStorage):
+            # A database answers from its indexes
+            results = list(storage.query(TASKS_FILE, args.status, args.importance, args.rag, args.due_before, args.due_after))
+        else:
+            # For a single query, one streaming pass beats loading the store and building indexes first
+            results = list(filter_tasks(iter_tasks(TASKS_FILE), args.status, args.importance, args.rag, args.due_before, args.due_after))
+        show_tasks([task for number, task in results], numbers=[number for number, task in results])
+        return
+    if args.command == "search":
+        tasks = load_compact_tasks(TASKS_FILE)
+        results = SearchIndex.open(TASKS_FILE, tasks).search(" ".join(args.text), args.limit)
+        positions = {id(task): number for number, task in enumerate(tasks, 1)}
+        show_tasks(results, numbers=[positions[id(task)] for task in results])
+        return
+    if args.command in ("validate", "repair"):
+        started = time_module.perf_counter()
+        checked, report, repaired = validate_store(TASKS_FILE, args.workers, repair=args.command == "repair")
+        seconds = time_module.perf_counter() - started
+        # Only the first screenful goes to the terminal, --report has the lot
+        for problem in report[:50]:
+            outcome = "[green]fixed[/green]" if problem["fixed"] else "[red]needs fixing by hand[/red]"
+            print(f"Task {problem['number']} {problem['field']}: {problem['problem']} ({outcome})")
+        if len(report) > 50:
+            print(f"... and {len(report) - 50} more")
+        if args.report:
+            with open(args.report, 'w', encoding="utf-8") as reportfile:
+                for problem in report:
+                    reportfile.write(json.dumps(problem) + "\n")
+        unfixable = sum(not problem["fixed"] for problem in report)
+        print(f"Checked {checked} tasks in {seconds:.2f}s: {len(report)} problems, {unfixable} need fixing by hand")
+        if repaired is not None and (args.output or len(report) > unfixable):
+            save_tasks(args.output or TASKS_FILE, repaired)
+            print(f"Saved the repaired tasks to {args.output or TASKS_FILE}")
+        return
+    if args.command == "archive":
+        if args.before is not None and not validate_date(args.before + "-01"):
+            parser.error("Invalid month. Please use YYYY-MM.")
+        try:
+            moved = archive_tasks(TASKS_FILE, args.before)
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"Moved {moved} tasks in {TASKS_FILE} to or from the archive")
+        return
+    if args.command == "delete":
+        if bool(args.ids) == bool(args.where):
+            parser.error("Give either task IDs or --where, not both")
+        try:
+            matches = parse_where(args.where) if args.where else None
+        except ValueError as e:
+            parser.error(str(e))
+        tasks = load_compact_tasks(TASKS_FILE)
+        ids = TaskIds.open(TASKS_FILE, tasks)
+        if matches is None:
+            wanted = set(args.ids)
+            missing = sorted(task_id for task_id in wanted if ids.get(task_id) is None)
+            if missing:
+                parser.error(f"No task with ID {', '.join(map(str, missing))}")
+            matches = lambda task: task.get('id') in wanted
+        deleted = delete_where(TASKS_FILE, tasks, matches)
+        print(f"Deleted {deleted} tasks from {TASKS_FILE}")
+        return
+    if args.command == "update":
+        try:
+            matches = parse_where(args.where)
+            changes = parse_assignments(args.assignments)
+        except ValueError as e:
+            parser.error(str(e))
+        tasks = load_compact_tasks(TASKS_FILE)
+        matched, changed = update_where(TASKS_FILE, tasks, matches, changes, args.dry_run)
+        print(f"{matched} tasks matched, {changed} {'would change' if args.dry_run else 'changed'}")
+        return
+    if args.command == "dashboard":
+        try:
+            matches = parse_where(args.where) if args.where else None
+        except ValueError as e:
+            parser.error(str(e))
+        Dashboard(TASKS_FILE, matches, args.rows).run(args.interval)
+        return
+    if args.command == "import":
+        imported, rejected = import_tasks(args.source, TASKS_FILE, args.format)
+        print(f"Imported {imported} tasks into {TASKS_FILE} ({rejected} rejected)")
+        return
+    if args.command == "show":
+        show_tasks(iter_tasks(TASKS_FILE), limit=args.limit or max(console.height - 6, 1))
+        return
 
-    # Load tasks from the JSON file
-    tasks = load_tasks(TASKS_FILE)
+    # Load tasks from the task store
+    tasks = load_compact_tasks(TASKS_FILE)
+    # Which page of the table is on screen, kept in range as tasks come and go
+    page = 0
+    # Full-text index, only opened the first time someone searches
+    search_index = None
+    # Status/importance/RAG/due date indexes, only built the first time someone filters
+    task_index = None
+    # Keeps RAG ratings current as tasks are shown, edited and fall due
+    rag = RagMaintainer(tasks).attach()
+    # Tasks are picked by their stable IDs in the menu
+    ids = TaskIds.open(TASKS_FILE, tasks).attach()
+    # Edits are saved in the background so the menu doesn't freeze on big stores
+    # (shared stores have to merge with the file on disk, so they still save straight away)
+    if not args.sync_save and not SHARED_MODE:
+        start_background_writer()
 
     while True:
 
-        # Clears terminal, generally "prettier" :)
-        os.system('clear')
+        clear_screen()
 
         try:
             print("\n[bold red]Task Tracker Menu[/bold red]")
 
-            show_tasks(tasks)
+            size = page_size()
+            page = min(page, page_count(tasks, size) - 1)
+            show_tasks(tasks, limit=size, start=page * size, rag=rag, by_id=True)
 
             print("1. Show Task \n2. Add Task \n3. Delete Task \n4. Update Task \n5. Exit")
+            print("n. Next Page  p. Previous Page  j. Jump to Page  g. Go to Task  s. Search  f. Filter  (tasks are picked by ID)")
+            # Startup time is checked once the first menu is on screen
+            if STARTUP_SECONDS is None:
+                STARTUP_SECONDS = time_module.perf_counter() - STARTED_AT
+                if STARTUP_SECONDS > STARTUP_BUDGET_SECONDS:
+                    print(f"[dim]Startup took {STARTUP_SECONDS:.2f}s (budget {STARTUP_BUDGET_SECONDS:.2f}s)[/dim]")
+            # Save status, only shown while there's something to say
+            if BACKGROUND_WRITER is not None and BACKGROUND_WRITER.error is not None:
+                print(f"[bold red]Saving failed, retrying: {BACKGROUND_WRITER.error}[/bold red]")
+            elif BACKGROUND_WRITER is not None and BACKGROUND_WRITER.pending:
+                print(f"[dim]Saving {BACKGROUND_WRITER.pending} change(s)...[/dim]")
 
 
             option = input('What would you like to do? (Type # then press ENTER to continue): ')
@@ -288,22 +3948,57 @@ def main():
                 case '1':
                     while True:
                         try:
-                            task_index = int(input("Enter task number to show: ")) - 1
-                            show_task(tasks, task_index)
+                            task_id = int(input("Enter task ID to show: "))
+                            show_task(tasks, ids.position(task_id), task_id)
                             break
                         except ValueError:
                             print("Invalid input. Please enter a valid task number.")
                 case '2':
                     add_task(TASKS_FILE, tasks)
                 case '3':
-                    show_tasks(tasks)
-                    delete_task(TASKS_FILE, tasks)
+                    show_tasks(tasks, limit=size, start=page * size, rag=rag, by_id=True)
+                    delete_task(TASKS_FILE, tasks, ids)
                 case '4':
-                    update_task(tasks)
+                    update_task(TASKS_FILE, tasks, page * size, ids)
                 case '5':
+                    stop_background_writer()
+                    if search_index is not None and search_index.dirty:
+                        search_index.save()
+                    if task_index is not None:
+                        task_index.detach()
                     print("Exiting...")
-                    os.system('clear')
+                    clear_screen()
                     break
+                case 'n':
+                    page = min(page + 1, page_count(tasks, size) - 1)
+                case 'p':
+                    page = max(page - 1, 0)
+                case 'j':
+                    page = int(input(f"Enter page number (1-{page_count(tasks, size)}): ")) - 1
+                    if not 0 <= page < page_count(tasks, size):
+                        page = 0
+                        raise ValueError("Invalid page number.")
+                case 's':
+                    if search_index is None:
+                        search_index = SearchIndex.open(TASKS_FILE, tasks).attach()
+                    results = search_index.search(input("Search for: "))
+                    show_tasks(results, by_id=True)
+                    input("\nPress RETURN to Continue...")
+                case 'f':
+                    filters = prompt_filters()
+                    if len(rag.rated) < len(tasks):
+                        # Filtering on RAG needs every task's current rating, after that the
+                        # maintainer keeps the index up to date as ratings change
+                        rag.refresh(tasks)
+                    if task_index is None:
+                        task_index = TaskIndex(tasks).attach()
+                        rag.index = task_index
+                    rag.refresh()
+                    show_tasks(task_index.query(**filters), by_id=True)
+                    input("\nPress RETURN to Continue...")
+                case 'g':
+                    # Jumps to whichever page holds the task
+                    page = ids.position(int(input("Enter task ID to go to: "))) // size
                 case _:
                     raise Exception("Invalid input")
 
@@ -105,3 +105,1136 @@ def test_validate_date():
     assert validate_date("2024-12-31") == True
     assert validate_date("12/31/2024") == False
     assert validate_date("31-12-2024") == False
+
+# Test case for journaled storage, edits should land in the journal and survive a reload
+def test_journal_mode_appends_and_replays(temporary_tasks_file, monkeypatch):
+    import task_tracker
+    monkeypatch.setattr(task_tracker, "JOURNAL_MODE", True)
+
+    tasks_data = [
+        {"name": "Task 1", "description": "Description 1", "has_description": True, "importance": "high", 
+         "date_made": "2024-10-01", "due_date": "2024-12-31", "status": "Pending", "rag": "green"},
+        {"name": "Task 2", "description": "", "has_description": False, "importance": "low", 
+         "date_made": "2023-03-01", "due_date": "2024-11-31", "status": "In Progress", "rag": "green"},
+    ]
+    save_tasks(temporary_tasks_file, tasks_data)
+
+    monkeypatch.setattr("sys.stdin", StringIO("1\nJournaled\nTask Description\nlow\n2030-01-01\n"))
+    delete_task(temporary_tasks_file, tasks_data)
+    add_task(temporary_tasks_file, tasks_data)
+
+    # the checkpoint is untouched, the journal holds the two edits
+    with open(temporary_tasks_file) as f:
+        assert len(json.load(f)) == 2
+    with open(temporary_tasks_file + ".journal") as f:
+        assert len(f.readlines()) == 2
+
+    tasks = load_tasks(temporary_tasks_file)
+    assert [task["name"] for task in tasks] == ["Task 2", "Journaled"]
+
+# Test case for journal compaction, once over the threshold the journal is folded into the file
+def test_journal_compaction(temporary_tasks_file, monkeypatch):
+    import threading
+    import task_tracker
+    monkeypatch.setattr(task_tracker, "JOURNAL_MODE", True)
+    monkeypatch.setattr(task_tracker, "JOURNAL_COMPACT_BYTES", 1)
+
+    tasks_data = []
+    monkeypatch.setattr("sys.stdin", StringIO("Compacted\n\nmedium\n2030-01-01\n"))
+    add_task(temporary_tasks_file, tasks_data)
+    for thread in threading.enumerate():
+        if thread is not threading.current_thread():
+            thread.join()
+
+    assert not os.path.exists(temporary_tasks_file + ".journal.old")
+    with open(temporary_tasks_file) as f:
+        assert json.load(f)[0]["name"] == "Compacted"
+    assert load_tasks(temporary_tasks_file)[0]["name"] == "Compacted"
+
+# Test case for a save landing between the journal rotating and compaction writing its snapshot
+def test_journal_compaction_after_save(temporary_tasks_file, monkeypatch):
+    import task_tracker
+    from task_tracker import compact_journal, file_state
+    monkeypatch.setattr(task_tracker, "JOURNAL_MODE", True)
+    old_tasks = [{"name": "Old", "status": "Pending"}]
+    new_tasks = [{"name": "New", "status": "Completed"}]
+    save_tasks(temporary_tasks_file, old_tasks)
+    with open(temporary_tasks_file + ".journal.old", "w") as f:
+        f.write(json.dumps({"op": "update", "index": 0, "fields": {"status": "In Progress"}}) + "\n")
+    checkpoint = file_state(temporary_tasks_file)
+
+    # the save clears the rotated journal, compaction mustn't bring it back or undo the save
+    save_tasks(temporary_tasks_file, new_tasks)
+    compact_journal(temporary_tasks_file, [{"name": "Old", "status": "In Progress"}], checkpoint)
+    assert load_tasks(temporary_tasks_file) == new_tasks
+    assert not os.path.exists(temporary_tasks_file + ".journal.old")
+
+    # and if the rotated journal is back but the file still changed, the snapshot is still dropped
+    with open(temporary_tasks_file + ".journal.old", "w") as f:
+        f.write(json.dumps({"op": "update", "index": 0, "fields": {"status": "Pending"}}) + "\n")
+    compact_journal(temporary_tasks_file, [{"name": "Old", "status": "In Progress"}], checkpoint)
+    with open(temporary_tasks_file) as f:
+        assert json.load(f) == new_tasks
+
+    # compaction finishing part way through a load (after the old checkpoint was read) has the load start over
+    save_tasks(temporary_tasks_file, old_tasks)
+    with open(temporary_tasks_file + ".journal.old", "w") as f:
+        f.write(json.dumps({"op": "update", "index": 0, "fields": {"status": "In Progress"}}) + "\n")
+    checkpoint = file_state(temporary_tasks_file)
+    replay_journal = task_tracker.replay_journal
+
+    def compacted_first(*args):
+        monkeypatch.setattr(task_tracker, "replay_journal", replay_journal)
+        compact_journal(temporary_tasks_file, [{"name": "Old", "status": "In Progress"}], checkpoint)
+        return replay_journal(*args)
+    monkeypatch.setattr(task_tracker, "replay_journal", compacted_first)
+    assert load_tasks(temporary_tasks_file) == [{"name": "Old", "status": "In Progress"}]
+
+# Test case for the SQLite backend, same load/save entry points plus row-level edits
+def test_sqlite_storage_roundtrip(tmpdir, monkeypatch, capsys):
+    import task_tracker
+    from task_tracker import get_storage, migrate_tasks, main
+    tasks_data = [
+        {"name": "Task 1", "description": "Description 1", "has_description": True, "importance": "high", 
+         "date_made": "2024-10-01", "due_date": "2024-12-31", "status": "Pending", "rag": "green"},
+        {"name": "Task 2", "description": "", "has_description": "True", "importance": "low", 
+         "date_made": "2023-03-01", "due_date": "2024-11-31", "status": "In Progress", "rag": "green"},
+    ]
+    json_file = str(tmpdir.join("tasks.json"))
+    db_file = str(tmpdir.join("tasks.db"))
+    save_tasks(json_file, tasks_data)
+
+    # migration keeps everything, including the odd "True" string, and the rows' ids are the tasks' IDs
+    assert migrate_tasks(json_file, db_file) == 2
+    assert load_tasks(db_file) == [dict(task, id=number) for number, task in enumerate(tasks_data, 1)]
+
+    monkeypatch.setattr("sys.stdin", StringIO("1\n"))
+    delete_task(db_file, tasks_data)
+    storage = get_storage(db_file)
+    assert storage.count(db_file) == 1
+    assert storage.get(db_file, 0)["name"] == "Task 2"
+    assert [task["name"] for task in storage.find(db_file, status="In Progress")] == ["Task 2"]
+
+    # querying a database goes through find, with RAG ratings worked out fresh and tasks numbered by position
+    for name, due_date in (("Task 3", "2024-1-5"), ("Task 4", "2024-06-30")):
+        storage.insert(db_file, {"name": name, "description": "", "has_description": False, "importance": "high",
+                                 "date_made": "2023-03-01", "due_date": due_date, "status": "Pending", "rag": "green"})
+    assert [(number, task["name"]) for number, task in storage.query(db_file, due_before="2024-03-01")] == [(2, "Task 3")]
+    assert [(number, task["name"]) for number, task in storage.query(db_file, due_after="2024-02-01")] == [(3, "Task 4")]
+
+    def no_full_scan(*args, **kwargs):
+        raise AssertionError("query read the whole database")
+    monkeypatch.setattr(task_tracker.SqliteStorage, "iter", no_full_scan)
+    main(["--file", db_file, "query", "--status", "Pending", "--rag", "red"])
+    output = capsys.readouterr().out
+    assert "Task 3" in output and "Task 4" in output and "Task 2" not in output
+    storage.close(db_file)
+
+# Test case for the streaming loader, tiny chunks force tasks to be split across reads
+def test_iter_tasks_streams_in_chunks(temporary_tasks_file):
+    from task_tracker import get_storage
+    tasks_data = [
+        {"name": f"Task {number}", "description": "Description, with [brackets] and {braces}", "has_description": True,
+         "importance": "high", "date_made": "2024-10-01", "due_date": "2024-12-31", "status": "Pending", "rag": "green"}
+        for number in range(50)
+    ]
+    save_tasks(temporary_tasks_file, tasks_data)
+
+    streamed = get_storage(temporary_tasks_file).iter(temporary_tasks_file, chunk_size=7)
+    assert next(streamed)["name"] == "Task 0"
+    assert [task["name"] for task in streamed] == [f"Task {number}" for number in range(1, 50)]
+
+    # an empty array streams nothing
+    save_tasks(temporary_tasks_file, [])
+    assert list(get_storage(temporary_tasks_file).iter(temporary_tasks_file)) == []
+
+# Test case for paginated rendering, only the requested window ends up in the table
+def test_show_tasks_page_window(capsys):
+    import task_tracker
+    tasks_data = [
+        {"name": f"Task {number}", "description": "", "has_description": False, "importance": "low",
+         "date_made": "2024-10-01", "due_date": "2099-12-31", "status": "Pending"}
+        for number in range(1, 101)
+    ]
+    task_tracker.show_tasks(tasks_data, limit=10, start=20)
+
+    assert task_tracker.table.row_count == 10
+    assert task_tracker.table.columns[0]._cells == [str(number) for number in range(21, 31)]
+    assert "page 3 of 10" in task_tracker.table.title
+    # rows outside the window never got their RAG worked out
+    assert "rag" in tasks_data[20] and "rag" not in tasks_data[0]
+    assert task_tracker.page_count(tasks_data, 10) == 10
+
+# Test case for the batch RAG engine, it has to agree with check_rag row for row
+def test_batch_rag_matches_check_rag():
+    from datetime import timedelta
+    from task_tracker import batch_rag, check_rag
+    today = datetime.now().date()
+    tasks_data = [
+        {"due_date": str(today + timedelta(days=offset)), "status": status}
+        for offset in range(-3, 4)
+        for status in ("Pending", "In Progress", "Completed")
+    ]
+
+    assert batch_rag(tasks_data) == [check_rag(task["due_date"], task["status"]) for task in tasks_data]
+
+    # exactly midnight is the one moment the due day itself isn't late yet
+    midnight = datetime.combine(today, datetime.min.time())
+    ratings = batch_rag(tasks_data, now=midnight)
+    assert ratings[9:12] == ["green", "green", "green"]
+    assert ratings[6:9] == ["red", "red", "amber"]
+
+# Test case for the compact Task model, it has to turn back into exactly the JSON it came from
+def test_task_model_round_trip(temporary_tasks_file, monkeypatch):
+    from task_tracker import Task, load_compact_tasks
+    tasks_data = [
+        {"name": "Task 1", "description": "Description 1", "has_description": True, "importance": "high", 
+         "date_made": "2024-10-01", "due_date": "2024-12-31", "status": "Pending", "rag": "green"},
+        {"name": "Task 2", "description": "", "has_description": "True", "importance": "urgent", 
+         "date_made": "2023-03-01", "due_date": "2024-11-31", "status": "In Progress", "rag": 1},
+        {"name": "Task 3", "description": "", "has_description": 1, "importance": "low",
+         "date_made": "2023-3-1", "due_date": "2024-01-01", "status": "Completed"},
+    ]
+    save_tasks(temporary_tasks_file, tasks_data)
+
+    tasks = load_compact_tasks(temporary_tasks_file)
+    assert all(isinstance(task, Task) for task in tasks)
+    assert not hasattr(tasks[0], "__dict__")
+    # known values are stored as codes and ordinals, odd ones are kept untouched
+    assert tasks[0].importance == 0 and type(tasks[0].due_date) is int
+    assert tasks[1]["importance"] == "urgent" and tasks[1]["has_description"] == "True"
+    assert tasks[1]["due_date"] == "2024-11-31" and tasks[1]["rag"] == 1
+    assert tasks[2]["has_description"] == 1 and "rag" not in tasks[2]
+    assert tasks == tasks_data
+
+    save_tasks(temporary_tasks_file, tasks)
+    with open(temporary_tasks_file) as f:
+        assert json.load(f) == tasks_data
+
+    # the menu functions work on Task lists too
+    monkeypatch.setattr("sys.stdin", StringIO("2\nNew Task\n\nmedium\n2030-01-01\n"))
+    delete_task(temporary_tasks_file, tasks)
+    add_task(temporary_tasks_file, tasks)
+    assert [task["name"] for task in load_tasks(temporary_tasks_file)] == ["Task 1", "Task 3", "New Task"]
+
+# Test case for bulk import, bad rows are reported and skipped, good ones saved in one go
+def test_import_tasks_csv_and_ndjson(tmpdir, temporary_tasks_file):
+    from task_tracker import import_tasks
+    save_tasks(temporary_tasks_file, [
+        {"name": "Existing", "description": "", "has_description": False, "importance": "low", 
+         "date_made": "2023-03-01", "due_date": "2024-11-30", "status": "Pending", "rag": "red"},
+    ])
+
+    csv_file = tmpdir.join("import.csv")
+    csv_file.write("name,description,importance,due_date,status\n"
+                   "CSV 1,Some text,high,2030-01-01,\n"
+                   "CSV 2,,urgent,2030-01-01,\n"
+                   "CSV 3,,low,31-12-2030,Completed\n")
+    ndjson_file = tmpdir.join("import.ndjson")
+    ndjson_file.write('{"name": "NDJSON 1", "importance": "medium", "due_date": "2030-01-01", "status": "Completed"}\n'
+                      'not json\n'
+                      '\n'
+                      '{"name": "", "importance": "medium", "due_date": "2030-01-01"}\n')
+
+    errors = []
+    assert import_tasks(str(csv_file), temporary_tasks_file, on_error=lambda line, message: errors.append(line)) == (1, 2)
+    assert import_tasks(str(ndjson_file), temporary_tasks_file, on_error=lambda line, message: errors.append(line)) == (1, 2)
+    assert errors == [3, 4, 2, 4]
+
+    tasks = load_tasks(temporary_tasks_file)
+    assert [task["name"] for task in tasks] == ["Existing", "CSV 1", "NDJSON 1"]
+    assert tasks[1]["has_description"] is True and tasks[1]["status"] == "Pending"
+    assert tasks[2]["status"] == "Completed" and tasks[2]["rag"] == "green"
+
+# Helper for the stress test below, runs in its own process
+def _commit_many(task_dir, writer, edits):
+    from task_tracker import commit_changes, change_record
+    # Loaded once up front, so by the time it's used the other writers' deletes have moved things about
+    stale = load_tasks(task_dir)
+    for edit in range(edits):
+        commit_changes(task_dir, [{"op": "add", "index": None, "task": {
+            "name": f"Writer {writer} edit {edit}", "description": "", "has_description": False, "importance": "low",
+            "date_made": "2024-01-01", "due_date": "2030-01-01", "status": "Pending", "rag": "green"}}])
+        if edit == edits // 2:
+            # each writer completes its own "Keep" task and deletes its own "Drop" task
+            for position, task in enumerate(stale):
+                if task["name"] == f"Keep {writer}":
+                    commit_changes(task_dir, [change_record("update", position, task, {"status": "Completed"})])
+                elif task["name"] == f"Drop {writer}":
+                    commit_changes(task_dir, [change_record("delete", position, task)])
+
+# Stress test for group commit, N processes doing M edits each and none of them get lost
+def test_group_commit_concurrent_writers(temporary_tasks_file, monkeypatch):
+    import multiprocessing
+    import task_tracker
+    from task_tracker import commit_changes, change_record, load_compact_tasks, update_where, delete_where, Task
+    if "fork" not in multiprocessing.get_all_start_methods():
+        pytest.skip("needs fork")
+    context = multiprocessing.get_context("fork")
+    writers, edits = 6, 25
+    task = {"description": "", "has_description": False, "importance": "low", "date_made": "2024-01-01",
+            "due_date": "2030-01-01", "status": "Pending", "rag": "green"}
+    save_tasks(temporary_tasks_file, [dict(task, name=f"{kind} {writer}", id=writer * 2 + number + 1)
+                                      for writer in range(writers) for number, kind in enumerate(("Drop", "Keep"))])
+
+    processes = [context.Process(target=_commit_many, args=(temporary_tasks_file, writer, edits)) for writer in range(writers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    stored = load_tasks(temporary_tasks_file)
+    names = sorted(task["name"] for task in stored)
+    assert names == sorted([f"Writer {writer} edit {edit}" for writer in range(writers) for edit in range(edits)]
+                           + [f"Keep {writer}" for writer in range(writers)])
+    assert {task["name"] for task in stored if task["status"] == "Completed"} == {f"Keep {writer}" for writer in range(writers)}
+    # nothing left half-written next to the store
+    assert not [name for name in os.listdir(os.path.dirname(temporary_tasks_file)) if name.endswith(".tmp")]
+
+    # an edit from a list that's out of date lands on its own task, and one for a deleted task is dropped
+    save_tasks(temporary_tasks_file, [dict(task, name=f"T{number}", id=number + 1) for number in range(4)])
+    stale = load_tasks(temporary_tasks_file)
+    commit_changes(temporary_tasks_file, [change_record("delete", 0, stale[0])])
+    commit_changes(temporary_tasks_file, [change_record("update", 2, stale[2], {"status": "Completed"})])
+    commit_changes(temporary_tasks_file, [change_record("delete", 0, stale[0]), change_record("delete", 3, stale[3])])
+    assert [(task["name"], task["status"]) for task in load_tasks(temporary_tasks_file)] == [("T1", "Pending"), ("T2", "Completed")]
+
+    # shared edits refresh the menu's list from the store, and it stays a list of Task objects
+    monkeypatch.setattr(task_tracker, "SHARED_MODE", True)
+    tasks = load_compact_tasks(temporary_tasks_file)
+    monkeypatch.setattr("sys.stdin", StringIO("Shared\n\nlow\n2030-01-01\n"))
+    add_task(temporary_tasks_file, tasks)
+    update_where(temporary_tasks_file, tasks, lambda task: task["name"] == "T1", {"status": "Completed"})
+    delete_where(temporary_tasks_file, tasks, lambda task: task["name"] == "T2")
+    assert all(isinstance(task, Task) for task in tasks)
+    assert [(task["name"], task["status"]) for task in tasks] == [("T1", "Completed"), ("Shared", "Pending")]
+
+# Test case for the secondary indexes, queries should follow adds, updates and deletes
+def test_task_index_query_stays_current(temporary_tasks_file, monkeypatch, capsys):
+    from task_tracker import TaskIndex, record_change, main
+    tasks_data = [
+        {"name": "Task 1", "description": "", "has_description": False, "importance": "high", 
+         "date_made": "2024-10-01", "due_date": "2024-05-01", "status": "Pending", "rag": "red"},
+        {"name": "Task 2", "description": "", "has_description": False, "importance": "low", 
+         "date_made": "2023-03-01", "due_date": "2024-07-01", "status": "Pending", "rag": "red"},
+        {"name": "Task 3", "description": "", "has_description": False, "importance": "low", 
+         "date_made": "2023-03-01", "due_date": "2024-11-31", "status": "Completed", "rag": "amber"},
+    ]
+    save_tasks(temporary_tasks_file, tasks_data)
+    index = TaskIndex(tasks_data).attach()
+    try:
+        names = lambda tasks: [task["name"] for task in tasks]
+        assert names(index.query(status="Pending", due_before="2024-06-01")) == ["Task 1"]
+        assert names(index.query(due_after="2024-05-01")) == ["Task 2"]
+        assert names(index.query(importance="low")) == ["Task 2", "Task 3"]
+
+        monkeypatch.setattr("sys.stdin", StringIO("1\nTask 4\n\nlow\n2024-02-01\n"))
+        delete_task(temporary_tasks_file, tasks_data)
+        add_task(temporary_tasks_file, tasks_data)
+        assert names(index.query(status="Pending", due_before="2024-06-01")) == ["Task 4"]
+
+        tasks_data[0]["status"] = "Completed"
+        record_change(temporary_tasks_file, tasks_data, "update", 0)
+        assert names(index.query(status="Pending")) == ["Task 4"]
+        assert names(index.query(status="Completed", importance="low")) == ["Task 3", "Task 2"]
+    finally:
+        index.detach()
+
+    # the query command answers from one pass over the store, numbering tasks by position
+    capsys.readouterr()
+    main(["--file", temporary_tasks_file, "query", "--status", "Pending", "--due-before", "2024-06-01"])
+    output = capsys.readouterr().out
+    assert "Task 4" in output and "Task 2" not in output
+
+    # the menu's filter answers from an index on the loaded list, with RAG ratings brought up to date
+    # (Task 2's stored "red" is out of date, it's Completed so amber)
+    import task_tracker
+    answers = []
+    query = task_tracker.TaskIndex.query
+
+    def answered(self, **filters):
+        results = query(self, **filters)
+        answers.append(names(results))
+        return results
+    monkeypatch.setattr(task_tracker.TaskIndex, "query", answered)
+    monkeypatch.setattr(task_tracker, "filter_tasks", None)
+    monkeypatch.setattr("sys.stdin", StringIO("f\n\nlow\nred\n\n\n\nf\n\n\namber\n\n2024-06-01\n\n5\n"))
+    main(["--file", temporary_tasks_file, "--sync-save"])
+    assert answers == [["Task 4"], ["Task 2"]]
+
+# Test case for full-text search, ranking, prefixes, incremental updates and the saved index
+def test_search_index(temporary_tasks_file, monkeypatch):
+    from task_tracker import SearchIndex, record_change
+    tasks_data = [
+        {"name": "Threat Model", "description": "Review the FPAD threat model", "has_description": True, "importance": "high", 
+         "date_made": "2024-10-01", "due_date": "2024-05-01", "status": "Pending", "rag": "red"},
+        {"name": "Goal Setting", "description": "Think about the threat landscape", "has_description": True, "importance": "low", 
+         "date_made": "2023-03-01", "due_date": "2024-07-01", "status": "Pending", "rag": "red"},
+    ]
+    save_tasks(temporary_tasks_file, tasks_data)
+    names = lambda tasks: [task["name"] for task in tasks]
+
+    index = SearchIndex.open(temporary_tasks_file, tasks_data).attach()
+    try:
+        # name matches outrank description matches, and prefixes work
+        assert names(index.search("threat")) == ["Threat Model", "Goal Setting"]
+        assert names(index.search("thr mod")) == ["Threat Model"]
+        assert names(index.search("fpad")) == ["Threat Model"]
+        assert index.search("nothing here") == []
+
+        tasks_data[1]["description"] = "Something else entirely"
+        record_change(temporary_tasks_file, tasks_data, "update", 1)
+        monkeypatch.setattr("sys.stdin", StringIO("FPAD rollout\nnotes\nlow\n2030-01-01\n"))
+        add_task(temporary_tasks_file, tasks_data)
+        assert names(index.search("threat")) == ["Threat Model"]
+        assert names(index.search("fpad")) == ["FPAD rollout", "Threat Model"]
+        index.save()
+    finally:
+        index.detach()
+
+    # a fresh run picks the saved index up instead of rebuilding it
+    reloaded_tasks = load_tasks(temporary_tasks_file)
+    monkeypatch.setattr(SearchIndex, "build", None)
+    reloaded = SearchIndex.open(temporary_tasks_file, reloaded_tasks)
+    assert names(reloaded.search("fpad")) == ["FPAD rollout", "Threat Model"]
+
+# Test case for the benchmark helpers, same seed same store, and regressions get caught
+def test_benchmark_generator_and_compare():
+    import time
+    from benchmark_task_tracker import generate_tasks, compare_results, measure
+    first = list(generate_tasks(200, seed=3))
+    assert first == list(generate_tasks(200, seed=3))
+    assert first != list(generate_tasks(200, seed=4))
+    assert all(validate_date(task["due_date"]) and task["due_date"] > task["date_made"] for task in first)
+    assert {task["status"] for task in first} == {"In Progress", "Pending", "Completed"}
+
+    baseline = {"load_tasks@1000": {"seconds": 1.0, "peak_bytes": 100}}
+    assert compare_results({"load_tasks@1000": {"seconds": 1.2, "peak_bytes": 100}}, baseline, 0.25) == []
+    assert len(compare_results({"load_tasks@1000": {"seconds": 1.3, "peak_bytes": 200}}, baseline, 0.25)) == 2
+
+    # one slow run (the machine was busy) doesn't count, the quickest does
+    delays = [0.2, 0, 0, 0]
+    seconds, peak = measure(lambda: time.sleep(delays.pop(0)), repeat=3)
+    assert seconds < 0.1 and not delays
+
+# Test case for --profile, hot paths get counted and timed, then put back as they were
+def test_profiling_records_hot_paths(temporary_tasks_file):
+    import task_tracker
+    original = task_tracker.load_tasks
+    save_tasks(temporary_tasks_file, [
+        {"name": "Task 1", "description": "", "has_description": False, "importance": "high", 
+         "date_made": "2024-10-01", "due_date": "2024-12-31", "status": "Pending", "rag": "green"},
+    ])
+
+    profiler = task_tracker.enable_profiling(memory=True)
+    try:
+        tasks = task_tracker.load_tasks(temporary_tasks_file)
+        task_tracker.load_tasks(temporary_tasks_file)
+        task_tracker.show_tasks(tasks)
+    finally:
+        task_tracker.disable_profiling(profiler)
+
+    assert task_tracker.load_tasks is original
+    assert profiler.stats["load_tasks"]["calls"] == 2
+    # show_tasks rates its rows through batch_rag, which is counted separately
+    assert profiler.stats["batch_rag"]["calls"] == 1
+    assert profiler.stats["show_tasks"]["seconds"] >= profiler.stats["batch_rag"]["seconds"]
+    assert profiler.stats["show_tasks"]["peak_bytes"] > 0
+
+    profiler.dump(temporary_tasks_file + ".profile")
+    with open(temporary_tasks_file + ".profile") as f:
+        assert json.load(f)["load_tasks"]["calls"] == 2
+
+# Test case for the snapshot cache, an unchanged store is read back without parsing the JSON
+def test_snapshot_cache(temporary_tasks_file, monkeypatch):
+    import pickle
+    import task_tracker
+    from task_tracker import get_storage, load_compact_tasks
+    tasks_data = [
+        {"name": "Task 1", "description": "", "has_description": False, "importance": "high", 
+         "date_made": "2024-10-01", "due_date": "2024-12-31", "status": "Pending", "rag": "green"},
+        {"name": "Odd", "importance": 2, "due_date": "2024-02-30", "status": None, "notes": ["kept"]},
+    ]
+    # saving and plain loads don't write a cache, loading the menu's way does
+    save_tasks(temporary_tasks_file, tasks_data)
+    assert load_tasks(temporary_tasks_file) == tasks_data
+    assert not os.path.exists(temporary_tasks_file + ".cache")
+    parsed = load_compact_tasks(temporary_tasks_file)
+    assert os.path.exists(temporary_tasks_file + ".cache")
+
+    def no_parsing(*args, **kwargs):
+        raise AssertionError("store was parsed instead of read from the cache")
+    with monkeypatch.context() as patch:
+        patch.setattr(task_tracker.json, "loads", no_parsing)
+        patch.setattr(task_tracker.JsonStorage, "iter", no_parsing)
+        patch.setattr(task_tracker.Task, "from_dict", no_parsing)
+        # the cache holds the encoded slots, so tasks come back exactly as they were parsed
+        cached = load_compact_tasks(temporary_tasks_file)
+        assert [dict(task) for task in cached] == tasks_data
+        assert [task.slot_values() for task in cached] == [task.slot_values() for task in parsed]
+
+    # someone else editing the file makes the cache stale, and a save clears it away
+    with open(temporary_tasks_file, "w") as f:
+        json.dump(tasks_data * 2, f)
+    assert get_storage(temporary_tasks_file).read_cache(temporary_tasks_file) is None
+    assert len(load_compact_tasks(temporary_tasks_file)) == 4
+    save_tasks(temporary_tasks_file, tasks_data)
+    assert not os.path.exists(temporary_tasks_file + ".cache")
+
+    # a pickle planted as the cache is never unpickled
+    class Planted:
+        def __reduce__(self):
+            return (os.remove, (temporary_tasks_file,))
+    load_compact_tasks(temporary_tasks_file)
+    with open(temporary_tasks_file + ".cache", "wb") as f:
+        pickle.dump(Planted(), f)
+    assert [dict(task) for task in load_compact_tasks(temporary_tasks_file)] == tasks_data
+
+# Test case for fast startup, importing shouldn't drag in rich and friends, and the menu should be up quickly
+def test_startup_is_lazy_and_within_budget(tmpdir):
+    import subprocess
+    import sys
+    import task_tracker
+    from benchmark_task_tracker import write_store
+    directory = os.path.dirname(os.path.abspath(task_tracker.__file__))
+    script = ("import sys, time; started = time.perf_counter(); import task_tracker; "
+              "print(time.perf_counter() - started); "
+              "print(','.join(sorted(name for name in ('rich', 'sqlite3', 'csv', 'tempfile', 'tracemalloc') if name in sys.modules)))")
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True, cwd=directory).stdout.split("\n")
+    assert float(output[0]) < task_tracker.STARTUP_BUDGET_SECONDS
+    assert output[1] == ""
+
+    # startup to the first menu drawn, once the snapshot cache is warm
+    store = str(tmpdir.join("tasks.json"))
+    write_store(store, 1000)
+    menu = f"import task_tracker; task_tracker.main(['--file', {store!r}, '--sync-save']); print(task_tracker.STARTUP_SECONDS)"
+    timings = [float(subprocess.run([sys.executable, "-c", menu], input="5\n", capture_output=True, text=True, check=True,
+                                    cwd=directory).stdout.strip().split("\n")[-1]) for run in range(2)]
+    assert os.path.exists(store + ".cache")
+    assert timings[-1] < task_tracker.STARTUP_BUDGET_SECONDS
+
+# Test case for the memory-mapped binary store, lossless both ways and only decodes what's used
+def test_binary_store_round_trip_and_lazy_decode(tmpdir, monkeypatch):
+    import task_tracker
+    from task_tracker import migrate_tasks, load_compact_tasks
+    tasks_data = [
+        {"name": f"Task {number}", "description": "Déjà vu " * number, "has_description": bool(number), "importance": "high",
+         "date_made": "2024-10-01", "due_date": "2024-12-31", "status": "Pending", "rag": "green"}
+        for number in range(100)
+    ] + [
+        {"name": "Odd one", "description": "", "has_description": "True", "importance": "urgent",
+         "date_made": "2023-3-1", "due_date": "2024-11-31", "status": "Completed", "id": 7},
+    ]
+    json_file, bin_file, back_file = (str(tmpdir.join(name)) for name in ("tasks.json", "tasks.tbin", "back.json"))
+    save_tasks(json_file, tasks_data)
+
+    assert migrate_tasks(json_file, bin_file) == 101
+    assert migrate_tasks(bin_file, back_file) == 101
+    with open(json_file) as original, open(back_file) as exported:
+        assert json.load(exported) == json.load(original)
+
+    tasks = load_compact_tasks(bin_file)
+    assert len(tasks) == 101 and tasks.decoded == {}
+    task_tracker.show_tasks(tasks, limit=10, start=20)
+    assert sorted(tasks.decoded) == list(range(20, 30))
+    assert tasks[100]["importance"] == "urgent" and tasks[100]["id"] == 7
+
+    # edits still work on the lazy list
+    monkeypatch.setattr("sys.stdin", StringIO("1\nNew Task\n\nlow\n2030-01-01\n"))
+    delete_task(bin_file, tasks)
+    add_task(bin_file, tasks)
+    reloaded = load_tasks(bin_file)
+    assert len(reloaded) == 101
+    assert reloaded[0]["name"] == "Task 1" and reloaded[-1]["name"] == "New Task"
+
+# Test case for updating, only the changed fields get persisted and to the caller's file
+def test_update_task_persists_only_changes(temporary_tasks_file, monkeypatch):
+    import task_tracker
+    from task_tracker import load_compact_tasks
+    monkeypatch.setattr(task_tracker, "JOURNAL_MODE", True)
+    tasks_data = [
+        {"name": "Task 1", "description": "Description 1", "has_description": True, "importance": "high", 
+         "date_made": "2024-10-01", "due_date": "2024-12-31", "status": "Pending", "rag": "green"},
+        {"name": "Task 2", "description": "", "has_description": False, "importance": "low", 
+         "date_made": "2023-03-01", "due_date": "2024-11-30", "status": "In Progress", "rag": "green"},
+    ]
+    save_tasks(temporary_tasks_file, tasks_data)
+
+    for tasks in (tasks_data, load_compact_tasks(temporary_tasks_file)):
+        # status set to what it already was, nothing to write
+        monkeypatch.setattr("sys.stdin", StringIO("2\n5\nIn Progress\n"))
+        update_task(temporary_tasks_file, tasks)
+        assert not os.path.exists(temporary_tasks_file + ".journal")
+
+    monkeypatch.setattr("sys.stdin", StringIO("2\n5\nCompleted\n"))
+    update_task(temporary_tasks_file, tasks)
+    with open(temporary_tasks_file + ".journal") as f:
+        assert [json.loads(line) for line in f] == [{"op": "update", "index": 1, "fields": {"status": "Completed"}}]
+    assert load_tasks(temporary_tasks_file)[1]["status"] == "Completed"
+    assert load_tasks(temporary_tasks_file)[1]["name"] == "Task 2"
+
+# Test case for the daemon, the menu's add/update/delete go through the socket and end up saved
+def test_daemon_serves_clients(tmpdir, monkeypatch, caplog):
+    import logging
+    import shutil
+    import tempfile
+    import threading
+    import time
+    import task_tracker
+    from task_tracker import load_compact_tasks, run_daemon, DaemonClient, DAEMON_STORAGE
+    tasks_file = str(tmpdir.join("tasks.json"))
+    save_tasks(tasks_file, [
+        {"name": "Task 1", "description": "", "has_description": False, "importance": "high",
+         "date_made": "2024-10-01", "due_date": "2024-12-31", "status": "Pending", "rag": "green"},
+    ])
+    # Unix socket paths have a short length limit, so not under tmpdir
+    socket_dir = tempfile.mkdtemp()
+    socket_path = os.path.join(socket_dir, "t.sock")
+    daemon = threading.Thread(target=run_daemon, args=(tasks_file, socket_path, 0.05))
+    daemon.start()
+    try:
+        for _ in range(100):
+            if os.path.exists(socket_path):
+                break
+            time.sleep(0.02)
+        store = "unix:" + socket_path
+        tasks = load_compact_tasks(store)
+        assert [task["name"] for task in tasks] == ["Task 1"]
+
+        monkeypatch.setattr("sys.stdin", StringIO("New Task\n\nlow\n2030-01-01\n1\n5\nCompleted\n"))
+        add_task(store, tasks)
+        update_task(store, tasks)
+        monkeypatch.setattr("sys.stdin", StringIO("1\n"))
+        delete_task(store, tasks)
+
+        client = DaemonClient(socket_path)
+        assert client.request("count") == 1
+        assert client.request("get", index=0)["name"] == "New Task"
+        assert [result["number"] for result in client.request("query", importance="low")] == [1]
+        with pytest.raises(ValueError):
+            client.request("get", index=5)
+        client.request("shutdown")
+        client.close()
+        daemon.join(5)
+        # the client still connected (the store's) gets hung up on, and its connection ending isn't logged as an error
+        idle = DAEMON_STORAGE.client(store).connection
+        idle.settimeout(5)
+        assert idle.recv(1) == b""
+        assert not [record for record in caplog.records if record.levelno >= logging.ERROR]
+    finally:
+        daemon.join(5)
+        DAEMON_STORAGE.close(store)
+        shutil.rmtree(socket_dir)
+    assert [task["name"] for task in load_tasks(tasks_file)] == ["New Task"]
+    assert not os.path.exists(socket_path)
+
+# Test case for several daemon clients, edits find their task by ID and a flush waits for a save under way
+def test_daemon_clients_by_id_and_flush(tmpdir, monkeypatch):
+    import shutil
+    import tempfile
+    import threading
+    import time
+    import task_tracker
+    from task_tracker import load_compact_tasks, record_change, run_daemon, DaemonClient, DAEMON_STORAGE
+    tasks_file = str(tmpdir.join("tasks.json"))
+    save_tasks(tasks_file, [{"name": f"T{number}", "description": "", "has_description": False, "importance": "low",
+                             "date_made": "2024-10-01", "due_date": "2030-01-01", "status": "Pending", "rag": "green"} for number in range(4)])
+    socket_dir = tempfile.mkdtemp()
+    socket_path = os.path.join(socket_dir, "t.sock")
+    # a daemon thread, so a failed assert can't leave the test run hanging on it
+    daemon = threading.Thread(target=run_daemon, args=(tasks_file, socket_path, 0.05), daemon=True)
+    daemon.start()
+    try:
+        for _ in range(100):
+            if os.path.exists(socket_path):
+                break
+            time.sleep(0.02)
+        store = "unix:" + socket_path
+        first, second = load_compact_tasks(store), load_compact_tasks(store)
+        # one client deletes T0, the other (its list now out of date) completes T2 and then deletes T3
+        removed = first.pop(0)
+        record_change(store, first, "delete", 0, removed)
+        second[2]["status"] = "Completed"
+        record_change(store, second, "update", 2, fields={"status": "Completed"})
+        removed = second.pop(3)
+        record_change(store, second, "delete", 3, removed)
+
+        client = DaemonClient(socket_path)
+        assert [(task["name"], task["status"]) for task in client.request("load")] == [("T1", "Pending"), ("T2", "Completed")]
+
+        # a flush asked for while a slow background save is writing only answers once that's on disk
+        def slow_save(*args):
+            time.sleep(0.5)
+            save_tasks(*args)
+        monkeypatch.setattr(task_tracker, "save_tasks", slow_save)
+        client.request("update", id=2, fields={"status": "In Progress"})
+        time.sleep(0.2)
+        assert client.request("flush") is True
+        assert [task["status"] for task in load_tasks(tasks_file)] == ["In Progress", "Completed"]
+
+        # the flush's own save is written off the event loop too, other clients get answered meanwhile
+        flushed = []
+        client.request("update", id=2, fields={"status": "Pending"})
+        flusher = threading.Thread(target=lambda: flushed.append(client.request("flush")))
+        flusher.start()
+        time.sleep(0.1)
+        other = DaemonClient(socket_path)
+        started = time.perf_counter()
+        assert other.request("ping") == "pong"
+        assert time.perf_counter() - started < 0.3
+        flusher.join(5)
+        other.close()
+        assert flushed == [True] and load_tasks(tasks_file)[0]["status"] == "Pending"
+        client.request("shutdown")
+        client.close()
+    finally:
+        daemon.join(5)
+        DAEMON_STORAGE.close(store)
+        shutil.rmtree(socket_dir)
+
+# Test case for validate/repair, problems are reported per task and the fixable ones fixed
+def test_validate_and_repair_store(tmpdir):
+    from task_tracker import validate_store, main, migrate_tasks, _store_parts, ShardedTaskList
+    tasks_file, fixed_file = str(tmpdir.join("tasks.json")), str(tmpdir.join("fixed.json"))
+    good = {"name": "Task 1", "description": "Description 1", "has_description": True, "importance": "high",
+            "date_made": "2024-10-01", "due_date": "2024-12-31", "status": "Pending", "rag": "red"}
+    tasks_data = [
+        good,
+        dict(good, name="Task 2", has_description="True", importance="High", date_made="2023-3-1"),
+        dict(good, name="Task 3", importance="urgent", status="done", due_date="2024-11-31"),
+    ] + [dict(good, name=f"Task {number}") for number in range(4, 50)]
+    save_tasks(tasks_file, tasks_data)
+    # the workers each read their own run of whole tasks straight from the file
+    assert len(_store_parts(tasks_file, 8)) == 8
+
+    checked, report, repaired = validate_store(tasks_file, workers=2, chunk_size=5)
+    assert checked == 49 and repaired is None
+    assert [(problem["number"], problem["field"], problem["fixed"]) for problem in report] == [
+        (2, "has_description", True), (2, "importance", True), (2, "date_made", True),
+        (3, "importance", True), (3, "status", True), (3, "due_date", False),
+    ]
+
+    main(["--file", tasks_file, "repair", "--workers", "1", "--output", fixed_file])
+    fixed = load_tasks(fixed_file)
+    assert fixed[0] == good and len(fixed) == 49
+    assert fixed[1]["has_description"] is True and fixed[1]["importance"] == "high" and fixed[1]["date_made"] == "2023-03-01"
+    assert fixed[2]["importance"] == "medium" and fixed[2]["status"] == "Pending" and fixed[2]["due_date"] == "2024-11-31"
+    # the original is left alone when --output is given
+    assert load_tasks(tasks_file)[1]["importance"] == "High"
+
+    # a file not laid out the way save writes it is streamed in instead, with the same results
+    hand_file = str(tmpdir.join("hand.json"))
+    with open(hand_file, "w") as f:
+        json.dump(tasks_data, f)
+    assert _store_parts(hand_file, 8) is None
+    assert validate_store(hand_file, workers=2, chunk_size=5)[1] == report
+
+    # a sharded store is checked a shard per worker, and the repaired list can be saved back shard by shard
+    store = str(tmpdir.join("tasks.shards"))
+    migrate_tasks(tasks_file, store)
+    checked, sharded_report, repaired = validate_store(store, workers=2, repair=True)
+    assert checked == 49 and len(_store_parts(store, 8)) == 2
+    assert sorted((problem["field"], problem["fixed"]) for problem in sharded_report) == sorted((problem["field"], problem["fixed"]) for problem in report)
+    assert isinstance(repaired, ShardedTaskList) and not any(task["importance"] == "High" for task in repaired)
+
+# Test case for sharded stores, views load only some shards and edits only rewrite the shard they touch
+def test_sharded_store_views_and_archive(tmpdir, monkeypatch):
+    import task_tracker
+    from task_tracker import load_compact_tasks, migrate_tasks, main
+    today = datetime.today().strftime('%Y-%m-%d')
+    def task(name, date_made, status):
+        return {"name": name, "description": "", "has_description": False, "importance": "low",
+                "date_made": date_made, "due_date": "2030-01-01", "status": status, "rag": "green"}
+    json_file, store = str(tmpdir.join("tasks.json")), str(tmpdir.join("tasks.shards"))
+    save_tasks(json_file, [task("Old done", "2020-01-05", "Completed"), task("Old open", "2020-01-20", "Pending"),
+                           task("Mid done", "2021-06-01", "Completed"), task("Now", today, "Pending")])
+    assert migrate_tasks(json_file, store) == 4
+    assert sorted(os.listdir(store)) == sorted(["manifest.json", "2020-01.json", "2021-06.json", today[:7] + ".json"])
+
+    main(["--file", store, "archive", "--before", "2021-01"])
+    assert sorted(os.listdir(store)) == sorted(["manifest.json", "2020-01.archive.json", "2020-01.json", "2021-06.json", today[:7] + ".json"])
+    assert [t["name"] for t in load_tasks(store)] == ["Old done", "Old open", "Mid done", "Now"]
+
+    # The recent view skips the archive and 2021-06 (nothing open there)
+    monkeypatch.setattr(task_tracker, "SHARD_VIEW", "recent")
+    tasks = load_compact_tasks(store)
+    assert [t["name"] for t in tasks] == ["Old open", "Now"]
+    untouched = {name: os.stat(os.path.join(store, name)).st_mtime_ns for name in ("2021-06.json",)}
+    monkeypatch.setattr("sys.stdin", StringIO("1\n5\nCompleted\nNew Task\n\nhigh\n2030-01-01\n2\n"))
+    update_task(store, tasks)
+    add_task(store, tasks)
+    delete_task(store, tasks)
+    assert [t["name"] for t in tasks] == ["Old open", "New Task"]
+    assert untouched == {name: os.stat(os.path.join(store, name)).st_mtime_ns for name in untouched}
+    # completing "Old open" moved it into the (unloaded) archive shard, emptying 2020-01
+    assert not os.path.exists(os.path.join(store, "2020-01.json"))
+
+    monkeypatch.setattr(task_tracker, "SHARD_VIEW", None)
+    everything = load_tasks(store)
+    assert [t["name"] for t in everything] == ["Old done", "Old open", "Mid done", "New Task"]
+    assert everything[1]["status"] == "Completed"
+
+    # each list keeps its own bookkeeping, so loading another view in between doesn't mix them up
+    from task_tracker import record_change
+    monkeypatch.setattr(task_tracker, "SHARD_VIEW", "recent")
+    recent = load_compact_tasks(store)
+    monkeypatch.setattr(task_tracker, "SHARD_VIEW", None)
+    load_tasks(store)
+    recent.append(task("Backdated", "2020-01-10", "Pending"))
+    record_change(store, recent, "add", len(recent) - 1)
+    assert os.path.exists(os.path.join(store, "2020-01.archive.json"))
+    assert [t["name"] for t in load_tasks(store)] == ["Old done", "Old open", "Backdated", "Mid done", "New Task"]
+
+# Test case for the RAG maintainer, only tasks falling due or being edited get re-rated
+def test_rag_maintainer_rerates_only_changes():
+    from task_tracker import RagMaintainer, notify_change
+    def task(name, due_date, status="Pending"):
+        return {"name": name, "due_date": due_date, "status": status, "rag": "green"}
+    tasks = [task("Soon", "2025-01-10"), task("Later", "2025-03-01"), task("Done", "2025-01-05", "Completed"),
+             task("Late", "2024-12-01")] + [task(f"Far {number}", "2030-01-01") for number in range(100)]
+    rag = RagMaintainer(tasks).attach()
+    try:
+        rag.refresh(tasks, now=datetime(2025, 1, 1, 9))
+        assert [t["rag"] for t in tasks[:5]] == ["green", "green", "green", "red", "green"]
+        assert rag.evaluated == 104
+
+        # nothing has fallen due, so redrawing costs nothing
+        assert rag.refresh(tasks, now=datetime(2025, 1, 2, 9)) == [] and rag.evaluated == 104
+        changed = rag.refresh(tasks, now=datetime(2025, 1, 10, 9))
+        assert [t["name"] for t in changed] == ["Done", "Soon"]
+        assert [t["rag"] for t in tasks[:3]] == ["red", "green", "amber"] and rag.evaluated == 106
+
+        # a status edit is picked up straight away, a deleted task is forgotten
+        tasks[0]["status"] = "Completed"
+        notify_change(tasks, "update", 0, tasks[0])
+        assert tasks[0]["rag"] == "amber"
+        removed = tasks.pop(1)
+        notify_change(tasks, "delete", 1, removed)
+        assert rag.refresh(now=datetime(2025, 6, 1, 9)) == [] and removed["rag"] == "green"
+    finally:
+        rag.detach()
+
+# Test case for exporting, filters match query's and each format streams out the matching tasks
+def test_export_formats_and_filters(tmpdir):
+    import csv
+    from task_tracker import export_tasks, main
+    tasks_file = str(tmpdir.join("tasks.json"))
+    save_tasks(tasks_file, [
+        {"name": "Late <b>", "description": "Needs, commas", "has_description": True, "importance": "high",
+         "date_made": "2024-10-01", "due_date": "2020-01-01", "status": "Pending", "rag": "green"},
+        {"name": "Done late", "description": "", "has_description": False, "importance": "low",
+         "date_made": "2024-10-01", "due_date": "2020-06-01", "status": "Completed", "rag": "green"},
+        {"name": "Future", "description": "", "has_description": False, "importance": "high",
+         "date_made": "2024-10-01", "due_date": "2999-01-01", "status": "Pending", "rag": "green"},
+    ])
+
+    csv_file = str(tmpdir.join("report.csv"))
+    assert export_tasks(tasks_file, csv_file, importance="high") == 2
+    with open(csv_file, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [(row["number"], row["name"], row["description"], row["rag"]) for row in rows] == [
+        ("1", "Late <b>", "Needs, commas", "red"), ("3", "Future", "", "green")]
+
+    ndjson_file = str(tmpdir.join("report.ndjson"))
+    main(["--file", tasks_file, "export", ndjson_file, "--due-after", "2020-01-01", "--due-before", "2999-01-01"])
+    with open(ndjson_file) as f:
+        assert [json.loads(line)["name"] for line in f] == ["Done late"]
+
+    html_file = str(tmpdir.join("report.html"))
+    assert export_tasks(tasks_file, html_file) == 3
+    with open(html_file) as f:
+        page = f.read()
+    assert "<td>Late &lt;b&gt;</td>" in page
+    assert 'tr.amber { color: #c0c0c0; background: #ff5f00; }' in page
+    assert page.count('<tr class="red">') == 1 and page.count('<tr class="amber">') == 1 and page.count('<tr class="green">') == 1
+    with pytest.raises(ValueError):
+        export_tasks(tasks_file, str(tmpdir.join("report.xlsx")))
+
+# Test case for stable IDs, old stores get numbered once, IDs survive deletes and bulk delete is one save
+def test_task_ids_and_delete_where(temporary_tasks_file, monkeypatch):
+    import task_tracker
+    from task_tracker import TaskIds, load_compact_tasks, parse_where, delete_where, main
+    save_tasks(temporary_tasks_file, [
+        {"name": f"Task {number}", "description": "", "has_description": False, "importance": ("high", "low")[number % 2],
+         "date_made": "2024-10-01", "due_date": f"2024-{number % 12 + 1:02d}-15", "status": ("Pending", "Completed")[number % 3 == 0], "rag": "green"}
+        for number in range(1, 31)
+    ])
+    tasks = load_compact_tasks(temporary_tasks_file)
+    ids = TaskIds.open(temporary_tasks_file, tasks).attach()
+    try:
+        assert ids.assigned == 30 and [task["id"] for task in load_tasks(temporary_tasks_file)] == list(range(1, 31))
+
+        # deleting by ID leaves every other task's ID alone, new tasks get a fresh one
+        monkeypatch.setattr("sys.stdin", StringIO("2\nNew Task\n\nlow\n2030-01-01\n31\n5\nIn Progress\n"))
+        delete_task(temporary_tasks_file, tasks, ids)
+        add_task(temporary_tasks_file, tasks)
+        update_task(temporary_tasks_file, tasks, ids=ids)
+        assert ids.get(2) is None and ids.position(3) == 1 and ids.get(31)["name"] == "New Task"
+        assert load_tasks(temporary_tasks_file)[-1] == dict(ids.get(31))
+        assert ids.get(31)["status"] == "In Progress"
+    finally:
+        ids.detach()
+
+    matches = parse_where("status=Completed and due_date < 2024-06-01 and importance!=high")
+    assert [task["id"] for task in tasks if matches(task)] == [3, 15, 27]
+    saves = []
+    monkeypatch.setattr(task_tracker, "save_tasks", lambda *args: saves.append(args) or save_tasks(*args))
+    assert delete_where(temporary_tasks_file, tasks, matches) == 3 and len(saves) == 1
+    monkeypatch.undo()
+    with pytest.raises(ValueError):
+        parse_where("due_date < soon")
+
+    main(["--file", temporary_tasks_file, "delete", "--where", "id>=20 and rag=red"])
+    main(["--file", temporary_tasks_file, "delete", "1", "4"])
+    assert [task["id"] for task in load_tasks(temporary_tasks_file)] == [5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 18, 19, 21, 24, 30, 31]
+
+# Test case for bulk update, one pass and one save, RAG redone only for the rows that changed
+def test_update_where_bulk_changes(temporary_tasks_file, monkeypatch, capsys):
+    import task_tracker
+    from task_tracker import parse_where, parse_assignments, update_where, delete_where, migrate_tasks, get_storage, main
+    tasks_data = [
+        {"name": f"Task {number}", "description": "", "has_description": False, "importance": ("high", "low")[number % 2],
+         "date_made": "2024-10-01", "due_date": f"2024-{number:02d}-15", "status": ("Pending", "Completed")[number == 3], "rag": "stale"}
+        for number in range(1, 11)
+    ]
+    save_tasks(temporary_tasks_file, tasks_data)
+
+    saves = []
+    monkeypatch.setattr(task_tracker, "save_tasks", lambda *args: saves.append(args) or save_tasks(*args))
+    matches = parse_where("due_date<2024-06-01 and importance=low")
+    assert update_where(temporary_tasks_file, tasks_data, matches, parse_assignments(["status=Completed"]), dry_run=True) == (3, 2)
+    assert saves == [] and tasks_data[0]["status"] == "Pending"
+    assert update_where(temporary_tasks_file, tasks_data, matches, parse_assignments(["status=Completed"])) == (3, 2)
+    assert len(saves) == 1
+    monkeypatch.undo()
+
+    stored = load_tasks(temporary_tasks_file)
+    assert [task["status"] for task in stored[:6]] == ["Completed", "Pending", "Completed", "Pending", "Completed", "Pending"]
+    # only the two edited tasks got re-rated
+    assert [task["rag"] for task in stored[:6]] == ["amber", "stale", "stale", "stale", "amber", "stale"]
+
+    main(["--file", temporary_tasks_file, "update", "--set", "importance=medium", "--set", "description=Sprint 4",
+          "--where", "status=Completed"])
+    assert "3 tasks matched, 3 changed" in capsys.readouterr().out
+    assert [task["name"] for task in load_tasks(temporary_tasks_file) if task["importance"] == "medium" and task["has_description"]] == [
+        "Task 1", "Task 3", "Task 5"]
+    with pytest.raises(ValueError):
+        parse_assignments(["status=Done"])
+
+    # a database only gets the rows that changed written, not the whole table again
+    db_file = os.path.splitext(temporary_tasks_file)[0] + ".db"
+    migrate_tasks(temporary_tasks_file, db_file)
+    tasks = load_tasks(db_file)
+
+    def no_full_save(*args):
+        raise AssertionError("the whole store was saved")
+    monkeypatch.setattr(task_tracker, "save_tasks", no_full_save)
+    monkeypatch.setattr(task_tracker.SqliteStorage, "save", no_full_save)
+    assert update_where(db_file, tasks, parse_where("importance=high"), {"status": "In Progress"}) == (5, 5)
+    assert delete_where(db_file, tasks, parse_where("status=Completed")) == 3
+    monkeypatch.undo()
+    assert load_tasks(db_file) == tasks and len(tasks) == 7
+    get_storage(db_file).close(db_file)
+
+# Test case for the compressed formats, lossless and repeated strings are stored (and loaded) once
+def test_compressed_store_round_trip(tmpdir):
+    import gzip
+    from task_tracker import migrate_tasks
+    goal = "Set yearly goals with your manager and write them up. " * 20
+    tasks_data = [
+        {"name": "Goal Setting", "description": goal, "has_description": True, "importance": "high",
+         "date_made": f"20{year}-01-05", "due_date": f"20{year}-02-01", "status": "Completed", "rag": "amber", "id": year}
+        for year in range(10, 30)
+    ] + [{"name": "Odd one", "description": None, "has_description": "True", "importance": "urgent", "tags": ["a", 1]}]
+    json_file = str(tmpdir.join("tasks.json"))
+    save_tasks(json_file, tasks_data)
+
+    for extension in (".json.gz", ".json.xz"):
+        compressed = str(tmpdir.join("tasks" + extension))
+        assert migrate_tasks(json_file, compressed) == 21
+        loaded = load_tasks(compressed)
+        assert loaded == tasks_data
+        assert loaded[0]["description"] is loaded[19]["description"]
+        assert os.path.getsize(compressed) * 20 < os.path.getsize(json_file)
+
+    with open(str(tmpdir.join("tasks.json.gz")), 'rb') as f:
+        payload = json.loads(gzip.decompress(f.read()))
+    assert payload["strings"].count(goal) == 1
+
+# Test case for background saving, edits return straight away and a burst of them is one write
+def test_background_writer_coalesces_and_flushes(temporary_tasks_file, monkeypatch):
+    import threading
+    import task_tracker
+    from task_tracker import BackgroundWriter, record_change
+    tasks_data = [{"name": f"Task {number}", "description": "", "has_description": False, "importance": "low",
+                   "date_made": "2024-10-01", "due_date": "2030-01-01", "status": "Pending", "rag": "green"} for number in range(5)]
+    save_tasks(temporary_tasks_file, tasks_data)
+
+    saves = []
+    release = threading.Event()
+    def slow_save(*args):
+        release.wait(5)
+        saves.append([task["status"] for task in args[1]])
+        save_tasks(*args)
+    monkeypatch.setattr(task_tracker, "save_tasks", slow_save)
+    writer = BackgroundWriter(delay=0.05)
+    monkeypatch.setattr(task_tracker, "BACKGROUND_WRITER", writer)
+
+    # the save is stuck, yet every edit comes straight back
+    for number in range(5):
+        tasks_data[number]["status"] = "Completed"
+        record_change(temporary_tasks_file, tasks_data, "update", number, fields={"status": "Completed"})
+    assert writer.pending == 5
+    release.set()
+    assert writer.close()
+    assert writer.pending == 0 and writer.error is None
+    assert len(saves) <= 2 and saves[-1] == ["Completed"] * 5
+    assert [task["status"] for task in load_tasks(temporary_tasks_file)] == ["Completed"] * 5
+
+# Test case for background saving on stores that write edits in place, the edits go through as change records
+def test_background_writer_commits_records(tmpdir, monkeypatch):
+    import time
+    import task_tracker
+    from task_tracker import BackgroundWriter, TaskIds, record_change
+    def no_full_save(*args):
+        raise AssertionError("an in place store was rewritten whole")
+    monkeypatch.setattr(task_tracker, "JOURNAL_MODE", True)
+    for store in ("tasks.json", "tasks.db"):
+        task_dir = str(tmpdir.join(store))
+        save_tasks(task_dir, [{"name": f"Task {number}", "description": "", "has_description": False, "importance": "low",
+                               "date_made": "2024-10-01", "due_date": "2030-01-01", "status": "Pending", "rag": "green"} for number in range(3)])
+        tasks_data = load_tasks(task_dir)
+        ids = TaskIds.open(task_dir, tasks_data).attach()
+        with monkeypatch.context() as patch:
+            patch.setattr(task_tracker, "save_tasks", no_full_save)
+            patch.setattr(task_tracker.JsonStorage, "save", no_full_save)
+            patch.setattr(task_tracker.SqliteStorage, "save", no_full_save)
+            writer = BackgroundWriter(delay=0.3)
+            patch.setattr(task_tracker, "BACKGROUND_WRITER", writer)
+            started = time.monotonic()
+
+            for status in ("In Progress", "Completed"):
+                tasks_data[0]["status"] = status
+                record_change(task_dir, tasks_data, "update", 0, fields={"status": status})
+            tasks_data.append(dict(tasks_data[1], name="Temporary"))
+            record_change(task_dir, tasks_data, "add", 3)
+            record_change(task_dir, tasks_data, "delete", 3, task=tasks_data.pop())
+            task = tasks_data.pop(1)
+            record_change(task_dir, tasks_data, "delete", 1, task=task)
+            # more edits during the pause don't cut it short
+            time.sleep(0.1)
+            tasks_data[1]["name"] = "Renamed"
+            record_change(task_dir, tasks_data, "update", 1, fields={"name": "Renamed"})
+            while writer.pending:
+                time.sleep(0.01)
+            assert time.monotonic() - started >= 0.3
+            assert writer.close() and writer.error is None
+            ids.detach()
+
+        if store == "tasks.json":
+            # the burst was coalesced into a status update, a delete and a rename
+            with open(task_dir + ".journal") as f:
+                assert [json.loads(line)["op"] for line in f] == ["update", "delete", "update"]
+        assert [(task["name"], task["status"]) for task in load_tasks(task_dir)] == [("Task 0", "Completed"), ("Renamed", "Pending")]
+        assert [task["id"] for task in load_tasks(task_dir)] == [1, 3]
+
+# Test case for the menu with background saving, changes are on disk once it exits
+def test_menu_background_save_on_exit(temporary_tasks_file, monkeypatch):
+    import task_tracker
+    from task_tracker import main
+    save_tasks(temporary_tasks_file, [])
+    # keeps the menu's SIGTERM/SIGHUP handlers out of the test run
+    monkeypatch.setattr("signal.signal", lambda *args: None)
+    monkeypatch.setattr("sys.stdin", StringIO("2\nNew Task\n\nlow\n2030-01-01\n5\n"))
+    main(["--file", temporary_tasks_file])
+    assert task_tracker.BACKGROUND_WRITER is None
+    assert [task["name"] for task in load_tasks(temporary_tasks_file)] == ["New Task"]
+
+# Test case for the live dashboard, an outside edit only re-formats the rows it touched
+def test_dashboard_patches_changed_rows(temporary_tasks_file):
+    import io
+    from datetime import datetime
+    from rich.console import Console
+    from task_tracker import Dashboard, parse_where
+    tasks_data = [{"id": number + 1, "name": f"Task {number}", "description": "", "has_description": False, "importance": "low",
+                   "date_made": "2024-10-01", "due_date": "2024-10-10", "status": "Pending", "rag": "green"} for number in range(30)]
+    save_tasks(temporary_tasks_file, tasks_data)
+    now = datetime(2024, 10, 5, 12)
+    dashboard = Dashboard(temporary_tasks_file, parse_where("status!=Completed", now), rows=10)
+    assert dashboard.poll(now) == (30, 0, 0)
+    dashboard.render()
+    assert dashboard.formats == 10 and dashboard.poll(now) is None
+
+    # someone else completes task 2 and deletes task 3
+    tasks_data[1]["status"] = "Completed"
+    del tasks_data[2]
+    save_tasks(temporary_tasks_file, tasks_data)
+    assert dashboard.poll(now) == (0, 1, 1)
+    output = Console(file=io.StringIO(), width=160)
+    output.print(dashboard.render())
+    text = output.file.getvalue()
+    # two rows scrolled into view, nothing else got formatted again
+    assert dashboard.formats == 12 and dashboard.matched == 28
+    assert "Task 0" in text and "Task 1 " not in text and "Task 2 " not in text and "Task 11" in text
+
+    # the due date passing turns the rows red, so they're all redone
+    assert dashboard.poll(datetime(2024, 10, 11)) == (0, 0, 0)
+    dashboard.render()
+    assert dashboard.formats == 22 and dashboard.row(1)[1] == "white on red"
+
+# Test case for IDs in every store, kept as they are through saves, deletes and reopening
+def test_task_ids_are_stable_in_every_store(tmpdir, monkeypatch):
+    from task_tracker import Task, TaskIds, get_storage, load_compact_tasks, migrate_tasks
+    tasks_data = [{"name": f"Task {number}", "description": "", "has_description": False, "importance": "low",
+                   "date_made": "2024-10-01", "due_date": "2030-01-01", "status": "Pending", "rag": "green"} for number in range(1, 21)]
+    # an ID is a real slot, it doesn't cost a task its __slots__ saving
+    task = Task(dict(tasks_data[0], id=1))
+    assert task["id"] == 1 and task._extra is None and list(task)[-1] == "id"
+
+    json_file, db_file, bin_file = (str(tmpdir.join(name)) for name in ("tasks.json", "tasks.db", "tasks.tbin"))
+    save_tasks(json_file, tasks_data)
+    assert TaskIds.open(json_file, load_compact_tasks(json_file)).assigned == 20
+
+    migrate_tasks(json_file, db_file)
+    tasks = load_compact_tasks(db_file)
+    ids = TaskIds.open(db_file, tasks).attach()
+    try:
+        assert ids.assigned == 0
+        # deleting the last task and another one leaves every other ID alone, and neither ID comes back
+        monkeypatch.setattr("sys.stdin", StringIO("20\n5\nNew Task\n\nlow\n2030-01-01\n"))
+        delete_task(db_file, tasks, ids)
+        delete_task(db_file, tasks, ids)
+        add_task(db_file, tasks)
+    finally:
+        ids.detach()
+    stored = load_tasks(db_file)
+    assert [task["id"] for task in stored] == [1, 2, 3, 4] + list(range(6, 20)) + [21]
+    assert stored[-1]["name"] == "New Task" and stored[4]["name"] == "Task 6"
+    assert TaskIds.open(db_file, load_compact_tasks(db_file)).assigned == 0
+    get_storage(db_file).close(db_file)
+
+    # a .json store keeps its ID mark next to it, so deleting the newest task doesn't free its ID either
+    from task_tracker import change_record, commit_changes
+    pair_file = str(tmpdir.join("pair.json"))
+    save_tasks(pair_file, [dict(tasks_data[0], name="A", id=1), dict(tasks_data[1], name="C", id=2)])
+    stale = load_tasks(pair_file)
+    commit_changes(pair_file, [change_record("delete", 1, stale[1])])
+    tasks = load_compact_tasks(pair_file)
+    ids = TaskIds.open(pair_file, tasks).attach()
+    try:
+        monkeypatch.setattr("sys.stdin", StringIO("D\n\nlow\n2030-01-01\n"))
+        add_task(pair_file, tasks)
+    finally:
+        ids.detach()
+    assert [task["id"] for task in load_tasks(pair_file)] == [1, 3]
+    # a writer still holding C finds it gone, rather than renaming and completing D
+    commit_changes(pair_file, [change_record("update", 1, stale[1], {"status": "Completed", "name": "C (done)"})])
+    assert [(task["name"], task["status"]) for task in load_tasks(pair_file)] == [("A", "Pending"), ("D", "Pending")]
+
+    # a .tbin store's IDs are read from its records, opening the map decodes nothing
+    migrate_tasks(json_file, bin_file)
+    tasks = load_compact_tasks(bin_file)
+    ids = TaskIds.open(bin_file, tasks)
+    assert ids.assigned == 0 and tasks.decoded == {}
+    assert ids.get(7)["name"] == "Task 7" and list(tasks.decoded) == [6]